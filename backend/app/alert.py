@@ -486,23 +486,33 @@ def send_daily_briefing(calc_data: dict, prices: dict = None):
 # ==================== 系统告警 ====================
 
 def record_fetch_failure(source: str):
-    """记录采集失败"""
+    """
+    记录采集失败
+
+    失败次数按数据源（含品种，如 futures_zh_spot:SHFE.AU）累计，告警冷却按数据源族
+    （":" 之前的部分）共用一个键：整个接口故障时只发一条告警，而不是每个品种一条
+    """
     _fetch_fail_counts[source] = _fetch_fail_counts.get(source, 0) + 1
     
     # 检查开关
     if not ALERT_ENABLED.get("fetch_fail", False):
         return
     
-    if _fetch_fail_counts[source] >= THRESHOLDS.get("fetch_fail_count", 3):
-        key = f"fetch_fail_{source}"
+    threshold = THRESHOLDS.get("fetch_fail_count", 3)
+    if _fetch_fail_counts[source] >= threshold:
+        family = source.split(":", 1)[0]
+        key = f"fetch_fail_{family}"
         if _should_send(key, "default"):
+            failing = [s for s, n in _fetch_fail_counts.items()
+                       if s.split(":", 1)[0] == family and n >= threshold]
             alert = Alert(
                 alert_type=AlertType.SYSTEM,
                 title="数据采集故障",
                 data_lines=[
-                    f"❌ 数据源: {source}",
+                    f"❌ 数据源: {family}",
                     f"❌ 连续失败: {_fetch_fail_counts[source]}次",
-                ],
+                ] + ([f"❌ 故障品种: {', '.join(s.split(':', 1)[1] for s in failing)}"]
+                     if family != source else []),
                 suggestion="系统可能无法获取行情，请检查！"
             )
             send_alert(alert)
@@ -0,0 +1,372 @@
+"""
+分析查询引擎（DuckDB，可选）
+DuckDB 以只读方式挂载 SQLite 数据库文件，热数据经 sqlite_query 在 SQLite 内按索引过滤后读出，
+冷数据直接 read_parquet 读取 Parquet 归档；多品种区间查询、归一化、前向填充重采样都写成一条
+向量化 SQL，结果以 Arrow 表返回，不经过 ORM 对象和 Python 循环
+各接口的 engine 参数（默认 ANALYTICS_CONFIG["engine"]）在 sqlite / duckdb 之间切换，返回格式不变；
+duckdb 未安装或 sqlite 扩展加载失败时退回 SQLite 查询
+"""
+import threading
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import pandas as pd
+from sqlalchemy import Date, DateTime, Float, Integer
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+    print("⚠️ duckdb 未安装，分析查询引擎不可用，将使用 SQLite 查询")
+
+from app.config import ANALYTICS_CONFIG, DATABASE_PATH, TICK_CONFIG
+from app.archive import ARCHIVE_SPECS, archive_files
+from app.retention import ROLLUP_SPECS, rollup_ranges
+from app.database import PriceBar
+from app.calculator.bar_builder import BAR_INTERVALS
+
+# 可选的查询引擎
+ENGINES = ("sqlite", "duckdb")
+
+# 基准日期之前向前查找基准收盘价的天数（覆盖长假休市）
+BASE_LOOKBACK_DAYS = 31
+
+_lock = threading.Lock()
+_connection = None
+_error: Optional[str] = None
+
+
+def _connect():
+    con = duckdb.connect(config={
+        "threads": ANALYTICS_CONFIG["threads"],
+        "memory_limit": ANALYTICS_CONFIG["memory_limit"],
+    })
+    con.execute("INSTALL sqlite")
+    con.execute("LOAD sqlite")
+    path = str(DATABASE_PATH).replace("'", "''")
+    con.execute(f"ATTACH '{path}' AS hot (TYPE sqlite, READ_ONLY)")
+    return con
+
+
+def _cursor():
+    """返回当前调用使用的游标（共享同一个 DuckDB 实例，游标之间可并发查询）"""
+    global _connection, _error
+    with _lock:
+        if _connection is None and _error is None:
+            try:
+                _connection = _connect()
+            except Exception as e:
+                _error = str(e)
+                print(f"⚠️ DuckDB 分析引擎初始化失败，将使用 SQLite 查询: {e}")
+        if _connection is None:
+            raise RuntimeError(f"DuckDB 分析引擎不可用: {_error}")
+        return _connection.cursor()
+
+
+def is_available() -> bool:
+    if not DUCKDB_AVAILABLE:
+        return False
+    try:
+        _cursor().close()
+        return True
+    except RuntimeError:
+        return False
+
+
+def resolve_engine(engine: Optional[str]) -> str:
+    """
+    返回实际使用的引擎：未指定时取配置，duckdb 不可用时退回 sqlite
+
+    Raises:
+        ValueError: 未知引擎
+    """
+    engine = engine or ANALYTICS_CONFIG["engine"]
+    if engine not in ENGINES:
+        raise ValueError(f"未知查询引擎: {engine}，可选: {list(ENGINES)}")
+    if engine == "duckdb" and not is_available():
+        return "sqlite"
+    return engine
+
+
+def close():
+    global _connection, _error
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+        _connection, _error = None, None
+
+
+def _sql_value(value):
+    """参数转换为 SQLite 中的存储格式（与 SQLAlchemy 一致，按字符串比较）"""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _duck_type(model, column: str) -> str:
+    column_type = model.__table__.c[column].type
+    if isinstance(column_type, DateTime):
+        return "TIMESTAMP"
+    if isinstance(column_type, Date):
+        return "DATE"
+    if isinstance(column_type, Float):
+        return "DOUBLE"
+    if isinstance(column_type, Integer):
+        return "BIGINT"
+    return "VARCHAR"
+
+
+def _hot_columns(model, columns: Sequence[str]) -> str:
+    """
+    SQLite 端的查询列。sqlite_query 的结果列都是字符串，浮点数默认只输出 15 位有效数字，
+    这里按 17 位（%!.17g）输出，转回 DOUBLE 时与原值完全一致
+    """
+    return ", ".join(
+        f"CASE WHEN {c} IS NULL THEN NULL ELSE printf('%!.17g', {c}) END AS {c}"
+        if isinstance(model.__table__.c[c].type, Float) else c
+        for c in columns
+    )
+
+
+def _casts(model, columns: Sequence[str], rename: Optional[dict] = None) -> str:
+    """DuckDB 端把 sqlite_query 返回的字符串按模型的列类型转换"""
+    rename = rename or {}
+    return ", ".join(
+        f"CAST({c} AS {_duck_type(model, c)}) AS {rename.get(c, c)}" for c in columns
+    )
+
+
+def _sqlite_query(sql: str, params: Sequence) -> Tuple[str, list]:
+    """在 SQLite 内执行带参数的查询（可以使用 SQLite 索引），返回 DuckDB 表函数片段和参数"""
+    placeholders = ", ".join("?" for _ in params)
+    return f"sqlite_query('hot', ?, params=row({placeholders}))", [sql, *[_sql_value(p) for p in params]]
+
+
+def _in_clause(column: str, keys: Optional[Sequence[str]]) -> Tuple[str, list]:
+    if not keys:
+        return "", []
+    return f" AND {column} IN ({', '.join('?' for _ in keys)})", list(keys)
+
+
+def _range_sql(table: str, start, end=None, keys: Optional[Sequence[str]] = None) -> Tuple[str, list]:
+    """
+    [start, end] 区间的查询：SQLite 热数据 + Parquet 冷数据，重叠部分以 SQLite 为准
+    列同 ARCHIVE_SPECS[table]["columns"]
+    """
+    spec = ARCHIVE_SPECS[table]
+    model, key, time_column, columns = spec["model"], spec["key"], spec["time"], spec["columns"]
+    casts = _casts(model, columns)
+
+    where, params = f"{time_column} >= ?", [start]
+    if end is not None:
+        where += f" AND {time_column} <= ?"
+        params.append(end)
+    keys_sql, keys_params = _in_clause(key, keys)
+    source, hot_params = _sqlite_query(
+        f"SELECT {_hot_columns(model, columns)} FROM {table} WHERE {where}{keys_sql}", params + keys_params,
+    )
+    hot = f"SELECT {casts} FROM {source}"
+
+    files = archive_files(table, start, end, keys)
+    if not files:
+        return hot, hot_params
+
+    paths = ", ".join("'" + str(p).replace("'", "''") + "'" for p in files)
+    cold_where = f"{time_column} >= ?" + (f" AND {time_column} <= ?" if end is not None else "")
+    cold_params = [start] + ([end] if end is not None else [])
+    sql = (
+        f"WITH hot AS ({hot}), "
+        f"cold AS (SELECT {casts} FROM read_parquet([{paths}]) WHERE {cold_where}) "
+        f"SELECT * FROM hot UNION ALL (SELECT * FROM cold ANTI JOIN hot USING ({key}, {time_column}))"
+    )
+    return sql, hot_params + cold_params
+
+
+def range_query(table: str, start, end=None, keys: Optional[Sequence[str]] = None):
+    """
+    多品种区间查询（archive.read_history 的 DuckDB 版本）
+
+    Returns:
+        按时间、品种排序的 Arrow 表，列同 ARCHIVE_SPECS[table]["columns"]
+    """
+    spec = ARCHIVE_SPECS[table]
+    sql, params = _range_sql(table, start, end, keys)
+    cur = _cursor()
+    try:
+        return cur.execute(
+            f"SELECT * FROM ({sql}) ORDER BY {spec['time']}, {spec['key']}", params,
+        ).fetch_arrow_table()
+    finally:
+        cur.close()
+
+
+def forward_filled_ticks(start: datetime, end: datetime, keys: Optional[Sequence[str]] = None):
+    """
+    分钟行情区间查询并重采样为逐分钟序列（bar_builder.forward_fill_ticks 的 SQL 版本）：
+    每行之后按分钟重复，直到下一行、心跳间隔或 end，距下一行不足半分钟的分钟不再补
+
+    Returns:
+        按时间、品种排序的 Arrow 表，列同 ARCHIVE_SPECS["realtime_prices"]["columns"]
+    """
+    sql, params = _range_sql("realtime_prices", start, end, keys)
+    heartbeat = TICK_CONFIG["heartbeat_minutes"]
+    filled = f"""
+        WITH r AS ({sql}),
+        spans AS (
+            SELECT *, least(
+                coalesce(lead(timestamp) OVER (PARTITION BY symbol ORDER BY timestamp), ?::TIMESTAMP),
+                timestamp + INTERVAL {heartbeat} MINUTE
+            ) AS span_end
+            FROM r
+        ),
+        repeated AS (
+            SELECT *, unnest(range(greatest(1, ceil((epoch(span_end - timestamp) - 30) / 60))::BIGINT)) AS n
+            FROM spans
+        )
+        SELECT * EXCLUDE (span_end, n) REPLACE (timestamp + n * INTERVAL 1 MINUTE AS timestamp)
+        FROM repeated
+        ORDER BY timestamp, symbol
+    """
+    cur = _cursor()
+    try:
+        return cur.execute(filled, params + [end]).fetch_arrow_table()
+    finally:
+        cur.close()
+
+
+def normalized_series(
+    symbols: Sequence[str],
+    start_date: date,
+    end_date: date,
+    base_date: date,
+    bar_interval: str,
+):
+    """
+    多品种归一化（基准价 = 100），一条 SQL 完成：
+    有日K线的品种以基准日期（含）之前最近一天的收盘价为基准，没有时用区间内第一天的收盘价；
+    区间内没有日K线的品种改用本地聚合的 bar_interval K 线（心跳间隔内前向填充），以第一根开盘价为基准
+
+    Returns:
+        Arrow 表 (symbol, time, value)，time 为 ISO 格式字符串，按品种、时间排序
+    """
+    lookback = min(start_date, base_date - timedelta(days=BASE_LOOKBACK_DAYS))
+    daily_sql, daily_params = _range_sql("daily_ohlc", lookback, end_date, symbols)
+
+    step_minutes = int(pd.Timedelta(BAR_INTERVALS[bar_interval]).total_seconds() // 60)
+    heartbeat = TICK_CONFIG["heartbeat_minutes"]
+    # 与 fill_bar_gaps 一致：日线或周期不短于心跳间隔时不补齐
+    fill_minutes = heartbeat if bar_interval != "1d" and step_minutes < heartbeat else step_minutes
+
+    keys_sql, keys_params = _in_clause("symbol", symbols)
+    bars_source, bars_params = _sqlite_query(
+        f"SELECT symbol, bar_time, {_hot_columns(PriceBar, ['open', 'close'])} FROM price_bars "
+        f"WHERE interval = ? AND bar_time >= ?{keys_sql}",
+        [bar_interval, datetime.combine(start_date, datetime.min.time())] + keys_params,
+    )
+    now = datetime.now()
+
+    sql = f"""
+        WITH daily AS ({daily_sql}),
+        in_range AS (SELECT * FROM daily WHERE date >= ?),
+        daily_base AS (
+            SELECT symbol,
+                   arg_max(close, date) FILTER (WHERE date <= ?) AS base_close,
+                   arg_min(close, date) FILTER (WHERE date >= ?) AS first_close
+            FROM daily GROUP BY symbol
+        ),
+        daily_norm AS (
+            SELECT r.symbol, r.date::TIMESTAMP AS ts, strftime(r.date, '%Y-%m-%d') AS time,
+                   round(r.close / coalesce(nullif(b.base_close, 0), nullif(b.first_close, 0), 100) * 100, 2) AS value
+            FROM in_range r JOIN daily_base b USING (symbol)
+            WHERE r.close IS NOT NULL AND r.close <> 0
+        ),
+        bars AS (
+            SELECT symbol, bar_time, open, close,
+                   lead(bar_time) OVER (PARTITION BY symbol ORDER BY bar_time) AS next_time
+            FROM (SELECT symbol, CAST(bar_time AS TIMESTAMP) AS bar_time,
+                         CAST(open AS DOUBLE) AS open, CAST(close AS DOUBLE) AS close
+                  FROM {bars_source})
+            WHERE symbol NOT IN (SELECT DISTINCT symbol FROM in_range)
+        ),
+        bar_base AS (SELECT symbol, arg_min(open, bar_time) AS base_open FROM bars GROUP BY symbol),
+        filled AS (
+            SELECT symbol, close, unnest(range(
+                bar_time,
+                greatest(
+                    least(bar_time + INTERVAL {fill_minutes} MINUTE, next_time, ?::TIMESTAMP + INTERVAL 1 MICROSECOND),
+                    bar_time + INTERVAL 1 MICROSECOND
+                ),
+                INTERVAL {step_minutes} MINUTE
+            )) AS ts
+            FROM bars
+        ),
+        bar_norm AS (
+            SELECT f.symbol, f.ts, strftime(f.ts, '%Y-%m-%dT%H:%M:%S') AS time,
+                   round(f.close / coalesce(nullif(b.base_open, 0), 100) * 100, 2) AS value
+            FROM filled f JOIN bar_base b USING (symbol)
+            WHERE f.close IS NOT NULL AND f.close <> 0
+        )
+        SELECT symbol, time, value FROM (
+            SELECT * FROM daily_norm UNION ALL SELECT * FROM bar_norm
+        ) ORDER BY symbol, ts
+    """
+    params = daily_params + [start_date, base_date, start_date] + bars_params + [now]
+    cur = _cursor()
+    try:
+        return cur.execute(sql, params).fetch_arrow_table()
+    finally:
+        cur.close()
+
+
+def _rolled_up_until(cur, table: str) -> Optional[datetime]:
+    source, params = _sqlite_query("SELECT rolled_up_until FROM retention_state WHERE table_name = ?", [table])
+    row = cur.execute(f"SELECT CAST(rolled_up_until AS TIMESTAMP) FROM {source}", params).fetchone()
+    return row[0] if row else None
+
+
+def query_history(table: str, key_value: str, start: datetime):
+    """
+    retention.query_history 的 DuckDB 版本：1h 降采样 → 5m 降采样 → 原始数据（区间同 rollup_ranges），
+    合并为一条 UNION ALL
+
+    Returns:
+        按时间排序的 Arrow 表 (timestamp, resolution, 各数值列)
+    """
+    spec = ROLLUP_SPECS[table]
+    model, rollup, key, fields = spec["model"], spec["rollup"], spec["key"], spec["values"]
+    rollup_table, raw_table = rollup.__tablename__, model.__tablename__
+
+    cur = _cursor()
+    try:
+        until = _rolled_up_until(cur, table)
+        source, p = _sqlite_query(f"SELECT min(timestamp) AS raw_from FROM {raw_table} WHERE {key} = ?", [key_value])
+        raw_from = cur.execute(f"SELECT CAST(raw_from AS TIMESTAMP) FROM {source}", p).fetchone()[0]
+
+        parts: List[str] = []
+        params: list = []
+        for interval, lo, hi in rollup_ranges(start, until, raw_from):
+            source, p = _sqlite_query(
+                f"SELECT bucket_time, {_hot_columns(rollup, fields)} FROM {rollup_table} "
+                f"WHERE {key} = ? AND interval = ? AND bucket_time >= ? AND bucket_time < ?",
+                [key_value, interval, lo, hi],
+            )
+            parts.append(
+                f"SELECT {_casts(rollup, ['bucket_time'], {'bucket_time': 'timestamp'})}, "
+                f"'{interval}' AS resolution, {_casts(rollup, fields)} FROM {source}"
+            )
+            params.extend(p)
+
+        source, p = _sqlite_query(
+            f"SELECT timestamp, {_hot_columns(model, fields)} FROM {raw_table} WHERE {key} = ? AND timestamp >= ?",
+            [key_value, start],
+        )
+        parts.append(f"SELECT {_casts(model, ['timestamp'])}, 'raw' AS resolution, {_casts(model, fields)} FROM {source}")
+        params.extend(p)
+
+        sql = f"SELECT * FROM ({' UNION ALL '.join(parts)}) ORDER BY timestamp"
+        return cur.execute(sql, params).fetch_arrow_table()
+    finally:
+        cur.close()
@@ -68,8 +68,8 @@ def trigger_fetch_cn():
     from app.fetchers.futures_fetcher import fetch_cn_futures
     
     try:
-        fetch_cn_futures()
-        return {"status": "success", "message": "国内期货数据采集完成"}
+        timings = fetch_cn_futures()
+        return {"status": "success", "message": "国内期货数据采集完成", "timings": timings}
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
@@ -110,6 +110,31 @@ def trigger_calculate_premium():
         return {"status": "error", "error": str(e)}
 
 
+@router.post("/admin/build-bars")
+def trigger_build_bars(rebuild: bool = False):
+    """手动聚合K线（rebuild=true 时清空后全量重建）"""
+    from app.calculator.bar_builder import build_bars, rebuild_bars
+    
+    try:
+        result = rebuild_bars() if rebuild else build_bars()
+        return {"status": "success", **result}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@router.post("/admin/rebuild-latest")
+def trigger_rebuild_latest():
+    """从分钟行情重建最新价格表"""
+    from app.database import rebuild_latest_prices
+    from app.writer import db_writer
+    
+    try:
+        count = db_writer.write(rebuild_latest_prices, name="latest_prices")
+        return {"status": "success", "symbols": count}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
 @router.get("/admin/status")
 def get_status():
     """获取系统状态"""
@@ -134,6 +159,19 @@ def get_status():
         db.close()
 
 
+@router.get("/admin/metrics")
+def get_metrics():
+    """获取采集运行指标（调用次数、重试次数、失败次数、数据源熔断状态等）"""
+    from app import metrics
+    from app.fetchers.circuit_breaker import breaker_states
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        **metrics.snapshot(),
+        "sources": breaker_states(),
+    }
+
+
 @router.post("/admin/test-alert")
 def test_alert():
     """测试告警发送"""
@@ -0,0 +1,109 @@
+"""
+异步只读接口（API_CONFIG["async_reads"] 开启时注册，覆盖同路径的同步处理函数）
+
+每个处理函数通过 AsyncSession.run_sync 复用同步模块中的处理逻辑，查询在事件循环中等待
+aiosqlite 返回，不占用线程池线程；响应内容与同步接口完全一致
+是否默认开启取决于 benchmarks/bench_async_api.py 的测量结果（见 config.API_CONFIG）
+"""
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app import analytics
+from app.database import get_async_db
+from app.api import bars, calculator, macro, snapshot
+
+router = APIRouter()
+
+
+async def _load_history(handler, db: AsyncSession, engine: Optional[str], **params):
+    """历史接口：DuckDB 引擎不经过 SQLite 会话，放到线程池执行以免阻塞事件循环"""
+    try:
+        use_duckdb = analytics.resolve_engine(engine) == "duckdb"
+    except ValueError:
+        use_duckdb = False  # 由同步处理函数返回错误信息
+    if use_duckdb:
+        return await run_in_threadpool(handler, engine=engine, db=None, **params)
+    return await db.run_sync(lambda session: handler(engine=engine, db=session, **params))
+
+
+@router.get("/snapshot")
+async def get_snapshot(
+    market: Optional[str] = Query(None, description="市场筛选: CN, INTL, LME"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(lambda session: snapshot.get_snapshot(market=market, db=session))
+
+
+@router.get("/snapshot/{symbol}")
+async def get_symbol_snapshot(symbol: str, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: snapshot.get_symbol_snapshot(symbol=symbol, db=session))
+
+
+@router.get("/calculator")
+async def get_calculator_data(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: calculator.get_calculator_data(db=session))
+
+
+@router.get("/calculator/history")
+async def get_premium_history(
+    response: Response,
+    pair: str = Query("GOLD", description="品种对: GOLD, SILVER, COPPER, ALUMINUM"),
+    days: int = Query(30, description="天数"),
+    engine: Optional[str] = Query(None, description="查询引擎: sqlite, duckdb，默认按配置"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await _load_history(calculator.get_premium_history, db, engine,
+                               response=response, pair=pair, days=days)
+
+
+@router.get("/calculator/ratios")
+async def get_ratio_history(
+    response: Response,
+    ratio_type: str = Query("GOLD_SILVER", description="比值类型: GOLD_SILVER, COPPER_GOLD"),
+    days: int = Query(30, description="天数"),
+    engine: Optional[str] = Query(None, description="查询引擎: sqlite, duckdb，默认按配置"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await _load_history(calculator.get_ratio_history, db, engine,
+                               response=response, ratio_type=ratio_type, days=days)
+
+
+@router.get("/bars")
+async def get_bars(
+    symbol: str = Query(..., description="品种代码，如 SHFE.AU"),
+    interval: str = Query("1m", description="周期: 1m, 5m, 15m, 1h, 1d"),
+    hours: int = Query(24, description="最近N小时，指定 start 时忽略"),
+    start: Optional[str] = Query(None, description="开始时间 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM"),
+    end: Optional[str] = Query(None, description="结束时间 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(lambda session: bars.get_bars(
+        symbol=symbol, interval=interval, hours=hours, start=start, end=end, db=session,
+    ))
+
+
+@router.get("/macro/cpi")
+async def get_cpi_data(
+    country: str = Query("CN", description="国家: CN, US"),
+    months: int = Query(24, description="月数"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(lambda session: macro.get_cpi_data(country=country, months=months, db=session))
+
+
+@router.get("/macro/cpi/compare")
+async def get_cpi_compare(
+    months: int = Query(24, description="月数"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(lambda session: macro.get_cpi_compare(months=months, db=session))
+
+
+@router.get("/macro/oil_price")
+async def get_oil_price(
+    months: int = Query(24, description="月数"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(lambda session: macro.get_oil_price(months=months, db=session))
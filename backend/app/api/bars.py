@@ -0,0 +1,60 @@
+"""
+K 线 API - 读取本地聚合的 K 线
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime, timedelta
+
+from app.database import get_db
+from app.config import SYMBOLS_CONFIG
+from app.calculator.bar_builder import BAR_INTERVALS, query_bars
+from app.retention import finest_bar_interval
+
+router = APIRouter()
+
+
+@router.get("/bars")
+def get_bars(
+    symbol: str = Query(..., description="品种代码，如 SHFE.AU"),
+    interval: str = Query("1m", description="周期: 1m, 5m, 15m, 1h, 1d"),
+    hours: int = Query(24, description="最近N小时，指定 start 时忽略"),
+    start: Optional[str] = Query(None, description="开始时间 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM"),
+    end: Optional[str] = Query(None, description="结束时间 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取指定品种的 K 线（由分钟行情聚合，每分钟更新）
+    """
+    if symbol not in SYMBOLS_CONFIG:
+        return {"error": f"未知品种: {symbol}"}
+    if interval not in BAR_INTERVALS:
+        return {"error": f"未知周期: {interval}，可选: {list(BAR_INTERVALS.keys())}"}
+    
+    try:
+        start_time = datetime.fromisoformat(start) if start else datetime.now() - timedelta(hours=hours)
+        end_time = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        return {"error": "时间格式错误，请使用 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM"}
+    
+    # 请求的粒度已超出保留期时改用仍然可用的最细粒度
+    interval = finest_bar_interval(interval, start_time)
+    bars = query_bars(db, symbol, interval, start=start_time, end=end_time, fill=True)
+    
+    return {
+        "symbol": symbol,
+        "name": SYMBOLS_CONFIG[symbol]["name"],
+        "interval": interval,
+        "count": len(bars),
+        "data": [
+            {
+                "time": b.bar_time.isoformat(),
+                "open": b.open,
+                "high": b.high,
+                "low": b.low,
+                "close": b.close,
+                "ticks": b.ticks,
+            }
+            for b in bars
+        ]
+    }
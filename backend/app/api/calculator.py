@@ -2,15 +2,16 @@
 溢价率计算器 API
 """
 import math
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from typing import Optional, Any
 from datetime import datetime, timedelta
 
-from app.database import get_db, SpreadData, RatioData, ExchangeRate
-from app.config import PREMIUM_PAIRS
+from app import analytics
+from app.database import get_db
+from app.config import PREMIUM_PAIRS, RATIO_NAMES
 from app.calculator.premium_calculator import calculate_current_premiums
+from app.retention import query_history
 
 router = APIRouter()
 
@@ -41,6 +42,13 @@ def clean_dict(d: dict) -> dict:
     return cleaned
 
 
+def load_history(db: Session, engine: str, table: str, key_value: str, start: datetime) -> list:
+    """按引擎查询历史（超出原始数据保留期的部分自动改用降采样数据），两种引擎返回相同字段"""
+    if engine == "duckdb":
+        return analytics.query_history(table, key_value, start).to_pylist()
+    return query_history(db, table, key_value, start)
+
+
 def get_signal(value: float, thresholds: dict) -> str:
     """根据阈值判断信号"""
     if value > thresholds.get("high", float('inf')):
@@ -121,29 +129,34 @@ def get_calculator_data(db: Session = Depends(get_db)):
 
 @router.get("/calculator/history")
 def get_premium_history(
+    response: Response,
     pair: str = Query("GOLD", description="品种对: GOLD, SILVER, COPPER, ALUMINUM"),
     days: int = Query(30, description="天数"),
+    engine: Optional[str] = Query(None, description="查询引擎: sqlite, duckdb，默认按配置"),
     db: Session = Depends(get_db)
 ):
     """
     获取溢价率历史数据
+    实际使用的查询引擎见响应头 X-Query-Engine
     """
+    try:
+        engine = analytics.resolve_engine(engine)
+    except ValueError as e:
+        return {"error": str(e)}
     start_date = datetime.now() - timedelta(days=days)
     
-    records = db.query(SpreadData).filter(
-        SpreadData.pair == pair,
-        SpreadData.timestamp >= start_date
-    ).order_by(SpreadData.timestamp).all()
+    records = load_history(db, engine, "spread_data", pair, start_date)
+    response.headers["X-Query-Engine"] = engine
     
     data = []
     for r in records:
         data.append({
-            "timestamp": r.timestamp.isoformat(),
-            "domestic_price": r.domestic_price,
-            "foreign_price": r.foreign_price,
-            "theoretical_price": r.theoretical_price,
-            "spread_rate": r.spread_rate,
-            "exchange_rate": r.exchange_rate,
+            "timestamp": r["timestamp"].isoformat(),
+            "domestic_price": r["domestic_price"],
+            "foreign_price": r["foreign_price"],
+            "theoretical_price": r["theoretical_price"],
+            "spread_rate": r["spread_rate"],
+            "exchange_rate": r["exchange_rate"],
         })
     
     pair_config = PREMIUM_PAIRS.get(pair, {})
@@ -153,42 +166,44 @@ def get_premium_history(
         "name": pair_config.get("name", pair),
         "period": f"{days}天",
         "count": len(data),
+        "resolutions": sorted({r["resolution"] for r in records}),
         "data": data
     })
 
 
 @router.get("/calculator/ratios")
 def get_ratio_history(
+    response: Response,
     ratio_type: str = Query("GOLD_SILVER", description="比值类型: GOLD_SILVER, COPPER_GOLD"),
     days: int = Query(30, description="天数"),
+    engine: Optional[str] = Query(None, description="查询引擎: sqlite, duckdb，默认按配置"),
     db: Session = Depends(get_db)
 ):
     """
     获取比值指标历史数据
+    实际使用的查询引擎见响应头 X-Query-Engine
     """
+    try:
+        engine = analytics.resolve_engine(engine)
+    except ValueError as e:
+        return {"error": str(e)}
     start_date = datetime.now() - timedelta(days=days)
     
-    records = db.query(RatioData).filter(
-        RatioData.ratio_type == ratio_type,
-        RatioData.timestamp >= start_date
-    ).order_by(RatioData.timestamp).all()
+    records = load_history(db, engine, "ratio_data", ratio_type, start_date)
+    response.headers["X-Query-Engine"] = engine
     
     data = []
     for r in records:
         data.append({
-            "timestamp": r.timestamp.isoformat(),
-            "value": r.value,
+            "timestamp": r["timestamp"].isoformat(),
+            "value": r["value"],
         })
     
-    name_map = {
-        "GOLD_SILVER": "金银比",
-        "COPPER_GOLD": "铜金比"
-    }
-    
     return clean_dict({
         "ratio_type": ratio_type,
-        "name": name_map.get(ratio_type, ratio_type),
+        "name": RATIO_NAMES.get(ratio_type, ratio_type),
         "period": f"{days}天",
         "count": len(data),
+        "resolutions": sorted({r["resolution"] for r in records}),
         "data": data
     })
@@ -9,7 +9,11 @@ from datetime import datetime, timedelta
 import pandas as pd
 import io
 
-from app.database import get_db, RealtimePrice, DailyOHLC, SpreadData, MacroData
+from app import analytics
+from app.database import get_db, LatestPrice, MacroData
+from app.archive import read_history
+from app.calculator.bar_builder import forward_fill_ticks
+from app.config import PREMIUM_PAIRS
 
 router = APIRouter()
 
@@ -46,16 +50,23 @@ def create_excel_response(df: pd.DataFrame, filename: str) -> StreamingResponse:
 
 @router.get("/export")
 def export_data(
-    type: str = Query(..., description="导出类型: snapshot, history, premium, macro"),
+    type: str = Query(..., description="导出类型: snapshot, history, premium, realtime, macro"),
     format: str = Query("csv", description="格式: csv, xlsx"),
     symbols: Optional[str] = Query(None, description="品种代码，逗号分隔"),
     start_date: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD"),
+    engine: Optional[str] = Query(None, description="history / premium / realtime 的查询引擎: sqlite, duckdb，默认按配置"),
     db: Session = Depends(get_db)
 ):
     """
     导出数据为 CSV 或 Excel
+    实际使用的查询引擎见响应头 X-Query-Engine
     """
+    try:
+        engine = analytics.resolve_engine(engine)
+    except ValueError as e:
+        return {"error": str(e)}
+    
     # 解析日期
     end_dt = datetime.now()
     start_dt = end_dt - timedelta(days=30)  # 默认30天
@@ -79,23 +90,12 @@ def export_data(
     filename_prefix = ""
     
     if type == "snapshot":
-        # 导出最新快照
-        query = db.query(RealtimePrice)
+        # 导出最新快照（最新价格表）
+        query = db.query(LatestPrice)
         if symbol_list:
-            query = query.filter(RealtimePrice.symbol.in_(symbol_list))
-        
-        # 获取每个品种的最新数据
-        from sqlalchemy import func
-        subquery = db.query(
-            RealtimePrice.symbol,
-            func.max(RealtimePrice.timestamp).label('max_ts')
-        ).group_by(RealtimePrice.symbol).subquery()
+            query = query.filter(LatestPrice.symbol.in_(symbol_list))
         
-        records = db.query(RealtimePrice).join(
-            subquery,
-            (RealtimePrice.symbol == subquery.c.symbol) & 
-            (RealtimePrice.timestamp == subquery.c.max_ts)
-        ).all()
+        records = query.all()
         
         data = [{
             "品种代码": r.symbol,
@@ -111,53 +111,62 @@ def export_data(
         filename_prefix = "snapshot"
         
     elif type == "history":
-        # 导出日K线历史
-        query = db.query(DailyOHLC).filter(
-            DailyOHLC.date >= start_dt.date(),
-            DailyOHLC.date <= end_dt.date()
-        )
-        if symbol_list:
-            query = query.filter(DailyOHLC.symbol.in_(symbol_list))
-        
-        records = query.order_by(DailyOHLC.date, DailyOHLC.symbol).all()
-        
-        data = [{
-            "日期": r.date.strftime("%Y-%m-%d"),
-            "品种代码": r.symbol,
-            "品种名称": r.name,
-            "开盘价": r.open,
-            "最高价": r.high,
-            "最低价": r.low,
-            "收盘价": r.close,
-            "成交量": r.volume
-        } for r in records]
-        
-        df = pd.DataFrame(data)
+        # 导出日K线历史（早于 SQLite 的部分读取 Parquet 归档）
+        if engine == "duckdb":
+            records = analytics.range_query("daily_ohlc", start_dt.date(), end_dt.date(), keys=symbol_list).to_pandas()
+        else:
+            records = read_history(db, "daily_ohlc", start_dt.date(), end_dt.date(), keys=symbol_list)
+        
+        df = pd.DataFrame({
+            "日期": pd.to_datetime(records["date"]).dt.strftime("%Y-%m-%d"),
+            "品种代码": records["symbol"],
+            "品种名称": records["name"],
+            "开盘价": records["open"],
+            "最高价": records["high"],
+            "最低价": records["low"],
+            "收盘价": records["close"],
+            "成交量": records["volume"],
+        })
         filename_prefix = "history"
         
     elif type == "premium":
-        # 导出溢价率数据
-        query = db.query(SpreadData).filter(
-            SpreadData.timestamp >= start_dt,
-            SpreadData.timestamp <= end_dt
-        )
-        
-        records = query.order_by(SpreadData.timestamp, SpreadData.pair).all()
-        
-        data = [{
-            "时间": r.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            "品种对": r.pair,
-            "名称": r.name,
-            "国内价格": r.domestic_price,
-            "国际价格": r.foreign_price,
-            "理论价格": r.theoretical_price,
-            "汇率": r.exchange_rate,
-            "溢价率(%)": r.spread_rate
-        } for r in records]
-        
-        df = pd.DataFrame(data)
+        # 导出溢价率数据（超出原始数据保留期的部分读取 Parquet 归档）
+        if engine == "duckdb":
+            records = analytics.range_query("spread_data", start_dt, end_dt).to_pandas()
+        else:
+            records = read_history(db, "spread_data", start_dt, end_dt)
+        
+        df = pd.DataFrame({
+            "时间": pd.to_datetime(records["timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "品种对": records["pair"],
+            "名称": records["pair"].map(lambda pair: PREMIUM_PAIRS.get(pair, {}).get("name", pair)),
+            "国内价格": records["domestic_price"],
+            "国际价格": records["foreign_price"],
+            "理论价格": records["theoretical_price"],
+            "汇率": records["exchange_rate"],
+            "溢价率(%)": records["spread_rate"],
+        })
         filename_prefix = "premium"
         
+    elif type == "realtime":
+        # 导出分钟行情（超出原始数据保留期的部分读取 Parquet 归档），价格未变化的分钟前向填充
+        if engine == "duckdb":
+            records = analytics.forward_filled_ticks(start_dt, end_dt, keys=symbol_list).to_pandas()
+        else:
+            records = read_history(db, "realtime_prices", start_dt, end_dt, keys=symbol_list)
+            records = forward_fill_ticks(records, end=end_dt)
+        
+        df = pd.DataFrame({
+            "时间": pd.to_datetime(records["timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "品种代码": records["symbol"],
+            "品种名称": records["name"],
+            "价格": records["price"],
+            "人民币价格": records["price_cny"],
+            "单位": records["unit"],
+            "市场": records["market"],
+        })
+        filename_prefix = "realtime"
+        
     elif type == "macro":
         # 导出宏观数据
         query = db.query(MacroData).filter(
@@ -189,10 +198,12 @@ def export_data(
     
     if format == "xlsx":
         filename = f"{filename_prefix}_{timestamp}.xlsx"
-        return create_excel_response(df, filename)
+        response = create_excel_response(df, filename)
     else:
         filename = f"{filename_prefix}_{timestamp}.csv"
-        return create_csv_response(df, filename)
+        response = create_csv_response(df, filename)
+    response.headers["X-Query-Engine"] = engine
+    return response
 
 
 @router.get("/export/types")
@@ -205,6 +216,7 @@ def get_export_types():
             {"id": "snapshot", "name": "实时快照", "description": "当前所有品种的最新价格"},
             {"id": "history", "name": "历史数据", "description": "指定品种、时间范围的日K线"},
             {"id": "premium", "name": "溢价率历史", "description": "溢价率计算器的历史记录"},
+            {"id": "realtime", "name": "分钟行情", "description": "指定品种、时间范围的分钟级价格"},
             {"id": "macro", "name": "宏观数据", "description": "CPI、汽柴油价格等"},
         ],
         "formats": [
@@ -1,13 +1,15 @@
 """
 归一化图表 API
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
-from typing import Optional
-from datetime import datetime, timedelta
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 
-from app.database import get_db, DailyOHLC, RealtimePrice
+from app import analytics
+from app.database import get_db, DailyOHLC
+from app.calculator.bar_builder import query_bars
 
 router = APIRouter()
 
@@ -81,36 +83,26 @@ def get_period_days(period: str) -> int:
     return period_map.get(period, 7)
 
 
-@router.get("/normalized")
-def get_normalized_data(
-    group: str = Query("precious_metals", description="分组: precious_metals, base_metals, energy, agriculture, all"),
-    period: str = Query("7d", description="周期: 1d, 3d, 7d, 14d, 30d, 1m, 3m, 6m, 1y, 3y, all"),
-    base_date: Optional[str] = Query(None, description="基准日期 YYYY-MM-DD，默认为周期起点"),
-    db: Session = Depends(get_db)
-):
-    """
-    获取归一化后的多品种数据，用于对比走势
-    """
-    if group not in CHART_GROUPS:
-        return {"error": f"未知分组: {group}，可选: {list(CHART_GROUPS.keys())}"}
-    
-    group_config = CHART_GROUPS[group]
-    symbols = group_config["symbols"]
-    
-    # 计算日期范围
-    days = get_period_days(period)
-    end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=days)
-    
-    # 如果指定了基准日期
-    if base_date:
-        try:
-            base_date_obj = datetime.strptime(base_date, "%Y-%m-%d").date()
-        except ValueError:
-            return {"error": "日期格式错误，请使用 YYYY-MM-DD"}
-    else:
-        base_date_obj = start_date
-    
+def get_bar_interval(days: int) -> str:
+    """没有日K数据时，按周期长度选择本地 K 线的粒度"""
+    if days <= 1:
+        return "5m"
+    if days <= 3:
+        return "15m"
+    if days <= 30:
+        return "1h"
+    return "1d"
+
+
+def _normalized_sqlite(
+    db: Session,
+    symbols: List[str],
+    start_date: date,
+    end_date: date,
+    base_date: date,
+    bar_interval: str,
+) -> List[dict]:
+    """逐品种查询日K线（或本地 K 线）并在 Python 中归一化"""
     series = []
     
     for symbol in symbols:
@@ -121,26 +113,26 @@ def get_normalized_data(
             DailyOHLC.date <= end_date
         ).order_by(DailyOHLC.date).all()
         
-        # 如果没有日K数据，尝试从实时数据获取
+        # 如果没有日K数据，使用本地聚合的 K 线
         if not records:
-            realtime_records = db.query(RealtimePrice).filter(
-                RealtimePrice.symbol == symbol,
-                RealtimePrice.timestamp >= datetime.combine(start_date, datetime.min.time()),
-            ).order_by(RealtimePrice.timestamp).all()
+            bars = query_bars(
+                db, symbol, bar_interval,
+                start=datetime.combine(start_date, datetime.min.time()),
+                fill=True,
+            )
             
-            if not realtime_records:
+            if not bars:
                 continue
             
-            # 使用第一条数据的价格作为基准
-            base_price = realtime_records[0].price if realtime_records[0].price else 100
+            # 使用第一根 K 线的开盘价作为基准
+            base_price = bars[0].open if bars[0].open else 100
             
-            # 按时间分组，取每个时间点的数据
             data = []
-            for r in realtime_records:
-                if r.price and base_price:
-                    normalized_value = round(r.price / base_price * 100, 2)
+            for b in bars:
+                if b.close and base_price:
+                    normalized_value = round(b.close / base_price * 100, 2)
                     data.append([
-                        r.timestamp.isoformat(),
+                        b.bar_time.isoformat(),
                         normalized_value
                     ])
             
@@ -155,7 +147,7 @@ def get_normalized_data(
         # 获取基准价格（基准日期的收盘价）
         base_record = db.query(DailyOHLC).filter(
             DailyOHLC.symbol == symbol,
-            DailyOHLC.date <= base_date_obj
+            DailyOHLC.date <= base_date
         ).order_by(desc(DailyOHLC.date)).first()
         
         if not base_record or not base_record.close:
@@ -181,6 +173,73 @@ def get_normalized_data(
                 "data": data
             })
     
+    return series
+
+
+def _normalized_duckdb(
+    symbols: List[str],
+    start_date: date,
+    end_date: date,
+    base_date: date,
+    bar_interval: str,
+) -> List[dict]:
+    """所有品种的查询和归一化由 DuckDB 一条 SQL 完成，这里只按品种分组"""
+    table = analytics.normalized_series(symbols, start_date, end_date, base_date, bar_interval)
+    columns = table.to_pydict()
+    grouped = {}
+    for symbol, time, value in zip(columns["symbol"], columns["time"], columns["value"]):
+        grouped.setdefault(symbol, []).append([time, value])
+    
+    return [
+        {"symbol": symbol, "name": SYMBOL_NAMES.get(symbol, symbol), "data": grouped[symbol]}
+        for symbol in symbols if symbol in grouped
+    ]
+
+
+@router.get("/normalized")
+def get_normalized_data(
+    response: Response,
+    group: str = Query("precious_metals", description="分组: precious_metals, base_metals, energy, agriculture, all"),
+    period: str = Query("7d", description="周期: 1d, 3d, 7d, 14d, 30d, 1m, 3m, 6m, 1y, 3y, all"),
+    base_date: Optional[str] = Query(None, description="基准日期 YYYY-MM-DD，默认为周期起点"),
+    engine: Optional[str] = Query(None, description="查询引擎: sqlite, duckdb，默认按配置"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取归一化后的多品种数据，用于对比走势
+    实际使用的查询引擎见响应头 X-Query-Engine
+    """
+    if group not in CHART_GROUPS:
+        return {"error": f"未知分组: {group}，可选: {list(CHART_GROUPS.keys())}"}
+    
+    try:
+        engine = analytics.resolve_engine(engine)
+    except ValueError as e:
+        return {"error": str(e)}
+    
+    group_config = CHART_GROUPS[group]
+    symbols = group_config["symbols"]
+    
+    # 计算日期范围
+    days = get_period_days(period)
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days)
+    
+    # 如果指定了基准日期
+    if base_date:
+        try:
+            base_date_obj = datetime.strptime(base_date, "%Y-%m-%d").date()
+        except ValueError:
+            return {"error": "日期格式错误，请使用 YYYY-MM-DD"}
+    else:
+        base_date_obj = start_date
+    
+    if engine == "duckdb":
+        series = _normalized_duckdb(symbols, start_date, end_date, base_date_obj, get_bar_interval(days))
+    else:
+        series = _normalized_sqlite(db, symbols, start_date, end_date, base_date_obj, get_bar_interval(days))
+    response.headers["X-Query-Engine"] = engine
+    
     return {
         "group": group,
         "group_name": group_config["name"],
@@ -3,11 +3,10 @@
 """
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from typing import Optional, List
 from datetime import datetime
 
-from app.database import get_db, RealtimePrice
+from app.database import get_db, LatestPrice
 from app.config import SYMBOLS_CONFIG
 
 router = APIRouter()
@@ -21,16 +20,15 @@ def get_snapshot(
     """
     获取所有品种的最新价格快照
     """
-    # 获取每个品种的最新价格
+    # 一次读出所有品种的最新价格
+    latest = {row.symbol: row for row in db.query(LatestPrice).all()}
     latest_prices = {}
     
     for symbol, config in SYMBOLS_CONFIG.items():
         if market and config.get("market") != market:
             continue
             
-        price = db.query(RealtimePrice).filter(
-            RealtimePrice.symbol == symbol
-        ).order_by(desc(RealtimePrice.timestamp)).first()
+        price = latest.get(symbol)
         
         if price:
             latest_prices[symbol] = {
@@ -72,9 +70,7 @@ def get_symbol_snapshot(
         return {"error": f"未知品种: {symbol}"}
     
     config = SYMBOLS_CONFIG[symbol]
-    price = db.query(RealtimePrice).filter(
-        RealtimePrice.symbol == symbol
-    ).order_by(desc(RealtimePrice.timestamp)).first()
+    price = db.get(LatestPrice, symbol)
     
     if price:
         return {
@@ -0,0 +1,272 @@
+"""
+冷数据归档（Parquet）
+已结束的自然月按 表 / 品种 / 月份 写入分区 Parquet 文件：
+    DATA_DIR/archive/<表>/<键>=<品种>/month=YYYY-MM/data.parquet
+realtime_prices / spread_data 的原始行在 SQLite 中只保留 RETENTION_CONFIG["raw_days"] 天，
+保留策略删除原始行前先执行归档，且只删除已归档月份内的行。
+读取历史时，早于 SQLite 中最早一条记录的部分从归档文件内存映射读取
+"""
+import json
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    print("⚠️ pyarrow 未安装，冷数据归档不可用")
+
+from app.config import ARCHIVE_CONFIG
+from app.database import SessionLocal, RealtimePrice, SpreadData, DailyOHLC
+
+ARCHIVE_DIR = ARCHIVE_CONFIG["dir"]
+ARCHIVE_MANIFEST = ARCHIVE_DIR / "manifest.json"
+
+# 归档的表 {表名: {模型, 分区键, 时间列, 列}}
+ARCHIVE_SPECS = {
+    "realtime_prices": {
+        "model": RealtimePrice,
+        "key": "symbol",
+        "time": "timestamp",
+        "columns": ["timestamp", "symbol", "name", "price", "price_cny", "unit", "market"],
+    },
+    "spread_data": {
+        "model": SpreadData,
+        "key": "pair",
+        "time": "timestamp",
+        "columns": ["timestamp", "pair", "domestic_price", "foreign_price",
+                    "theoretical_price", "exchange_rate", "spread_rate"],
+    },
+    "daily_ohlc": {
+        "model": DailyOHLC,
+        "key": "symbol",
+        "time": "date",
+        "columns": ["date", "symbol", "name", "open", "high", "low", "close", "volume"],
+    },
+}
+
+
+def _month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _bound(table: str, d: date):
+    """月份边界转换为时间列的比较值（DateTime 列用 datetime，Date 列用 date）"""
+    return d if ARCHIVE_SPECS[table]["time"] == "date" else datetime.combine(d, datetime.min.time())
+
+
+def _partition_path(table: str, key_value: str, month: date):
+    key = ARCHIVE_SPECS[table]["key"]
+    return ARCHIVE_DIR / table / f"{key}={key_value}" / f"month={month:%Y-%m}" / "data.parquet"
+
+
+def _load_manifest() -> Dict[str, List[str]]:
+    if not ARCHIVE_MANIFEST.exists():
+        return {}
+    try:
+        return json.loads(ARCHIVE_MANIFEST.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"⚠️ 读取归档清单失败，将重新归档: {e}")
+        return {}
+
+
+def _save_manifest(manifest: Dict[str, List[str]]):
+    """先写临时文件再替换，避免中断时留下半个文件"""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = ARCHIVE_MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(ARCHIVE_MANIFEST)
+
+
+def archive_limit(today: Optional[date] = None) -> date:
+    """返回第一个未结束（不可归档）的月份：月底之后还要等 grace_days 天，等迟到的数据修正写完"""
+    today = today or date.today()
+    return _month_start(today - timedelta(days=ARCHIVE_CONFIG["grace_days"]))
+
+
+def archived_until(table: str) -> Optional[datetime]:
+    """从最早月份起连续归档到的时间点（之前的原始数据可以安全删除）；没有归档时返回 None"""
+    months = set(_load_manifest().get(table, []))
+    if not months:
+        return None
+    month = date.fromisoformat(min(months) + "-01")
+    while f"{month:%Y-%m}" in months:
+        month = _next_month(month)
+    return datetime.combine(month, datetime.min.time())
+
+
+def archive_month(db: Session, table: str, month: date) -> int:
+    """
+    把某个月的数据按品种写入 Parquet（先写临时文件再替换，重复执行会覆盖）
+
+    Returns:
+        归档的行数
+    """
+    spec = ARCHIVE_SPECS[table]
+    model = spec["model"]
+    time_column = getattr(model, spec["time"])
+    rows = db.query(*[getattr(model, c) for c in spec["columns"]]).filter(
+        time_column >= _bound(table, month),
+        time_column < _bound(table, _next_month(month)),
+    ).order_by(getattr(model, spec["key"]), time_column).all()
+    if not rows:
+        return 0
+
+    df = pd.DataFrame(rows, columns=spec["columns"])
+    if spec["time"] != "date":
+        df[spec["time"]] = pd.to_datetime(df[spec["time"]])
+    for key_value, group in df.groupby(spec["key"], sort=False):
+        path = _partition_path(table, key_value, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(
+            pa.Table.from_pandas(group, preserve_index=False),
+            tmp,
+            compression=ARCHIVE_CONFIG["compression"],
+        )
+        tmp.replace(path)
+    return len(df)
+
+
+def archive_closed_months(tables: Optional[Iterable[str]] = None, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    归档所有已结束且尚未归档的月份，每归档一个月更新一次清单，中断后从未完成的月份继续
+
+    Returns:
+        各表归档的行数
+    """
+    if not PYARROW_AVAILABLE:
+        return {}
+    tables = list(tables) if tables else list(ARCHIVE_SPECS)
+    limit = archive_limit(today)
+    manifest = _load_manifest()
+    summary = {}
+
+    db = SessionLocal()
+    try:
+        for table in tables:
+            spec = ARCHIVE_SPECS[table]
+            time_column = getattr(spec["model"], spec["time"])
+            done = set(manifest.get(table, []))
+            first = db.query(func.min(time_column)).scalar()
+            archived = 0
+            month = _month_start(first) if first else limit
+            while month < limit:
+                label = f"{month:%Y-%m}"
+                if label not in done:
+                    archived += archive_month(db, table, month)
+                    done.add(label)
+                    manifest[table] = sorted(done)
+                    _save_manifest(manifest)
+                month = _next_month(month)
+            summary[table] = archived
+    finally:
+        db.close()
+    return summary
+
+
+def _archived_keys(table: str) -> List[str]:
+    root = ARCHIVE_DIR / table
+    if not root.exists():
+        return []
+    return [p.name.split("=", 1)[1] for p in root.iterdir() if p.is_dir() and "=" in p.name]
+
+
+def archive_files(table: str, start, end=None, keys: Optional[Sequence[str]] = None) -> List[Path]:
+    """返回覆盖 [start, end] 的已存在的分区文件（keys 为空时取所有已归档品种）"""
+    last_month = _month_start(end if end is not None else date.today())
+    paths = []
+    for key_value in (keys or _archived_keys(table)):
+        month = _month_start(start)
+        while month <= last_month:
+            path = _partition_path(table, key_value, month)
+            if path.exists():
+                paths.append(path)
+            month = _next_month(month)
+    return paths
+
+
+def read_archive(
+    table: str,
+    start,
+    end=None,
+    keys: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    读取归档中 [start, end] 的数据，只打开覆盖该区间的分区文件，按内存映射读取
+
+    Returns:
+        按品种、时间排序的 DataFrame，列同 ARCHIVE_SPECS[table]["columns"]；没有数据时为空表
+    """
+    spec = ARCHIVE_SPECS[table]
+    if not PYARROW_AVAILABLE:
+        return pd.DataFrame(columns=spec["columns"])
+
+    filters = [(spec["time"], ">=", start)]
+    if end is not None:
+        filters.append((spec["time"], "<=", end))
+    tables = [
+        pq.read_table(path, columns=spec["columns"], memory_map=True, filters=filters)
+        for path in archive_files(table, start, end, keys)
+    ]
+
+    if not tables:
+        return pd.DataFrame(columns=spec["columns"])
+    df = pa.concat_tables(tables).to_pandas()
+    return df.sort_values([spec["key"], spec["time"]], ignore_index=True)
+
+
+def read_history(
+    db: Session,
+    table: str,
+    start,
+    end=None,
+    keys: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    读取 [start, end] 的历史：SQLite 中仍有的部分直接查询，
+    早于 SQLite 最早一条记录的部分从 Parquet 归档读取
+
+    Returns:
+        按时间、品种排序的 DataFrame，列同 ARCHIVE_SPECS[table]["columns"]
+    """
+    spec = ARCHIVE_SPECS[table]
+    model = spec["model"]
+    key_column, time_column = getattr(model, spec["key"]), getattr(model, spec["time"])
+
+    hot_query = db.query(func.min(time_column))
+    if keys:
+        hot_query = hot_query.filter(key_column.in_(keys))
+    hot_start = hot_query.scalar()
+
+    query = db.query(*[getattr(model, c) for c in spec["columns"]]).filter(time_column >= start)
+    if end is not None:
+        query = query.filter(time_column <= end)
+    if keys:
+        query = query.filter(key_column.in_(keys))
+    frames = [pd.DataFrame(query.all(), columns=spec["columns"])]
+
+    if hot_start is None or start < hot_start:
+        cold_end = hot_start if end is None else (min(hot_start, end) if hot_start is not None else end)
+        frames.insert(0, read_archive(table, start, cold_end, keys))
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=spec["columns"])
+    df = pd.concat(frames, ignore_index=True)
+    if spec["time"] != "date":
+        df[spec["time"]] = pd.to_datetime(df[spec["time"]])
+    # 归档与 SQLite 重叠的部分以 SQLite 为准
+    df = df.drop_duplicates([spec["key"], spec["time"]], keep="last")
+    return df.sort_values([spec["time"], spec["key"]], ignore_index=True)
@@ -0,0 +1,383 @@
+"""
+K 线聚合引擎
+把 realtime_prices 中的分钟行情增量聚合为 1m/5m/15m/1h/1d K 线，写入 price_bars
+按 realtime_prices.id 记录水位，每次只处理上次之后写入的行情
+分钟行情只在价格变化或到达心跳间隔时写入（TICK_CONFIG），读取时用 fill_bar_gaps /
+forward_fill_ticks 在心跳间隔内前向填充；聚合时每根 K 线以起点之前最后一条行情的价格开盘
+"""
+import math
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.config import SYMBOLS_CONFIG, WRITER_CONFIG, TICK_CONFIG, TRADING_DAY_CONFIG
+from app.database import RealtimePrice, PriceBar, BarWatermark, DailyOHLC
+from app.fetchers.normalize import to_records
+from app.writer import db_writer
+
+# 支持的 K 线周期 {周期: pandas 频率}
+BAR_INTERVALS = {
+    "1m": "1min",
+    "5m": "5min",
+    "15m": "15min",
+    "1h": "1h",
+    "1d": "1D",
+}
+
+# 水位记录名
+WATERMARK = "realtime_prices"
+
+# 聚合任务串行执行（定时任务与手动触发可能同时到达）
+_build_lock = threading.Lock()
+
+
+def aggregate_ticks(ticks: pd.DataFrame, interval: str, carry: Optional[pd.DataFrame] = None) -> List[dict]:
+    """
+    把一批行情聚合为指定周期的 K 线
+
+    行情只在价格变化时存储，K 线开始时的价格是上一条行情带入的：第一条行情不在 K 线起点时，
+    以起点之前最后一条行情（心跳间隔内）的价格作为开盘价，并计入最高 / 最低价。
+    ticks 列只统计 K 线内实际存储的行情条数（价格变化和心跳行），不含带入的价格
+
+    Args:
+        ticks: 列为 symbol, timestamp, price，已按时间排序
+        interval: BAR_INTERVALS 中的周期
+        carry: 本批之前各品种最后一条已存储的行情（列同 ticks），用于本批第一根 K 线的开盘价
+    """
+    freq = BAR_INTERVALS[interval]
+    ticks = ticks[["symbol", "timestamp", "price"]].assign(
+        bar_time=ticks["timestamp"].dt.floor(freq), stored=1,
+    )
+
+    # 每根 K 线起点之前最后一条行情（本批之前的 + 本批内的）
+    history = pd.concat([carry, ticks[["symbol", "timestamp", "price"]]]) if carry is not None else ticks
+    history = history.rename(columns={"timestamp": "prev_time", "price": "prev_price"})
+    starts = ticks.groupby(["symbol", "bar_time"], sort=False)["timestamp"].min().reset_index()
+    starts = starts[starts["timestamp"] > starts["bar_time"]]
+    history = history.astype({"symbol": starts["symbol"].dtype, "prev_time": starts["bar_time"].dtype})
+    seeds = pd.merge_asof(
+        starts.sort_values("bar_time"),
+        history[["symbol", "prev_time", "prev_price"]].sort_values("prev_time"),
+        left_on="bar_time", right_on="prev_time", by="symbol",
+        direction="backward", allow_exact_matches=False,
+    )
+    heartbeat = pd.Timedelta(minutes=TICK_CONFIG["heartbeat_minutes"])
+    seeds = seeds[seeds["prev_price"].notna() & (seeds["bar_time"] - seeds["prev_time"] < heartbeat)]
+    seeds = pd.DataFrame({
+        "symbol": seeds["symbol"], "timestamp": seeds["bar_time"], "price": seeds["prev_price"],
+        "bar_time": seeds["bar_time"], "stored": 0,
+    })
+
+    bars = (
+        pd.concat([seeds, ticks], ignore_index=True)
+        .sort_values(["timestamp", "stored"], kind="stable")
+        .groupby(["symbol", "bar_time"], sort=False)
+        .agg(
+            open=("price", "first"), high=("price", "max"), low=("price", "min"),
+            close=("price", "last"), ticks=("stored", "sum"),
+        )
+        .reset_index()
+    )
+    bars["bar_time"] = pd.Series(bars["bar_time"].dt.to_pydatetime(), index=bars.index, dtype=object)
+    bars["interval"] = interval
+    return to_records(bars)
+
+
+def _carry_in(db: Session, ticks: pd.DataFrame) -> pd.DataFrame:
+    """本批各品种第一条行情之前最后一条已存储的行情（走 ix_tick_instrument_ts 索引，每个品种一次查询）"""
+    rows = []
+    for symbol, first in ticks.groupby("symbol")["timestamp"].min().items():
+        prev = db.query(RealtimePrice.timestamp, RealtimePrice.price).filter(
+            RealtimePrice.symbol == symbol,
+            RealtimePrice.timestamp < first.to_pydatetime(),
+            RealtimePrice.price.isnot(None),
+        ).order_by(RealtimePrice.timestamp.desc()).first()
+        if prev:
+            rows.append((symbol, prev.timestamp, prev.price))
+    carry = pd.DataFrame(rows, columns=["symbol", "timestamp", "price"])
+    carry["timestamp"] = pd.to_datetime(carry["timestamp"])
+    return carry
+
+
+def _merge_bars(db: Session, rows: List[dict]):
+    """
+    合并写入 K 线：新 K 线直接插入；已有 K 线保留开盘价，
+    合并最高 / 最低价，收盘价取新数据，条数累加
+    """
+    if not rows:
+        return
+    table = PriceBar.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["symbol", "interval", "bar_time"],
+        set_={
+            "high": func.max(table.c.high, stmt.excluded.high),
+            "low": func.min(table.c.low, stmt.excluded.low),
+            "close": stmt.excluded.close,
+            "ticks": table.c.ticks + stmt.excluded.ticks,
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def _build_batch(db: Session, batch_size: int) -> Tuple[int, int, int]:
+    """
+    聚合水位之后的一批行情（在单写线程中执行）
+
+    Returns:
+        (处理的行情条数, 写入的 K 线条数, 新水位)
+    """
+    watermark = db.get(BarWatermark, WATERMARK)
+    if watermark is None:
+        watermark = BarWatermark(name=WATERMARK, last_id=0)
+        db.add(watermark)
+
+    rows = db.query(
+        RealtimePrice.id, RealtimePrice.symbol, RealtimePrice.timestamp, RealtimePrice.price
+    ).filter(
+        RealtimePrice.id > watermark.last_id
+    ).order_by(RealtimePrice.id).limit(batch_size).all()
+
+    if not rows:
+        return 0, 0, watermark.last_id
+
+    ticks = pd.DataFrame(rows, columns=["id", "symbol", "timestamp", "price"])
+    ticks["timestamp"] = pd.to_datetime(ticks["timestamp"])
+    ticks = ticks.dropna(subset=["timestamp", "price"]).sort_values("timestamp", kind="stable")
+
+    carry = _carry_in(db, ticks)
+    bars = []
+    for interval in BAR_INTERVALS:
+        bars.extend(aggregate_ticks(ticks, interval, carry))
+    _merge_bars(db, bars)
+
+    watermark.last_id = rows[-1].id
+    watermark.updated_at = datetime.now()
+    return len(rows), len(bars), watermark.last_id
+
+
+def build_bars(batch_size: int = 20000) -> Dict[str, int]:
+    """
+    增量聚合 K 线
+
+    从水位之后按 id 顺序分批读取行情，每批聚合出各周期 K 线后与已有 K 线合并，
+    K 线和水位在同一事务中提交，中断后重跑不会重复计数
+
+    Returns:
+        {"ticks": 处理的行情条数, "bars": 写入的 K 线条数, "last_id": 当前水位}
+    """
+    result = {"ticks": 0, "bars": 0, "last_id": 0}
+
+    with _build_lock:
+        while True:
+            ticks, bars, last_id = db_writer.write(
+                lambda db: _build_batch(db, batch_size), name="bars",
+                timeout=WRITER_CONFIG["submit_timeout"],
+            )
+            result["ticks"] += ticks
+            result["bars"] += bars
+            result["last_id"] = last_id
+            if ticks < batch_size:
+                break
+
+    return result
+
+
+def _clear_bars(db: Session):
+    db.query(PriceBar).delete()
+    db.query(BarWatermark).filter(BarWatermark.name == WATERMARK).delete()
+
+
+def rebuild_bars() -> Dict[str, int]:
+    """清空 K 线和水位后全量重新聚合"""
+    with _build_lock:
+        db_writer.write(_clear_bars, name="bars", timeout=WRITER_CONFIG["submit_timeout"])
+    return build_bars()
+
+
+def query_bars(
+    db: Session,
+    symbol: str,
+    interval: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fill: bool = False,
+) -> List[PriceBar]:
+    """按时间顺序查询某品种的 K 线，fill=True 时补齐价格未变化而没有行情的 K 线"""
+    query = db.query(PriceBar).filter(
+        PriceBar.symbol == symbol,
+        PriceBar.interval == interval,
+    )
+    if start is not None:
+        query = query.filter(PriceBar.bar_time >= start)
+    if end is not None:
+        query = query.filter(PriceBar.bar_time <= end)
+    bars = query.order_by(PriceBar.bar_time).all()
+    return fill_bar_gaps(bars, interval, end) if fill else bars
+
+
+def fill_bar_gaps(bars: List[PriceBar], interval: str, end: Optional[datetime] = None) -> List[PriceBar]:
+    """
+    补齐心跳间隔内缺失的 K 线（开高低收均为上一根收盘价，ticks=0，不写入数据库）
+    超过心跳间隔仍没有行情视为停止采集，保持空缺
+    """
+    step = pd.Timedelta(BAR_INTERVALS[interval]).to_pytimedelta()
+    heartbeat = timedelta(minutes=TICK_CONFIG["heartbeat_minutes"])
+    if interval == "1d" or step >= heartbeat or not bars:
+        return bars
+
+    limit = end or datetime.now()
+    filled = []
+    for i, bar in enumerate(bars):
+        filled.append(bar)
+        next_time = bars[i + 1].bar_time if i + 1 < len(bars) else None
+        t = bar.bar_time + step
+        while t - bar.bar_time < heartbeat and t <= limit and (next_time is None or t < next_time):
+            filled.append(PriceBar(
+                symbol=bar.symbol, interval=interval, bar_time=t,
+                open=bar.close, high=bar.close, low=bar.close, close=bar.close, ticks=0,
+            ))
+            t += step
+    return filled
+
+
+def forward_fill_ticks(ticks: pd.DataFrame, end: Optional[datetime] = None, key: str = "symbol") -> pd.DataFrame:
+    """
+    把只记录变化的分钟行情还原为逐分钟序列：每行之后按分钟重复，直到下一行、心跳间隔或 end
+    重复的行沿用原行的秒数；超过心跳间隔仍没有行情视为停止采集，保持空缺
+
+    Args:
+        ticks: 至少包含 key 和 timestamp 列
+    """
+    if ticks.empty:
+        return ticks
+    minute = pd.Timedelta(minutes=1)
+    df = ticks.sort_values([key, "timestamp"], ignore_index=True)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+
+    span_end = df.groupby(key, sort=False)["timestamp"].shift(-1)
+    span_end = span_end.fillna(pd.Timestamp(end or datetime.now()))
+    span_end = span_end.clip(upper=df["timestamp"] + pd.Timedelta(minutes=TICK_CONFIG["heartbeat_minutes"]))
+    # 采集时间有秒级抖动：距下一行不足半分钟的分钟不再补
+    repeats = ((span_end - df["timestamp"] - minute / 2) / minute).apply(math.ceil).clip(lower=1)
+
+    filled = df.loc[df.index.repeat(repeats)]
+    offset = filled.groupby(level=0).cumcount()
+    filled = filled.assign(timestamp=filled["timestamp"] + offset * minute)
+    return filled.sort_values(["timestamp", key], ignore_index=True)
+
+
+def _parse_hours(spec: Optional[str]) -> Optional[set]:
+    """把 "9-11,13-15" 形式的小时段解析为小时集合（两端都包含），None 表示不限制"""
+    if not spec:
+        return None
+    hours = set()
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        hours.update(range(int(first), int(last or first) + 1))
+    return hours
+
+
+def trading_day(bar_time: datetime, market: str) -> Optional[date]:
+    """
+    1h K 线所属的交易日（TRADING_DAY_CONFIG），交易时段外或落在周末不顺延时返回 None
+    """
+    config = TRADING_DAY_CONFIG.get(market)
+    if config is None:
+        return bar_time.date()
+    sessions = _parse_hours(config["session_hours"])
+    if sessions is not None and bar_time.hour not in sessions:
+        return None
+    day = (bar_time + timedelta(hours=config["offset_hours"])).date()
+    if config["roll_weekend"]:
+        # 开盘日是周末（含周日夜间）的是心跳行情；周五夜盘顺延到周一
+        if (bar_time - timedelta(hours=config["offset_hours"])).weekday() >= 5:
+            return None
+        if day.weekday() >= 5:
+            day += timedelta(days=7 - day.weekday())
+    elif day.weekday() >= 5:
+        return None
+    return day
+
+
+def _known_trading_days(db: Session, market: str, start: date) -> set:
+    """同一市场各品种官方日线（成交量非空）出现过的日期，即已知的交易日"""
+    symbols = [s for s, c in SYMBOLS_CONFIG.items() if c.get("market") == market]
+    return {
+        d for (d,) in db.query(DailyOHLC.date).filter(
+            DailyOHLC.symbol.in_(symbols),
+            DailyOHLC.volume.isnot(None),
+            DailyOHLC.date >= start,
+        ).distinct()
+    }
+
+
+def _fill_daily(db: Session, symbol: str, since: Optional[date]) -> int:
+    # 多取一天，包含归属 since 当天的前一晚夜盘
+    start = datetime.combine(since - timedelta(days=1), datetime.min.time()) if since else None
+    bars = query_bars(db, symbol, "1h", start=start)
+    if not bars:
+        return 0
+
+    market = SYMBOLS_CONFIG.get(symbol, {}).get("market")
+    days: Dict[date, dict] = {}
+    for bar in bars:
+        day = trading_day(bar.bar_time, market)
+        if day is None or (since and day < since):
+            continue
+        row = days.get(day)
+        if row is None:
+            days[day] = {"open": bar.open, "high": bar.high, "low": bar.low, "close": bar.close}
+        else:
+            row["high"] = max(row["high"], bar.high)
+            row["low"] = min(row["low"], bar.low)
+            row["close"] = bar.close
+    if not days:
+        return 0
+
+    # 只补其他品种已有官方日线、本品种缺失的交易日，周末和节假日不会出现在其中
+    first = min(days)
+    known = _known_trading_days(db, market, first)
+    existing = {
+        d for (d,) in db.query(DailyOHLC.date).filter(
+            DailyOHLC.symbol == symbol,
+            DailyOHLC.date >= first,
+        )
+    }
+    name = SYMBOLS_CONFIG.get(symbol, {}).get("name", symbol)
+    rows = [{
+        "date": day,
+        "symbol": symbol,
+        "name": name,
+        **ohlc,
+        "volume": None,
+    } for day, ohlc in sorted(days.items()) if day in known and day not in existing]
+
+    if rows:
+        stmt = sqlite_insert(DailyOHLC.__table__).on_conflict_do_nothing(
+            index_elements=["date", "symbol"]
+        )
+        db.execute(stmt, rows)
+    return len(rows)
+
+
+def fill_daily_from_bars(symbol: str, since: Optional[date] = None) -> int:
+    """
+    用本地 1h K 线按交易日聚合，补齐 daily_ohlc（AkShare 日线接口失败时使用）
+
+    行情按 TRADING_DAY_CONFIG 归属交易日（夜盘计入下一交易日，时段外的心跳行情不计入），
+    只插入同市场其他品种已有官方日线、而本品种缺失的日期，不覆盖官方数据；成交量记为空，
+    之后日线接口恢复时由增量更新覆盖（见 daily_fetcher.get_last_daily_dates）
+
+    Returns:
+        补齐的条数
+    """
+    return db_writer.write(
+        lambda db: _fill_daily(db, symbol, since), name="daily_fill",
+        timeout=WRITER_CONFIG["submit_timeout"],
+    )
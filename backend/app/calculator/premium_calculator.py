@@ -4,11 +4,11 @@
 from datetime import datetime
 from typing import Dict, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 
-from app.database import SessionLocal, RealtimePrice, SpreadData, RatioData
-from app.config import PREMIUM_PAIRS, SYMBOLS_CONFIG
-from app.fetchers.exchange_rate_fetcher import get_latest_exchange_rate
+from app.database import SessionLocal, LatestPrice, SpreadData, RatioData, insert_ignore
+from app.config import PREMIUM_PAIRS, SYMBOLS_CONFIG, WRITER_CONFIG
+from app.writer import db_writer
+from app.fetchers.exchange_rate_fetcher import get_latest_exchange_rate_info
 from app.calculator.converter import (
     get_theoretical_price,
     calculate_premium_rate,
@@ -19,13 +19,16 @@ from app.calculator.converter import (
 
 def get_latest_price(db: Session, symbol: str) -> Optional[float]:
     """获取某品种的最新价格"""
-    record = db.query(RealtimePrice).filter(
-        RealtimePrice.symbol == symbol
-    ).order_by(desc(RealtimePrice.timestamp)).first()
+    record = db.get(LatestPrice, symbol)
     
     return record.price if record else None
 
 
+def get_latest_prices(db: Session) -> Dict[str, float]:
+    """一次获取所有品种的最新价格"""
+    return {row.symbol: row.price for row in db.query(LatestPrice).all() if row.price}
+
+
 def calculate_current_premiums(db: Session = None, return_prices: bool = False) -> Dict:
     """
     计算当前所有品种的溢价率
@@ -43,20 +46,21 @@ def calculate_current_premiums(db: Session = None, return_prices: bool = False)
         close_db = True
     
     try:
-        # 获取汇率
-        exchange_rate = get_latest_exchange_rate()
+        # 获取汇率（进程内缓存，过期时标记 stale）
+        fx_info = get_latest_exchange_rate_info()
+        exchange_rate = fx_info["rate"]
         
         result = {
             "timestamp": datetime.now().isoformat(),
             "exchange_rate": exchange_rate,
+            "exchange_rate_stale": fx_info["stale"],
         }
         
         # 获取所有需要的价格
-        prices = {}
-        for symbol in SYMBOLS_CONFIG.keys():
-            price = get_latest_price(db, symbol)
-            if price:
-                prices[symbol] = price
+        prices = {
+            symbol: price for symbol, price in get_latest_prices(db).items()
+            if symbol in SYMBOLS_CONFIG
+        }
         
         # 计算各品种溢价率
         # 黄金
@@ -149,90 +153,85 @@ def calculate_and_save_premiums():
         
         timestamp = datetime.now()
         exchange_rate = result.get("exchange_rate", 7.25)
+        spread_rows = []
+        ratio_rows = []
         
         # 保存黄金溢价率
         if "gold" in result:
             gold = result["gold"]
-            record = SpreadData(
+            spread_rows.append(dict(
                 timestamp=timestamp,
                 pair="GOLD",
-                name="黄金溢价率",
                 domestic_price=gold["shfe_cny_g"],
                 foreign_price=gold["london_usd_oz"],
                 theoretical_price=gold["theoretical_cny_g"],
                 exchange_rate=exchange_rate,
                 spread_rate=gold["premium_rate"]
-            )
-            db.add(record)
+            ))
         
         # 保存白银溢价率
         if "silver" in result:
             silver = result["silver"]
-            record = SpreadData(
+            spread_rows.append(dict(
                 timestamp=timestamp,
                 pair="SILVER",
-                name="白银溢价率",
                 domestic_price=silver["shfe_cny_kg"],
                 foreign_price=silver["london_usd_oz"],
                 theoretical_price=silver["theoretical_cny_kg"],
                 exchange_rate=exchange_rate,
                 spread_rate=silver["premium_rate"]
-            )
-            db.add(record)
+            ))
         
         # 保存铜溢价率
         if "copper" in result:
             copper = result["copper"]
-            record = SpreadData(
+            spread_rows.append(dict(
                 timestamp=timestamp,
                 pair="COPPER",
-                name="铜溢价率",
                 domestic_price=copper["shfe_cny_ton"],
                 foreign_price=copper["lme_usd_ton"],
                 theoretical_price=copper["theoretical_cny_ton"],
                 exchange_rate=exchange_rate,
                 spread_rate=copper["premium_rate"]
-            )
-            db.add(record)
+            ))
         
         # 保存铝溢价率
         if "aluminum" in result:
             aluminum = result["aluminum"]
-            record = SpreadData(
+            spread_rows.append(dict(
                 timestamp=timestamp,
                 pair="ALUMINUM",
-                name="铝溢价率",
                 domestic_price=aluminum["shfe_cny_ton"],
                 foreign_price=aluminum["lme_usd_ton"],
                 theoretical_price=aluminum["theoretical_cny_ton"],
                 exchange_rate=exchange_rate,
                 spread_rate=aluminum["premium_rate"]
-            )
-            db.add(record)
+            ))
         
         # 保存比值指标
         if "ratios" in result:
             ratios = result["ratios"]
             
             if "gold_silver" in ratios:
-                record = RatioData(
+                ratio_rows.append(dict(
                     timestamp=timestamp,
                     ratio_type="GOLD_SILVER",
-                    name="金银比",
                     value=ratios["gold_silver"]
-                )
-                db.add(record)
+                ))
             
             if "copper_gold" in ratios:
-                record = RatioData(
+                ratio_rows.append(dict(
                     timestamp=timestamp,
                     ratio_type="COPPER_GOLD",
-                    name="铜金比",
                     value=ratios["copper_gold"]
-                )
-                db.add(record)
+                ))
+        
+        def write(wdb):
+            # 同一时间戳重复计算时跳过冲突的行
+            insert_ignore(wdb, SpreadData, spread_rows)
+            insert_ignore(wdb, RatioData, ratio_rows)
         
-        db.commit()
+        db_writer.write(write, name="premiums", timeout=WRITER_CONFIG["submit_timeout"])
         print(f"✅ 溢价率数据已保存")
         
         # 检查告警条件
@@ -243,7 +242,6 @@ def calculate_and_save_premiums():
             print(f"⚠️ 告警检查失败（不影响主流程）: {alert_error}")
         
     except Exception as e:
-        db.rollback()
         print(f"❌ 保存溢价率数据失败: {e}")
     finally:
         db.close()
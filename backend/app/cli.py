@@ -0,0 +1,136 @@
+"""
+命令行入口 - 在 Web 进程之外运行数据维护任务
+
+用法（在 backend 目录下）:
+    python -m app.cli update-daily              # 增量更新日K线
+    python -m app.cli update-daily --full       # 重新写入最近 N 天
+    python -m app.cli backfill-daily            # 回填全量日K线历史，可断点续跑
+    python -m app.cli backfill-daily --symbols SHFE.AU XAU --restart
+    python -m app.cli build-bars [--rebuild]    # 聚合分钟行情为 K 线
+    python -m app.cli check-plans               # 检查热点查询是否命中索引
+    python -m app.cli rebuild-latest            # 从分钟行情重建最新价格表
+    python -m app.cli retention                 # 降采样并清理超出保留期的分钟数据
+    python -m app.cli archive [--tables ...]    # 把已结束的月份归档为 Parquet
+    python -m app.cli vacuum                    # 完整 VACUUM（启用增量 VACUUM，需停写）
+"""
+import argparse
+import sys
+
+from app.database import init_db
+
+
+def cmd_update_daily(args):
+    from app.fetchers.daily_fetcher import update_daily_ohlc
+    update_daily_ohlc(days=args.days, incremental=not args.full)
+
+
+def cmd_backfill_daily(args):
+    from app.fetchers.daily_fetcher import backfill_daily_ohlc
+    checkpoint = backfill_daily_ohlc(
+        symbols=args.symbols,
+        restart=args.restart,
+        chunk_size=args.chunk_size,
+    )
+    failed = [s for s, state in checkpoint.items() if state.get("status") != "done"]
+    if failed:
+        print(f"未完成的品种: {', '.join(failed)}（再次运行即可续跑）")
+        return 1
+    return 0
+
+
+def cmd_build_bars(args):
+    from app.calculator.bar_builder import build_bars, rebuild_bars
+    result = rebuild_bars() if args.rebuild else build_bars()
+    print(f"K线聚合完成: {result['ticks']} 条行情 -> {result['bars']} 条K线，水位 {result['last_id']}")
+
+
+def cmd_check_plans(args):
+    from app.database import engine
+    from app.migrations import check_query_plans, get_schema_version
+    with engine.connect() as conn:
+        print(f"数据库版本: v{get_schema_version(conn)}")
+    results = check_query_plans(engine)
+    for name, result in results.items():
+        print(f"{'✅' if result['ok'] else '❌'} {name}（期望索引 {result['index']}）")
+        for step in result["plan"]:
+            print(f"     {step}")
+    return 0 if all(r["ok"] for r in results.values()) else 1
+
+
+def cmd_rebuild_latest(args):
+    from app.database import rebuild_latest_prices
+    from app.writer import db_writer
+    count = db_writer.write(rebuild_latest_prices, name="latest_prices")
+    print(f"最新价格表已重建: {count} 个品种")
+
+
+def cmd_retention(args):
+    from app.retention import run_retention
+    for step, count in run_retention().items():
+        print(f"  {step}: {count}")
+
+
+def cmd_archive(args):
+    from app.archive import PYARROW_AVAILABLE, archive_closed_months
+    if not PYARROW_AVAILABLE:
+        print("pyarrow 未安装，无法归档")
+        return 1
+    for table, count in archive_closed_months(args.tables).items():
+        print(f"  {table}: {count}")
+
+
+def cmd_vacuum(args):
+    from app.database import engine
+    from app.migrations import vacuum
+    mode = vacuum(engine)
+    print(f"VACUUM 完成，auto_vacuum = {mode}（2 为 INCREMENTAL）")
+    return 0 if mode == 2 else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="大宗商品战情室 数据维护命令")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("update-daily", help="更新日K线（默认增量）")
+    p.add_argument("--days", type=int, default=30, help="库中没有该品种或使用 --full 时取最近 N 天")
+    p.add_argument("--full", action="store_true", help="不做增量，重新写入最近 N 天")
+    p.set_defaults(func=cmd_update_daily)
+
+    p = sub.add_parser("backfill-daily", help="回填全量日K线历史（断点续跑）")
+    p.add_argument("--symbols", nargs="+", help="只回填指定品种，如 SHFE.AU XAU")
+    p.add_argument("--restart", action="store_true", help="忽略断点，从头回填")
+    p.add_argument("--chunk-size", type=int, default=1000, help="每次提交的K线条数")
+    p.set_defaults(func=cmd_backfill_daily)
+
+    p = sub.add_parser("build-bars", help="把分钟行情增量聚合为 K 线")
+    p.add_argument("--rebuild", action="store_true", help="清空已有 K 线后全量重建")
+    p.set_defaults(func=cmd_build_bars)
+
+    p = sub.add_parser("check-plans", help="检查热点查询的执行计划，有全表扫描时返回非零")
+    p.set_defaults(func=cmd_check_plans)
+
+    p = sub.add_parser("rebuild-latest", help="从 realtime_prices 重建 latest_prices 最新价格表")
+    p.set_defaults(func=cmd_rebuild_latest)
+
+    p = sub.add_parser("retention", help="执行数据保留策略（降采样、分批删除、增量 VACUUM）")
+    p.set_defaults(func=cmd_retention)
+
+    p = sub.add_parser("archive", help="把已结束月份的分钟行情、溢价率和日K线归档为 Parquet")
+    p.add_argument("--tables", nargs="+", choices=["realtime_prices", "spread_data", "daily_ohlc"],
+                   help="只归档指定的表")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("vacuum", help="完整 VACUUM，使增量 VACUUM 生效（重写整个数据库文件，执行期间阻塞写入）")
+    p.set_defaults(func=cmd_vacuum)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    init_db()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
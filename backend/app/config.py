@@ -7,9 +7,62 @@ from pathlib import Path
 # 项目根目录
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# 数据库路径
-DATABASE_PATH = BASE_DIR / "data" / "commodities.db"
+# 数据库路径（可通过环境变量 DATABASE_PATH 覆盖，便于基准测试使用临时库）
+DATABASE_PATH = Path(os.getenv("DATABASE_PATH", BASE_DIR / "data" / "commodities.db"))
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# 只读 API 的异步驱动（aiosqlite），仅在 API_CONFIG["async_reads"] 开启时使用
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+# SQLite 存储配置档（环境变量 DB_PROFILE 选择）
+# 每个新连接执行对应的 PRAGMA；pool_* 为 SQLAlchemy 连接池参数
+# legacy 保持 SQLite 默认设置（回滚日志、synchronous=FULL、无忙等待），仅用于对比
+DB_PROFILES = {
+    "legacy": {
+        "pragmas": {},
+        "pool_size": 5,
+        "max_overflow": 10,
+    },
+    # 默认：WAL 下读写互不阻塞；synchronous=NORMAL 在 WAL 下只在检查点时 fsync，断电最多丢最近一次事务
+    "balanced": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -65536,       # 64MB（负数单位为 KB）
+            "mmap_size": 268435456,     # 256MB
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,       # 毫秒，写锁被占用时等待而不是立即报 database is locked
+        },
+        "pool_size": 10,
+        "max_overflow": 20,
+    },
+    # 每次提交都 fsync，适合不能丢任何一条记录的部署
+    "durable": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "cache_size": -65536,
+            "mmap_size": 268435456,
+            "temp_store": "MEMORY",
+            "busy_timeout": 10000,
+        },
+        "pool_size": 10,
+        "max_overflow": 20,
+    },
+    # 基准测试 / 可重建的数据：不等待 fsync
+    "fast": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "cache_size": -262144,      # 256MB
+            "mmap_size": 1073741824,    # 1GB
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+        },
+        "pool_size": 20,
+        "max_overflow": 40,
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "balanced")
 
 # 确保数据目录存在
 DATA_DIR = BASE_DIR / "data"
@@ -17,6 +70,12 @@ DATA_DIR.mkdir(exist_ok=True)
 
 # API 配置
 API_PREFIX = "/api"
+API_CONFIG = {
+    # 只读接口改用异步处理函数 + aiosqlite（app/api/async_reads.py）。默认关闭：
+    # benchmarks/bench_async_api.py 实测本地 SQLite 下吞吐低约 25%、p99 明显更差，
+    # aiosqlite 每个连接一个线程的转发开销大于线程池本身；重新测量胜出前保持同步处理函数
+    "async_reads": os.getenv("ASYNC_READS", "0") == "1",
+}
 
 # 定时任务配置
 SCHEDULER_CONFIG = {
@@ -32,7 +91,80 @@ SCHEDULER_CONFIG = {
     "macro_update_day": 15,
 }
 
+# 交易日归属配置（按 SYMBOLS_CONFIG 的 market），用于把本地 K 线聚合为日线
+TRADING_DAY_CONFIG = {
+    # 国内夜盘归属下一交易日：北京时间 +3 小时后取日期，周五夜盘顺延到周一；交易时段外和周末的心跳行情不计入
+    "CN": {
+        "offset_hours": 3,
+        "session_hours": ",".join([SCHEDULER_CONFIG["cn_futures"]["day_hours"],
+                                   SCHEDULER_CONFIG["cn_futures"]["night_hours"]]),
+        "roll_weekend": True,
+    },
+    # 外盘按美国 / 伦敦收盘划分交易日：北京时间 -6 小时后取日期，落在周末的丢弃
+    "INTL": {"offset_hours": -6, "session_hours": None, "roll_weekend": False},
+    "LME": {"offset_hours": -6, "session_hours": None, "roll_weekend": False},
+}
+
+# 数据采集并发与超时配置（秒）
+FETCH_CONFIG = {
+    "cn_batch_quote": True,     # 国内主力合约先走一次批量行情请求，缺失的再逐个采集
+    "max_workers": 8,           # 每个数据源的采集线程池大小（卡住的请求只占满本数据源的线程），设为 1 即各数据源串行采集
+    "cn_call_timeout": 20,      # 单品种调用超时（含重试等待）
+    "cn_job_timeout": 45,       # 整体任务超时，保证每分钟任务不跨周期
+    "source_timeout": 30,       # 其他单个数据源调用超时（含重试等待）
+    "daily_job_timeout": 300,   # 日K线更新整体超时（各品种并发下载）
+    "retry_max_attempts": 3,    # 最多尝试次数（含首次）
+    "retry_base_delay": 1.0,    # 首次重试基础等待，之后指数增长并带随机抖动
+    "retry_max_delay": 8.0,     # 单次重试等待上限
+    "breaker_failure_threshold": 3,   # 数据源连续失败几次后熔断
+    "breaker_recovery_timeout": 300,  # 熔断后多久放行一次探测
+    "fx_hedged": True,          # 汇率数据源对冲并发请求；关闭时按优先级逐个尝试
+    "fx_hedge_delay": 0.5,      # 上一个数据源未返回时，间隔多久发起下一个
+    "fx_hedge_grace": 1.0,      # 低优先级先返回后，最多再等高优先级多久
+    "fx_deadline": 8.0,         # 汇率查询整体截止时间
+    "fx_cache_ttl": 3600,       # 进程内汇率缓存有效期，过期后读取方触发后台刷新
+    "fx_retry_interval": 60,    # 读取方触发的刷新失败后，至少间隔多久再试（秒）
+}
+
+# 单写线程配置
+WRITER_CONFIG = {
+    "max_queue": 1000,          # 写入队列长度上限，满时生产者阻塞
+    "commit_window": 0.05,      # 收到任务后再等待多久收集同批任务（秒），合并为一次提交
+    "max_batch": 64,            # 单次提交最多包含的任务数
+    "submit_timeout": 30,       # 生产者等待入队和提交完成的超时（秒）
+}
+
+# 分钟行情存储配置
+TICK_CONFIG = {
+    "dedup": True,              # 只在价格变化时写入分钟行情（最新价格表每次都更新）
+    "heartbeat_minutes": 15,    # 价格不变时至少每隔多久写一行；读取时在此范围内前向填充
+}
+
+# 数据保留与降采样配置（天）
+RETENTION_CONFIG = {
+    "raw_days": 30,             # 分钟级原始数据（realtime_prices / spread_data / ratio_data、1m K线）保留天数
+    "rollup_5m_days": 365,      # 5m / 15m 降采样保留天数；1h 及日线永久保留
+    "delete_batch": 5000,       # 每批删除行数（每批单独提交，避免长时间占用写锁）
+    "vacuum_pages": 5000,       # 每次增量 VACUUM 归还的页数
+}
+
+# 冷数据归档配置（Parquet，按 品种 / 月份 分区）
+ARCHIVE_CONFIG = {
+    "enabled": True,            # 关闭后保留策略不再归档，也不再等待归档完成才删除原始数据
+    "dir": DATA_DIR / "archive",
+    "grace_days": 3,            # 月底之后再等几天才归档该月（日K线会修正最近几天的数据）
+    "compression": "zstd",
+}
+
+# 分析查询引擎配置（DuckDB 只读挂载 SQLite 文件和 Parquet 归档，duckdb 未安装时退回 SQLite）
+ANALYTICS_CONFIG = {
+    "engine": os.getenv("ANALYTICS_ENGINE", "sqlite"),  # 默认引擎: sqlite, duckdb；接口可用 engine 参数覆盖
+    "threads": 4,               # DuckDB 查询线程数
+    "memory_limit": "512MB",    # DuckDB 内存上限（超出时落盘）
+}
+
 # 品种配置
+# em_name / em_prefix: 在东方财富国际期货行情板 (futures_global_spot_em) 中按名称精确 / 前缀匹配
 SYMBOLS_CONFIG = {
     # 贵金属
     "SHFE.AU": {"name": "沪金主力", "akshare_code": "AU0", "market": "CN", "unit": "CNY/g"},
@@ -43,12 +175,12 @@ SYMBOLS_CONFIG = {
     # 有色金属
     "SHFE.CU": {"name": "沪铜主力", "akshare_code": "CU0", "market": "CN", "unit": "CNY/ton"},
     "SHFE.AL": {"name": "沪铝主力", "akshare_code": "AL0", "market": "CN", "unit": "CNY/ton"},
-    "LME.CU": {"name": "LME铜", "market": "LME", "unit": "USD/ton"},
-    "LME.AL": {"name": "LME铝", "market": "LME", "unit": "USD/ton"},
+    "LME.CU": {"name": "LME铜", "em_name": "综合铜03", "market": "LME", "unit": "USD/ton"},
+    "LME.AL": {"name": "LME铝", "em_name": "综合铝03", "market": "LME", "unit": "USD/ton"},
     
     # 能源
     "INE.SC": {"name": "INE原油主力", "akshare_code": "SC0", "market": "CN", "unit": "CNY/barrel"},
-    "BRENT": {"name": "布伦特原油", "market": "INTL", "unit": "USD/barrel"},
+    "BRENT": {"name": "布伦特原油", "em_prefix": "布伦特原油", "market": "INTL", "unit": "USD/barrel"},
     "NG": {"name": "天然气", "market": "INTL", "unit": "USD/mmBtu"},
     
     # 化工
@@ -71,6 +203,12 @@ PREMIUM_PAIRS = {
     "ALUMINUM": {"domestic": "SHFE.AL", "foreign": "LME.AL", "name": "铝溢价率"},
 }
 
+# 比值指标名称
+RATIO_NAMES = {
+    "GOLD_SILVER": "金银比",
+    "COPPER_GOLD": "铜金比",
+}
+
 # 单位换算常量
 CONVERSION_CONSTANTS = {
     "OZ_TO_GRAM": 31.1035,  # 1金衡盎司 = 31.1035克
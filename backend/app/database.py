@@ -1,41 +1,128 @@
 """
 数据库配置与初始化
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Date, UniqueConstraint
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Float, DateTime, Date, UniqueConstraint, Index, ForeignKey
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from datetime import datetime
+from typing import Dict, List, Sequence
 
-from app.config import DATABASE_URL, DATABASE_PATH
+try:
+    import aiosqlite  # noqa: F401
+    AIOSQLITE_AVAILABLE = True
+except ImportError:
+    AIOSQLITE_AVAILABLE = False
 
-# 创建引擎
-engine = create_engine(DATABASE_URL, echo=False)
+from app.config import DATABASE_URL, ASYNC_DATABASE_URL, DATABASE_PATH, DB_PROFILES, DB_PROFILE, SYMBOLS_CONFIG
+
+if DB_PROFILE not in DB_PROFILES:
+    raise ValueError(f"未知的 DB_PROFILE: {DB_PROFILE}，可选: {list(DB_PROFILES)}")
+db_profile = DB_PROFILES[DB_PROFILE]
+
+# 创建引擎（调度器线程与 API 线程共用连接池）
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=db_profile["pool_size"],
+    max_overflow=db_profile["max_overflow"],
+    connect_args={"check_same_thread": False},
+)
+
+
+@event.listens_for(engine, "connect")
+def _apply_pragmas(dbapi_connection, connection_record):
+    """每个新连接按存储配置档设置 PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    try:
+        # 必须在 journal_mode 之前设置：新库在写入文件头时即启用增量 VACUUM，已有库要等完整 VACUUM 才生效
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        for name, value in db_profile["pragmas"].items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎（API_CONFIG["async_reads"] 开启时供只读接口使用，首次使用时才建立连接）；写入仍走单写线程
+async_engine = None
+AsyncSessionLocal = None
+if AIOSQLITE_AVAILABLE:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False,
+        pool_size=db_profile["pool_size"],
+        max_overflow=db_profile["max_overflow"],
+    )
+    event.listen(async_engine.sync_engine, "connect", _apply_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # 声明基类
 Base = declarative_base()
 
 
-class RealtimePrice(Base):
-    """实时/分钟级价格数据"""
-    __tablename__ = "realtime_prices"
+# 映射到视图的模型（不参与 create_all，视图由 create_views 创建）
+ViewBase = declarative_base()
+
+
+class Instrument(Base):
+    """品种字典：名称、单位、市场只存一份，分钟行情只引用整数 id"""
+    __tablename__ = "instruments"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, default=datetime.now)
-    symbol = Column(String(20), nullable=False)  # 如 'SHFE.AU', 'LME.CU'
+    symbol = Column(String(20), nullable=False, unique=True)  # 如 'SHFE.AU', 'LME.CU'
     name = Column(String(50))  # 如 '沪金主力'
-    price = Column(Float, nullable=False)
-    price_cny = Column(Float)  # 换算后的人民币价格
     unit = Column(String(20))  # 原始单位
     market = Column(String(10))  # 'CN', 'INTL', 'LME'
+
+
+class Tick(Base):
+    """分钟级价格（紧凑存储，品种信息见 instruments）"""
+    __tablename__ = "ticks"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=False)
+    timestamp = Column(DateTime, nullable=False, default=datetime.now)
+    price = Column(Float, nullable=False)
+    price_cny = Column(Float)  # 换算后的人民币价格
     
     __table_args__ = (
-        UniqueConstraint('timestamp', 'symbol', name='uix_realtime_ts_symbol'),
+        # 唯一约束兼作最新价 / 时间范围查询的索引：WHERE instrument_id = ? ORDER BY timestamp
+        Index('ix_tick_instrument_ts', 'instrument_id', 'timestamp', unique=True),
+        # AUTOINCREMENT：保留策略删光旧行后 id 也不会重用，K 线水位（按 id 递增处理）不会漏掉新行
+        {"sqlite_autoincrement": True},
     )
 
 
+class RealtimePrice(ViewBase):
+    """实时/分钟级价格数据（只读视图：ticks JOIN instruments，写入请用 Tick）"""
+    __tablename__ = "realtime_prices"
+    
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime, nullable=False)
+    symbol = Column(String(20), nullable=False)
+    name = Column(String(50))
+    price = Column(Float, nullable=False)
+    price_cny = Column(Float)
+    unit = Column(String(20))
+    market = Column(String(10))
+
+
+class LatestPrice(Base):
+    """每个品种的最新价格（与 realtime_prices 在同一事务中维护）"""
+    __tablename__ = "latest_prices"
+    
+    symbol = Column(String(20), primary_key=True)
+    name = Column(String(50))
+    price = Column(Float, nullable=False)
+    price_cny = Column(Float)
+    unit = Column(String(20))
+    market = Column(String(10))
+    timestamp = Column(DateTime, nullable=False)
+
+
 class DailyOHLC(Base):
     """日K线数据"""
     __tablename__ = "daily_ohlc"
@@ -52,6 +139,7 @@ class DailyOHLC(Base):
     
     __table_args__ = (
         UniqueConstraint('date', 'symbol', name='uix_daily_date_symbol'),
+        Index('ix_daily_symbol_date', 'symbol', 'date'),
     )
 
 
@@ -68,6 +156,7 @@ class MacroData(Base):
     
     __table_args__ = (
         UniqueConstraint('date', 'indicator', name='uix_macro_date_indicator'),
+        Index('ix_macro_indicator_date', 'indicator', 'date'),
     )
 
 
@@ -77,8 +166,7 @@ class SpreadData(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, nullable=False, default=datetime.now)
-    pair = Column(String(50), nullable=False)  # 'GOLD', 'COPPER' 等
-    name = Column(String(50))  # '黄金溢价率'
+    pair = Column(String(50), nullable=False)  # 'GOLD', 'COPPER' 等，名称见 PREMIUM_PAIRS
     domestic_price = Column(Float)  # 国内价格
     foreign_price = Column(Float)  # 国际价格（已换算单位）
     theoretical_price = Column(Float)  # 理论国内价格
@@ -87,6 +175,7 @@ class SpreadData(Base):
     
     __table_args__ = (
         UniqueConstraint('timestamp', 'pair', name='uix_spread_ts_pair'),
+        Index('ix_spread_pair_ts', 'pair', 'timestamp'),
     )
 
 
@@ -111,13 +200,130 @@ class RatioData(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, nullable=False, default=datetime.now)
-    ratio_type = Column(String(20), nullable=False)  # 'GOLD_SILVER', 'COPPER_GOLD'
-    name = Column(String(50))
+    ratio_type = Column(String(20), nullable=False)  # 'GOLD_SILVER', 'COPPER_GOLD'，名称见 RATIO_NAMES
     value = Column(Float, nullable=False)
     
     __table_args__ = (
         UniqueConstraint('timestamp', 'ratio_type', name='uix_ratio_ts_type'),
+        Index('ix_ratio_type_ts', 'ratio_type', 'timestamp'),
+    )
+
+
+class PriceBar(Base):
+    """由 realtime_prices 聚合出的 K 线（1m/5m/15m/1h/1d）"""
+    __tablename__ = "price_bars"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String(20), nullable=False)
+    interval = Column(String(5), nullable=False)  # '1m', '5m', '15m', '1h', '1d'
+    bar_time = Column(DateTime, nullable=False)  # K 线起始时间
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    ticks = Column(Integer)  # K 线内存储的行情条数（价格变化和心跳行，不含从上一根带入的价格）
+    
+    __table_args__ = (
+        UniqueConstraint('symbol', 'interval', 'bar_time', name='uix_bar_symbol_interval_time'),
+    )
+
+
+class BarWatermark(Base):
+    """K 线聚合进度：已处理到的 realtime_prices.id"""
+    __tablename__ = "bar_watermark"
+    
+    name = Column(String(20), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now)
+
+
+class SpreadRollup(Base):
+    """溢价率降采样（5m / 1h），原始数据超过保留期后由 retention 生成"""
+    __tablename__ = "spread_rollups"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    pair = Column(String(50), nullable=False)
+    interval = Column(String(5), nullable=False)  # '5m', '1h'
+    bucket_time = Column(DateTime, nullable=False)
+    domestic_price = Column(Float)  # 以下为区间均值
+    foreign_price = Column(Float)
+    theoretical_price = Column(Float)
+    exchange_rate = Column(Float)
+    spread_rate = Column(Float)
+    spread_rate_min = Column(Float)
+    spread_rate_max = Column(Float)
+    samples = Column(Integer)
+    
+    __table_args__ = (
+        UniqueConstraint('pair', 'interval', 'bucket_time', name='uix_spread_rollup'),
+    )
+
+
+class RatioRollup(Base):
+    """比值指标降采样（5m / 1h）"""
+    __tablename__ = "ratio_rollups"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ratio_type = Column(String(20), nullable=False)
+    interval = Column(String(5), nullable=False)
+    bucket_time = Column(DateTime, nullable=False)
+    value = Column(Float)  # 区间均值
+    value_min = Column(Float)
+    value_max = Column(Float)
+    samples = Column(Integer)
+    
+    __table_args__ = (
+        UniqueConstraint('ratio_type', 'interval', 'bucket_time', name='uix_ratio_rollup'),
+    )
+
+
+class RetentionState(Base):
+    """降采样进度：早于 rolled_up_until 的原始数据已生成降采样，可以删除"""
+    __tablename__ = "retention_state"
+    
+    table_name = Column(String(50), primary_key=True)
+    rolled_up_until = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.now)
+
+
+# 视图 {视图名: SELECT 语句}
+VIEWS = {
+    "realtime_prices": """
+        SELECT t.id, t.timestamp, i.symbol, i.name, t.price, t.price_cny, i.unit, i.market
+        FROM ticks t JOIN instruments i ON i.id = t.instrument_id
+    """,
+}
+
+# 品种代码 → instruments.id（进程内缓存，instruments 只在 init_db 时同步）
+_instrument_ids: Dict[str, int] = {}
+
+
+def create_views(conn):
+    """创建视图（同名的旧表还在时跳过，由迁移转换后再创建）"""
+    for name, select in VIEWS.items():
+        conn.execute(text(f"CREATE VIEW IF NOT EXISTS {name} AS {select}"))
+
+
+def sync_instruments(conn):
+    """把 SYMBOLS_CONFIG 同步到品种字典（新增品种、更新名称等），配置中已删除的品种保留"""
+    rows = [
+        {"symbol": symbol, "name": config["name"], "unit": config["unit"], "market": config["market"]}
+        for symbol, config in SYMBOLS_CONFIG.items()
+    ]
+    stmt = sqlite_insert(Instrument.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["symbol"],
+        set_={column: stmt.excluded[column] for column in ("name", "unit", "market")},
     )
+    conn.execute(stmt, rows)
+    _instrument_ids.clear()
+
+
+def get_instrument_ids(db) -> Dict[str, int]:
+    """品种代码 → instruments.id"""
+    if not _instrument_ids:
+        _instrument_ids.update(db.execute(text("SELECT symbol, id FROM instruments")).all())
+    return _instrument_ids
 
 
 def init_db():
@@ -125,9 +331,95 @@ def init_db():
     # 确保数据目录存在
     DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
     
-    # 创建所有表
+    from app.migrations import prepare_legacy_schema, run_migrations
+    
+    # 创建所有表，执行版本迁移，再创建视图（旧表由迁移 4 转换为视图）
     Base.metadata.create_all(bind=engine)
-    print(f"✅ 数据库初始化完成: {DATABASE_PATH}")
+    with engine.begin() as conn:
+        sync_instruments(conn)
+        prepare_legacy_schema(conn)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        create_views(conn)
+    print(f"✅ 数据库初始化完成: {DATABASE_PATH}（存储配置 {DB_PROFILE}）")
+
+
+def bulk_upsert(db: Session, model, rows: List[dict], conflict_columns: Sequence[str],
+                update_columns: Sequence[str], batch_size: int = 1000) -> int:
+    """
+    批量写入（SQLite INSERT ... ON CONFLICT DO UPDATE）
+    按唯一约束冲突时更新 update_columns，在调用方的事务中分批执行，不提交
+    
+    Returns:
+        写入行数
+    """
+    if not rows:
+        return 0
+    
+    stmt = sqlite_insert(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(conflict_columns),
+        set_={column: stmt.excluded[column] for column in update_columns},
+    )
+    
+    for start in range(0, len(rows), batch_size):
+        db.execute(stmt, rows[start:start + batch_size])
+    return len(rows)
+
+
+def insert_ignore(db: Session, model, rows: List[dict]) -> int:
+    """
+    Core 批量插入（executemany，不构造 ORM 对象），与唯一约束冲突的行跳过（ON CONFLICT DO NOTHING）
+    在调用方的事务中执行，不提交
+    
+    Returns:
+        实际插入的行数
+    """
+    if not rows:
+        return 0
+    stmt = sqlite_insert(model.__table__).on_conflict_do_nothing()
+    return db.execute(stmt, rows).rowcount
+
+
+def upsert_latest_prices(db: Session, rows: List[dict]):
+    """
+    更新最新价格表，只有时间不早于已有记录时才覆盖（乱序写入不会回退）
+    在调用方的事务中执行，不提交
+    """
+    if not rows:
+        return
+    table = LatestPrice.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["symbol"],
+        set_={column: stmt.excluded[column]
+              for column in ("name", "price", "price_cny", "unit", "market", "timestamp")},
+        where=table.c.timestamp <= stmt.excluded.timestamp,
+    )
+    db.execute(stmt, rows)
+
+
+def rebuild_latest_prices(conn) -> int:
+    """
+    从 realtime_prices 重建最新价格表（数据漂移时使用）
+    
+    Args:
+        conn: Session 或 Connection，在其事务中执行，不提交
+    
+    Returns:
+        重建后的品种数
+    """
+    conn.execute(text("DELETE FROM latest_prices"))
+    conn.execute(text("""
+        INSERT INTO latest_prices (symbol, name, price, price_cny, unit, market, timestamp)
+        SELECT symbol, name, price, price_cny, unit, market, timestamp FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY symbol ORDER BY timestamp DESC, id DESC
+            ) AS rn
+            FROM realtime_prices
+        ) WHERE rn = 1
+    """))
+    return conn.execute(text("SELECT COUNT(*) FROM latest_prices")).scalar()
 
 
 def get_db():
@@ -137,3 +429,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """获取异步数据库会话（用于异步只读接口的依赖注入）"""
+    async with AsyncSessionLocal() as db:
+        yield db
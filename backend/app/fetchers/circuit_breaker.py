@@ -0,0 +1,148 @@
+"""
+数据源熔断器
+连续失败达到阈值后熔断（open），期间直接跳过该数据源；冷却时间过后放行一次探测（half_open），
+探测成功恢复（closed），失败则继续熔断
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.config import FETCH_CONFIG
+from app import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """数据源处于熔断状态，调用被跳过"""
+
+    def __init__(self, source: str):
+        super().__init__(f"数据源 {source} 熔断中，已跳过")
+        self.source = source
+
+
+class CircuitBreaker:
+    """单个数据源的熔断器"""
+
+    def __init__(self, source: str, failure_threshold: int, recovery_timeout: float):
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_failure: Optional[datetime] = None
+        self.last_success: Optional[datetime] = None
+        self._probing = False
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否放行本次调用"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            # 探测超过冷却时间仍未结束（调用卡住）时视为作废，重新放行
+            if self.state == HALF_OPEN and self._probing and now - self._probe_started >= self.recovery_timeout:
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                # 半开状态只放行一次探测
+                self._probing = True
+                self._probe_started = now
+                return True
+            return False
+
+    def release_probe(self):
+        """探测调用被取消、没有结果时释放探测名额，下次调用重新探测"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            recovered = self.state != CLOSED
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+            self.last_success = datetime.now()
+        if recovered:
+            print(f"✅ 数据源 {self.source} 已恢复")
+        _notify_alert("record_fetch_success", self.source)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.last_failure = datetime.now()
+            self._probing = False
+            tripped = self.state == HALF_OPEN or \
+                (self.state == CLOSED and self.failures >= self.failure_threshold)
+            if tripped:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+        if tripped:
+            metrics.incr("circuit_opened", self.source)
+            print(f"⛔ 数据源 {self.source} 连续失败 {self.failures} 次，熔断 {self.recovery_timeout:.0f}s")
+        _notify_alert("record_fetch_failure", self.source)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": round(retry_in, 1) if retry_in is not None else None,
+                "last_failure": self.last_failure.isoformat() if self.last_failure else None,
+                "last_success": self.last_success.isoformat() if self.last_success else None,
+            }
+
+
+# 告警发送线程：QQ 消息是同步 HTTP 请求，不能占用采集线程；单线程保证计数按调用顺序更新
+_alert_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fetch-alert")
+
+
+def _notify_alert(func_name: str, source: str):
+    """把采集成功 / 失败异步同步到告警模块的失败计数，不阻塞采集线程"""
+    _alert_executor.submit(_run_alert, func_name, source)
+
+
+def _run_alert(func_name: str, source: str):
+    """在告警线程中执行（告警异常不影响采集）"""
+    try:
+        from app import alert
+        getattr(alert, func_name)(source)
+    except Exception as e:
+        print(f"⚠️ 采集告警记录失败: {e}")
+
+
+# 熔断器注册表 {数据源: CircuitBreaker}
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(source: str) -> CircuitBreaker:
+    """获取（必要时创建）数据源的熔断器"""
+    with _registry_lock:
+        breaker = _breakers.get(source)
+        if breaker is None:
+            breaker = _breakers[source] = CircuitBreaker(
+                source,
+                failure_threshold=FETCH_CONFIG["breaker_failure_threshold"],
+                recovery_timeout=FETCH_CONFIG["breaker_recovery_timeout"],
+            )
+        return breaker
+
+
+def breaker_states() -> Dict[str, dict]:
+    """所有数据源的健康状态"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.source: b.snapshot() for b in breakers}
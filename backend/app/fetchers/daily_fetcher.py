@@ -1,152 +1,338 @@
 """
 日K线数据采集器
+日常任务为增量模式：每个品种只写入库中最后一根日线及之后的数据，各品种并发下载、串行写入
+回填模式下载全量历史并分块写入，按品种记录断点，中断后可续跑
 """
+import json
+import time
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeoutError
 from datetime import datetime, date, timedelta
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 import akshare as ak
+from sqlalchemy import func
 
-from app.database import SessionLocal, DailyOHLC
-from app.config import SYMBOLS_CONFIG
+from app.database import SessionLocal, DailyOHLC, bulk_upsert
+from app.fetchers.normalize import normalize_frame, to_records
+from app.fetchers.retry import retry_scheduler
+from app.calculator.bar_builder import fill_daily_from_bars
+from app.config import SYMBOLS_CONFIG, DATA_DIR, FETCH_CONFIG, WRITER_CONFIG
+from app.writer import db_writer
 
 
-def fetch_cn_daily_ohlc(symbol: str, ak_code: str, days: int = 30) -> List[dict]:
+# 国内期货日K线代码（新浪 futures_zh_daily_sina），由 SYMBOLS_CONFIG 的 akshare_code 生成
+CN_DAILY_CODES = {
+    symbol: config["akshare_code"]
+    for symbol, config in SYMBOLS_CONFIG.items()
+    if config.get("akshare_code")
+}
+
+# 国际期货日K线代码（新浪外盘 futures_foreign_hist，见 ak.futures_hq_subscribe_exchange_symbol）
+INTL_DAILY_CODES = {
+    "XAU": "XAU",      # 伦敦金
+    "XAG": "XAG",      # 伦敦银
+    "LME.CU": "CAD",   # LME铜3个月
+    "LME.AL": "AHD",   # LME铝3个月
+    "BRENT": "OIL",    # 布伦特原油
+    "NG": "NG",        # NYMEX天然气
+    "CBOT.S": "S",     # CBOT-黄豆
+    "CBOT.C": "C",     # CBOT-玉米
+}
+
+# 回填断点文件 {品种: {status, rows, last_date, updated_at}}
+BACKFILL_CHECKPOINT = DATA_DIR / "backfill_daily.json"
+
+
+# 日K线列名映射 {目标列: [候选源列, ...]}
+OHLC_COLUMNS = {
+    "date": ["date", "日期"],
+    "open": ["open", "开盘价"],
+    "high": ["high", "最高价"],
+    "low": ["low", "最低价"],
+    "close": ["close", "收盘价"],
+    "volume": ["volume", "成交量"],
+}
+
+
+def normalize_ohlc(df, days: Optional[int] = None, since: Optional[date] = None) -> List[dict]:
     """
-    获取国内期货日K线数据
+    将上游日K线 DataFrame 规范化为记录列表
+
+    Args:
+        days: 只取最近 N 根，None 表示全部
+        since: 只保留该日期及之后的K线（包含当天，以便覆盖未收盘的最后一根）
     """
-    data = []
-    try:
-        df = ak.futures_zh_daily_sina(symbol=ak_code)
-        if df is not None and not df.empty:
-            # 取最近 N 天
-            df = df.tail(days)
-            for _, row in df.iterrows():
-                data.append({
-                    "date": row['date'] if isinstance(row['date'], date) else datetime.strptime(str(row['date']), "%Y-%m-%d").date(),
-                    "open": float(row['open']),
-                    "high": float(row['high']),
-                    "low": float(row['low']),
-                    "close": float(row['close']),
-                    "volume": int(row['volume']) if 'volume' in row else 0,
-                })
-    except Exception as e:
-        print(f"获取 {symbol} 日K线失败: {e}")
-    
-    return data
+    if days is not None:
+        df = df.tail(days)
+    normalized = normalize_frame(
+        df, OHLC_COLUMNS,
+        numeric=["open", "high", "low", "close"],
+        integer=["volume"],
+        required=["date", "close"],
+    )
+    if since is not None:
+        normalized = normalized[normalized["date"] >= since]
+    return to_records(normalized)
 
 
-def fetch_intl_daily_ohlc(symbol: str, name: str, days: int = 30) -> List[dict]:
+def download_daily_ohlc(symbol: str, days: Optional[int] = 30, since: Optional[date] = None) -> List[dict]:
     """
-    获取国际期货日K线数据
+    按品种选择国内 / 国际数据源下载日K线（days=None 为全量历史），失败时抛出异常
     """
-    data = []
+    if symbol in CN_DAILY_CODES:
+        df = ak.futures_zh_daily_sina(symbol=CN_DAILY_CODES[symbol])
+    elif symbol in INTL_DAILY_CODES:
+        df = ak.futures_foreign_hist(symbol=INTL_DAILY_CODES[symbol])
+    else:
+        raise ValueError(f"{symbol} 没有日K线数据源")
+    
+    if df is None or df.empty:
+        return []
+    return normalize_ohlc(df, days=days, since=since)
+
+
+def fetch_daily_ohlc(symbol: str, days: Optional[int] = 30, since: Optional[date] = None) -> List[dict]:
+    """按品种获取日K线，失败时打印并返回空列表"""
     try:
-        df = ak.futures_foreign_hist(symbol=name)
-        if df is not None and not df.empty:
-            df = df.tail(days)
-            for _, row in df.iterrows():
-                trade_date = row.get('日期') or row.get('date')
-                if isinstance(trade_date, str):
-                    trade_date = datetime.strptime(trade_date, "%Y-%m-%d").date()
-                
-                data.append({
-                    "date": trade_date,
-                    "open": float(row.get('开盘价') or row.get('open', 0)),
-                    "high": float(row.get('最高价') or row.get('high', 0)),
-                    "low": float(row.get('最低价') or row.get('low', 0)),
-                    "close": float(row.get('收盘价') or row.get('close', 0)),
-                    "volume": int(row.get('成交量') or row.get('volume', 0)),
-                })
+        return download_daily_ohlc(symbol, days, since)
     except Exception as e:
-        print(f"获取 {symbol} ({name}) 日K线失败: {e}")
+        print(f"获取 {symbol} 日K线失败: {e}")
+        return []
+
+
+def _upsert_daily_rows(symbol: str, name: str, data: List[dict]):
+    """批量 UPSERT 日K线（经单写线程提交），失败时抛出异常"""
+    rows = [{
+        "date": item["date"],
+        "symbol": symbol,
+        "name": name,
+        "open": item["open"],
+        "high": item["high"],
+        "low": item["low"],
+        "close": item["close"],
+        "volume": item["volume"],
+    } for item in data]
     
-    return data
+    db_writer.write(lambda db: bulk_upsert(
+        db, DailyOHLC, rows,
+        conflict_columns=["date", "symbol"],
+        update_columns=["open", "high", "low", "close", "volume"],
+    ), name="daily_ohlc", timeout=WRITER_CONFIG["submit_timeout"])
 
 
-def save_daily_ohlc(symbol: str, name: str, data: List[dict]):
+def save_daily_ohlc(symbol: str, name: str, data: List[dict]) -> int:
     """
-    保存日K线数据
+    保存日K线数据（按 日期+品种 批量 UPSERT）
+
+    Returns:
+        写入的条数，失败返回 0
     """
     if not data:
-        return
+        return 0
     
-    db = SessionLocal()
     try:
-        for item in data:
-            # 检查是否已存在
-            existing = db.query(DailyOHLC).filter(
-                DailyOHLC.symbol == symbol,
-                DailyOHLC.date == item["date"]
-            ).first()
-            
-            if existing:
-                # 更新
-                existing.open = item["open"]
-                existing.high = item["high"]
-                existing.low = item["low"]
-                existing.close = item["close"]
-                existing.volume = item["volume"]
-            else:
-                # 新增
-                record = DailyOHLC(
-                    date=item["date"],
-                    symbol=symbol,
-                    name=name,
-                    open=item["open"],
-                    high=item["high"],
-                    low=item["low"],
-                    close=item["close"],
-                    volume=item["volume"]
-                )
-                db.add(record)
-        
-        db.commit()
+        _upsert_daily_rows(symbol, name, data)
         print(f"✅ 已保存 {symbol} 的 {len(data)} 条日K线数据")
-        
+        return len(data)
     except Exception as e:
-        db.rollback()
         print(f"❌ 保存 {symbol} 日K线失败: {e}")
+        return 0
+
+
+def get_last_daily_dates() -> Dict[str, date]:
+    """
+    每个品种库中最后一根官方日K线的日期
+
+    本地 K 线补齐的日线成交量为空，不计入，接口恢复后的增量更新会用官方数据覆盖它们
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(DailyOHLC.symbol, func.max(DailyOHLC.date)).filter(
+            DailyOHLC.volume.isnot(None)
+        ).group_by(DailyOHLC.symbol).all()
+        return {symbol: last_date for symbol, last_date in rows}
     finally:
         db.close()
 
 
-def update_daily_ohlc(days: int = 30):
+def daily_symbols() -> List[str]:
+    """有日K线数据源的全部品种"""
+    return list(CN_DAILY_CODES) + list(INTL_DAILY_CODES)
+
+
+def _daily_source(symbol: str) -> str:
+    """日K线数据源名称（用于重试统计和熔断）"""
+    return "futures_zh_daily_sina" if symbol in CN_DAILY_CODES else "futures_foreign_hist"
+
+
+def update_daily_ohlc(days: int = 30, incremental: bool = True) -> Dict[str, dict]:
     """
     更新所有品种的日K线数据
+
+    各品种的下载通过共享的有界采集线程池并发执行，下载完成的结果按完成顺序
+    交给调用线程逐个写入，数据库写入保持串行。单个品种失败或超时只记录在结果中，
+    不影响其他品种
+
+    Args:
+        days: 非增量模式、或库中还没有该品种数据时，取最近 N 天
+        incremental: 只写入库中最后一根K线及之后的数据
+
+    Returns:
+        {品种: {"status": success/empty/error/timeout, "rows": 写入条数, "seconds": 下载耗时, "error": 错误信息}}
+        用本地 K 线补齐时另有 "filled": 补齐条数
     """
-    # 国内期货
-    cn_map = {
-        "SHFE.AU": "AU0",
-        "SHFE.AG": "AG0",
-        "SHFE.CU": "CU0",
-        "SHFE.AL": "AL0",
-        "INE.SC": "SC0",
-        "CZCE.TA": "TA0",
-        "CZCE.MA": "MA0",
-        "DCE.M": "M0",
-        "DCE.C": "C0",
-        "DCE.LH": "LH0",
-    }
+    last_dates = get_last_daily_dates() if incremental else {}
+    summary = {}
     
-    for symbol, ak_code in cn_map.items():
-        config = SYMBOLS_CONFIG.get(symbol, {})
-        data = fetch_cn_daily_ohlc(symbol, ak_code, days)
-        save_daily_ohlc(symbol, config.get("name", symbol), data)
+    start = time.monotonic()
+    deadline = start + FETCH_CONFIG["daily_job_timeout"]
+    started_at = {}
+    futures = {}
+    for symbol in daily_symbols():
+        since = last_dates.get(symbol)
+        started_at[symbol] = time.monotonic()
+        future = retry_scheduler.submit(
+            _daily_source(symbol), download_daily_ohlc, symbol,
+            days=None if since else days, since=since, deadline=deadline,
+        )
+        futures[future] = symbol
     
-    # 国际期货
-    intl_map = {
-        "XAU": "伦敦金",
-        "XAG": "伦敦银",
-        "LME.CU": "LME铜",
-        "LME.AL": "LME铝",
-        "BRENT": "布伦特原油",
-        "NG": "NYMEX天然气",
-        "CBOT.S": "CBOT大豆",
-        "CBOT.C": "CBOT玉米",
-    }
+    try:
+        for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+            symbol = futures[future]
+            result = {"status": "success", "rows": 0, "error": None,
+                      "seconds": round(time.monotonic() - started_at[symbol], 3)}
+            summary[symbol] = result
+            try:
+                data = future.result()
+            except Exception as e:
+                result.update(status="error", error=str(e))
+                print(f"❌ 获取 {symbol} 日K线失败: {e}")
+                continue
+            
+            if not data:
+                result["status"] = "empty"
+                continue
+            
+            # 写入只在调用线程中进行
+            config = SYMBOLS_CONFIG.get(symbol, {})
+            try:
+                _upsert_daily_rows(symbol, config.get("name", symbol), data)
+                result["rows"] = len(data)
+                print(f"✅ 已保存 {symbol} 的 {len(data)} 条日K线数据")
+            except Exception as e:
+                result.update(status="error", error=str(e))
+                print(f"❌ 保存 {symbol} 日K线失败: {e}")
+    except FuturesTimeoutError:
+        for future, symbol in futures.items():
+            if symbol not in summary:
+                future.cancel()
+                summary[symbol] = {"status": "timeout", "rows": 0, "seconds": None,
+                                   "error": f"超过 {FETCH_CONFIG['daily_job_timeout']}s 未完成"}
+    
+    failed = [s for s, r in summary.items() if r["status"] in ("error", "timeout")]
+    
+    # 日线接口失败或无数据的品种，用本地行情聚合的日 K 线补齐
+    for symbol, result in summary.items():
+        if result["status"] == "success":
+            continue
+        try:
+            filled = fill_daily_from_bars(symbol, since=last_dates.get(symbol))
+        except Exception as e:
+            print(f"⚠️ 用本地 K 线补齐 {symbol} 日线失败: {e}")
+            continue
+        if filled:
+            result["filled"] = filled
+            print(f"🔧 {symbol} 日线接口不可用，已用本地 K 线补齐 {filled} 条")
+    
+    elapsed = time.monotonic() - start
+    print(f"📊 日K线数据更新完成，共写入 {sum(r['rows'] for r in summary.values())} 条，"
+          f"耗时 {elapsed:.2f}s" + (f"，失败: {', '.join(failed)}" if failed else ""))
+    return {symbol: summary[symbol] for symbol in daily_symbols()}
+
+
+def _load_checkpoint() -> Dict[str, dict]:
+    if not BACKFILL_CHECKPOINT.exists():
+        return {}
+    try:
+        return json.loads(BACKFILL_CHECKPOINT.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"⚠️ 读取回填断点失败，将从头开始: {e}")
+        return {}
+
+
+def _save_checkpoint(checkpoint: Dict[str, dict]):
+    """先写临时文件再替换，避免中断时留下半个文件"""
+    tmp = BACKFILL_CHECKPOINT.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(BACKFILL_CHECKPOINT)
+
+
+def backfill_daily_ohlc(
+    symbols: Optional[Iterable[str]] = None,
+    restart: bool = False,
+    chunk_size: int = 1000,
+) -> Dict[str, dict]:
+    """
+    回填全量日K线历史
+
+    每个品种下载全量历史后按 chunk_size 分块写入，每块提交后把最后日期写入断点文件。
+    中断后再次运行会跳过已完成的品种，未完成的品种从断点日期之后继续写入。
+
+    Args:
+        symbols: 要回填的品种，默认全部
+        restart: 忽略已有断点，全部重新回填
+        chunk_size: 每次提交的K线条数
+
+    Returns:
+        断点内容 {品种: {status, rows, last_date, updated_at}}
+    """
+    symbols = list(symbols or daily_symbols())
+    checkpoint = {} if restart else _load_checkpoint()
+    total = len(symbols)
     
-    for symbol, name in intl_map.items():
-        config = SYMBOLS_CONFIG.get(symbol, {})
-        data = fetch_intl_daily_ohlc(symbol, name, days)
-        save_daily_ohlc(symbol, config.get("name", symbol), data)
+    for i, symbol in enumerate(symbols, 1):
+        state = checkpoint.get(symbol, {})
+        if state.get("status") == "done":
+            print(f"[{i}/{total}] {symbol} 已完成，跳过")
+            continue
+        
+        resume_from = date.fromisoformat(state["last_date"]) if state.get("last_date") else None
+        data = fetch_daily_ohlc(symbol, days=None)
+        state = {**state, "status": "running", "rows": state.get("rows", 0)}
+        checkpoint[symbol] = state
+        if not data:
+            state["status"] = "failed"
+            state["updated_at"] = datetime.now().isoformat()
+            _save_checkpoint(checkpoint)
+            print(f"[{i}/{total}] ❌ {symbol} 没有获取到历史数据")
+            continue
+        
+        if resume_from:
+            data = [item for item in data if item["date"] > resume_from]
+        
+        name = SYMBOLS_CONFIG.get(symbol, {}).get("name", symbol)
+        try:
+            for start in range(0, len(data), chunk_size):
+                chunk = data[start:start + chunk_size]
+                _upsert_daily_rows(symbol, name, chunk)
+                state["rows"] += len(chunk)
+                state["last_date"] = chunk[-1]["date"].isoformat()
+                state["updated_at"] = datetime.now().isoformat()
+                _save_checkpoint(checkpoint)
+                print(f"[{i}/{total}] {symbol} {start + len(chunk)}/{len(data)} 条，已到 {state['last_date']}")
+        except Exception as e:
+            state["status"] = "failed"
+            _save_checkpoint(checkpoint)
+            print(f"[{i}/{total}] ❌ {symbol} 写入失败，下次从 {state.get('last_date')} 之后继续: {e}")
+            continue
+        
+        state["status"] = "done"
+        state["updated_at"] = datetime.now().isoformat()
+        _save_checkpoint(checkpoint)
+        print(f"[{i}/{total}] ✅ {symbol} 回填完成，共 {state['rows']} 条")
     
-    print(f"📊 日K线数据更新完成")
+    done = sum(1 for s in symbols if checkpoint.get(s, {}).get("status") == "done")
+    print(f"📊 日K线回填结束：{done}/{total} 个品种完成")
+    return checkpoint
+
+
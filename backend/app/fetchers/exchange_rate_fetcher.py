@@ -4,14 +4,22 @@
 1. fx_spot_quote: 人民币外汇即期报价 (akshare)
 2. forex_spot_em: 东方财富网外汇行情 (akshare)
 3. yfinance: Yahoo Finance CNY=X (备用)
+默认并发对冲请求，取截止时间内优先级最高的有效结果
 """
 import math
+import threading
+import time
+from concurrent.futures import Future, wait, FIRST_COMPLETED
 from datetime import datetime
 from typing import Optional, Tuple
 import akshare as ak
 import yfinance as yf
 
 from app.database import SessionLocal, ExchangeRate
+from app.config import FETCH_CONFIG, WRITER_CONFIG
+from app.fetchers.retry import retry_scheduler
+from app.writer import db_writer
+from app import metrics
 
 
 def is_valid_rate(rate: float) -> bool:
@@ -25,49 +33,73 @@ def is_valid_rate(rate: float) -> bool:
     return True
 
 
-def get_exchange_rate_fx_spot() -> Optional[float]:
-    """
-    从人民币外汇即期报价获取汇率
-    使用 fx_spot_quote 接口
-    """
-    try:
-        df = ak.fx_spot_quote()
-        if df is not None and not df.empty:
-            usd_row = df[df['货币对'] == 'USD/CNY']
+def _rate_from_fx_spot() -> Optional[float]:
+    """fx_spot_quote 单次请求并解析"""
+    df = ak.fx_spot_quote()
+    if df is not None and not df.empty:
+        usd_row = df[df['货币对'] == 'USD/CNY']
+        if not usd_row.empty:
+            rate = float(usd_row.iloc[0]['买报价'])
+            if is_valid_rate(rate):
+                return rate
+            print(f"fx_spot_quote 返回无效值: {rate}")
+    return None
+
+
+def _rate_from_forex_em() -> Optional[float]:
+    """forex_spot_em 单次请求并解析"""
+    df = ak.forex_spot_em()
+    if df is not None and not df.empty:
+        # 尝试找美元人民币中间价，备选: 美元兑离岸人民币
+        for name in ('美元人民币中间价', '美元兑离岸人民币'):
+            usd_row = df[df['名称'] == name]
             if not usd_row.empty:
-                rate = float(usd_row.iloc[0]['买报价'])
+                rate = float(usd_row.iloc[0]['最新价'])
                 if is_valid_rate(rate):
                     return rate
-                print(f"fx_spot_quote 返回无效值: {rate}")
+    return None
+
+
+def _rate_from_yfinance() -> Optional[float]:
+    """Yahoo Finance CNY=X 单次请求并解析"""
+    data = yf.Ticker('CNY=X').history(period='1d', timeout=FETCH_CONFIG["fx_deadline"])
+    if data is not None and not data.empty:
+        rate = float(data['Close'].iloc[-1])
+        if is_valid_rate(rate):
+            return rate
+    return None
+
+
+# 汇率数据源，按优先级排列: (记录来源, 重试/熔断数据源名, 获取函数)
+FX_SOURCES = [
+    ("FX_SPOT_QUOTE", "fx_spot_quote", _rate_from_fx_spot),
+    ("FOREX_EM", "forex_spot_em", _rate_from_forex_em),
+    ("YFINANCE", "yfinance_fx", _rate_from_yfinance),
+]
+
+
+def _get_rate(source_name: str, func) -> Optional[float]:
+    try:
+        return retry_scheduler.call(source_name, func, timeout=FETCH_CONFIG["source_timeout"])
     except Exception as e:
-        print(f"fx_spot_quote 获取汇率失败: {e}")
+        print(f"{source_name} 获取汇率失败: {e}")
     return None
 
 
+def get_exchange_rate_fx_spot() -> Optional[float]:
+    """
+    从人民币外汇即期报价获取汇率
+    使用 fx_spot_quote 接口
+    """
+    return _get_rate("fx_spot_quote", _rate_from_fx_spot)
+
+
 def get_exchange_rate_forex_em() -> Optional[float]:
     """
     从东方财富外汇行情获取汇率
     使用 forex_spot_em 接口
     """
-    try:
-        df = ak.forex_spot_em()
-        if df is not None and not df.empty:
-            # 尝试找美元人民币中间价
-            usd_row = df[df['名称'] == '美元人民币中间价']
-            if not usd_row.empty:
-                rate = float(usd_row.iloc[0]['最新价'])
-                if is_valid_rate(rate):
-                    return rate
-            
-            # 备选: 美元兑离岸人民币
-            usd_row = df[df['名称'] == '美元兑离岸人民币']
-            if not usd_row.empty:
-                rate = float(usd_row.iloc[0]['最新价'])
-                if is_valid_rate(rate):
-                    return rate
-    except Exception as e:
-        print(f"forex_spot_em 获取汇率失败: {e}")
-    return None
+    return _get_rate("forex_spot_em", _rate_from_forex_em)
 
 
 def get_exchange_rate_yfinance() -> Optional[float]:
@@ -75,96 +107,301 @@ def get_exchange_rate_yfinance() -> Optional[float]:
     从 Yahoo Finance 获取汇率
     使用 CNY=X 代码
     """
-    try:
-        ticker = yf.Ticker('CNY=X')
-        data = ticker.history(period='1d')
-        if data is not None and not data.empty:
-            rate = float(data['Close'].iloc[-1])
-            if is_valid_rate(rate):
-                print(f"yfinance 获取汇率成功: {rate}")
-                return rate
-    except Exception as e:
-        print(f"yfinance 获取汇率失败: {e}")
-    return None
+    rate = _get_rate("yfinance_fx", _rate_from_yfinance)
+    if rate:
+        print(f"yfinance 获取汇率成功: {rate}")
+    return rate
 
 
-def get_current_exchange_rate() -> Tuple[float, str]:
+def get_exchange_rate_hedged() -> Optional[Tuple[float, str, float]]:
     """
-    获取当前美元兑人民币汇率
-    按优先级尝试多个数据源
+    对冲方式获取汇率
+    
+    先请求最高优先级数据源，每隔 fx_hedge_delay 秒（或前一个已失败时立即）追加请求下一个。
+    高优先级数据源都已结束时直接采用最优的有效结果；低优先级先返回时最多再等
+    fx_hedge_grace 秒。到达截止时间后取已返回的最优结果，其余请求在后台结束（只计入熔断器）
+    
+    Returns:
+        (汇率, 来源, 耗时秒)，全部失败返回 None
     """
-    # 方法1: fx_spot_quote (人民币外汇即期报价)
-    rate = get_exchange_rate_fx_spot()
-    if rate:
-        return rate, "FX_SPOT_QUOTE"
+    start = time.monotonic()
+    deadline = start + FETCH_CONFIG["fx_deadline"]
+    hedge_delay = FETCH_CONFIG["fx_hedge_delay"]
     
-    # 方法2: forex_spot_em (东方财富外汇行情)
-    rate = get_exchange_rate_forex_em()
-    if rate:
-        return rate, "FOREX_EM"
+    futures = []          # 按优先级排列的已发起请求
+    finished = {}         # 优先级 -> (汇率或 None, 耗时, 完成时间)，由回调线程写入
+    lock = threading.Lock()
+    next_launch = start
     
-    # 方法3: yfinance (Yahoo Finance)
-    rate = get_exchange_rate_yfinance()
-    if rate:
-        return rate, "YFINANCE"
+    def launch(index: int):
+        source, source_name, func = FX_SOURCES[index]
+        launched_at = time.monotonic()
+        
+        def record(future):
+            try:
+                rate = future.result()
+            except Exception as e:
+                if not future.cancelled():
+                    print(f"{source_name} 获取汇率失败: {e}")
+                rate = None
+            finished_at = time.monotonic()
+            elapsed = finished_at - launched_at
+            with lock:
+                finished[index] = (rate, elapsed, finished_at)
+            metrics.observe("fx_latency", source, elapsed)
+        
+        future = retry_scheduler.submit(source_name, func, max_retries=1, deadline=deadline)
+        future.add_done_callback(record)
+        futures.append(future)
+    
+    while True:
+        now = time.monotonic()
+        with lock:
+            done = dict(finished)
+        
+        # 已发起的都失败了，或到了对冲间隔，则发起下一个数据源
+        all_failed = len(done) == len(futures) and \
+            all(item[0] is None for item in done.values())
+        if len(futures) < len(FX_SOURCES) and (all_failed or now >= next_launch):
+            launch(len(futures))
+            next_launch = now + hedge_delay
+            continue
+        
+        # 按优先级查找：最高优先级的有效结果，且比它优先的都已结束
+        best = None
+        for index in range(len(FX_SOURCES)):
+            if index not in done:
+                break
+            if done[index][0] is not None:
+                best = index
+                break
+        if best is not None:
+            break
+        
+        valid = [i for i, item in done.items() if item[0] is not None]
+        if valid:
+            first_valid_at = min(done[i][2] for i in valid)
+            if now >= min(deadline, first_valid_at + FETCH_CONFIG["fx_hedge_grace"]):
+                best = min(valid)
+                break
+        elif now >= deadline or len(done) == len(FX_SOURCES):
+            break
+        
+        pending = [f for f in futures if not f.done()]
+        timeout = max(0.0, deadline - now)
+        if len(futures) < len(FX_SOURCES):
+            timeout = min(timeout, max(0.0, next_launch - now))
+        if valid:
+            timeout = min(timeout, max(0.0, first_valid_at + FETCH_CONFIG["fx_hedge_grace"] - now))
+        if pending:
+            wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        else:
+            time.sleep(min(timeout, 0.05))
+    
+    # 其余请求不再等待，但不取消：让它们在后台结束并计入熔断器（结果丢弃），
+    # 否则恢复中的数据源的半开探测永远没有结果
+    
+    if best is None:
+        return None
+    
+    rate, elapsed, _ = done[best]
+    source = FX_SOURCES[best][0]
+    metrics.incr("fx_chosen", source)
+    metrics.observe("fx_hedged_latency", "total", time.monotonic() - start)
+    return rate, source, elapsed
+
+
+def get_current_exchange_rate() -> Tuple[float, str]:
+    """
+    获取当前美元兑人民币汇率
+    fx_hedged 开启时并发对冲请求各数据源，否则按优先级逐个尝试
+    """
+    if FETCH_CONFIG["fx_hedged"]:
+        result = get_exchange_rate_hedged()
+        if result:
+            rate, source, elapsed = result
+            print(f"汇率 {rate} 来自 {source}，耗时 {elapsed:.2f}s")
+            return rate, source
+    else:
+        # 方法1: fx_spot_quote (人民币外汇即期报价)
+        rate = get_exchange_rate_fx_spot()
+        if rate:
+            return rate, "FX_SPOT_QUOTE"
+        
+        # 方法2: forex_spot_em (东方财富外汇行情)
+        rate = get_exchange_rate_forex_em()
+        if rate:
+            return rate, "FOREX_EM"
+        
+        # 方法3: yfinance (Yahoo Finance)
+        rate = get_exchange_rate_yfinance()
+        if rate:
+            return rate, "YFINANCE"
     
     # 兜底: 使用默认值
     print("⚠️ 所有数据源都失败，使用默认值 7.25")
     return 7.25, "DEFAULT"
 
 
-def fetch_exchange_rate():
-    """
-    采集并保存汇率数据
-    """
+# 进程内汇率缓存（最后一次有效汇率）
+_fx_cache = {"rate": None, "source": None, "updated_at": None}
+_fx_lock = threading.Lock()
+# 是否已从数据库加载过（加载后数据库中不会有比缓存更新的有效汇率，读取方不再查库）
+_fx_cache_loaded = False
+# 正在进行的刷新（single-flight：同一时间只有一次刷新，并发调用方共享结果）
+_inflight_refresh: Optional[Future] = None
+# 最近一次发起刷新的时间（time.monotonic），数据源全部失败时读取方按间隔限流重试
+_last_refresh_at: Optional[float] = None
+
+
+def _update_cache(rate: float, source: str, updated_at: datetime):
+    with _fx_lock:
+        _fx_cache.update(rate=rate, source=source, updated_at=updated_at)
+
+
+def _load_cache_from_db():
+    """缓存为空时从数据库加载最近一次有效汇率（不访问网络）"""
+    global _fx_cache_loaded
+    _fx_cache_loaded = True
+    db = SessionLocal()
+    try:
+        record = db.query(ExchangeRate).filter(
+            ExchangeRate.currency_pair == "USD/CNY",
+            ExchangeRate.source != "DEFAULT",
+        ).order_by(ExchangeRate.timestamp.desc()).first()
+        if record and is_valid_rate(record.rate):
+            _update_cache(record.rate, record.source, record.timestamp)
+    except Exception as e:
+        print(f"⚠️ 读取汇率记录失败: {e}")
+    finally:
+        db.close()
+
+
+def _fetch_and_save_exchange_rate() -> Optional[float]:
+    """实时获取汇率，写入数据库并刷新缓存；所有数据源都失败时返回 None，不写入兜底值"""
     rate, source = get_current_exchange_rate()
     print(f"当前汇率: {rate} (来源: {source})")
     
+    if source == "DEFAULT":
+        # 兜底默认值不是真实汇率，不入库也不覆盖缓存
+        return None
+    
     # 验证汇率值
     if not is_valid_rate(rate):
         print(f"⚠️ 汇率值无效 ({rate})，跳过保存")
         return None
     
-    db = SessionLocal()
+    timestamp = datetime.now()
+    record = ExchangeRate(
+        timestamp=timestamp,
+        currency_pair="USD/CNY",
+        rate=rate,
+        source=source
+    )
     try:
-        record = ExchangeRate(
-            timestamp=datetime.now(),
-            currency_pair="USD/CNY",
-            rate=rate,
-            source=source
-        )
-        
-        db.add(record)
-        db.commit()
+        db_writer.write(lambda db: db.add(record), name="exchange_rate",
+                        timeout=WRITER_CONFIG["submit_timeout"])
         print(f"✅ 汇率已更新: {rate} (来源: {source})")
-        
     except Exception as e:
-        db.rollback()
         print(f"❌ 保存汇率失败: {e}")
-    finally:
-        db.close()
     
+    _update_cache(rate, source, timestamp)
     return rate
 
 
+def refresh_exchange_rate() -> Future:
+    """
+    在后台线程刷新汇率（single-flight）
+    已有刷新在进行时直接返回同一个 Future
+    """
+    global _inflight_refresh, _last_refresh_at
+    with _fx_lock:
+        if _inflight_refresh is not None and not _inflight_refresh.done():
+            return _inflight_refresh
+        future = _inflight_refresh = Future()
+        _last_refresh_at = time.monotonic()
+    
+    def run():
+        try:
+            future.set_result(_fetch_and_save_exchange_rate())
+        except Exception as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=run, name="fx-refresh", daemon=True).start()
+    return future
+
+
+def fetch_exchange_rate():
+    """
+    采集并保存汇率数据
+    与同时进行的其他刷新合并为一次请求
+    """
+    return refresh_exchange_rate().result()
+
+
+def warm_exchange_rate_cache():
+    """
+    启动时预热汇率缓存，应在定时任务启动前调用
+    先从数据库加载最近一次有效汇率；库中没有时同步获取一次（受 fx_deadline 限制），
+    避免首批行情按默认汇率换算人民币价格，接口请求也不必再查库
+    """
+    _load_cache_from_db()
+    with _fx_lock:
+        empty = _fx_cache["rate"] is None
+    if empty:
+        fetch_exchange_rate()
+
+
+def get_latest_exchange_rate_info() -> dict:
+    """
+    获取最新汇率及其新鲜度，不会阻塞在网络请求上
+    缓存过期或为空时触发一次后台刷新，本次仍返回最后一次有效值
+    
+    Returns:
+        {"rate", "source", "updated_at", "age_seconds", "stale"}
+    """
+    if not _fx_cache_loaded:
+        _load_cache_from_db()
+    
+    with _fx_lock:
+        rate = _fx_cache["rate"]
+        source = _fx_cache["source"]
+        updated_at = _fx_cache["updated_at"]
+    
+    age = (datetime.now() - updated_at).total_seconds() if updated_at else None
+    stale = age is None or age >= FETCH_CONFIG["fx_cache_ttl"]
+    if stale:
+        # 上次刷新失败后未满重试间隔时不再发起，避免数据源全部故障时每次读取都刷新一次
+        with _fx_lock:
+            due = _last_refresh_at is None or \
+                time.monotonic() - _last_refresh_at >= FETCH_CONFIG["fx_retry_interval"]
+        if due:
+            refresh_exchange_rate()
+    
+    if rate is None:
+        # 从未获取过有效汇率，使用默认值
+        rate, source = 7.25, "DEFAULT"
+    
+    return {
+        "rate": rate,
+        "source": source,
+        "updated_at": updated_at.isoformat() if updated_at else None,
+        "age_seconds": round(age, 1) if age is not None else None,
+        "stale": stale,
+    }
+
+
 def get_latest_exchange_rate() -> float:
     """
-    获取最新汇率，优先从数据库获取，否则实时获取
+    获取最新汇率（进程内缓存），过期时后台刷新，不阻塞调用方
     """
-    db = SessionLocal()
-    try:
-        record = db.query(ExchangeRate).filter(
-            ExchangeRate.currency_pair == "USD/CNY"
-        ).order_by(ExchangeRate.timestamp.desc()).first()
-        
-        if record:
-            # 如果数据库有记录，检查是否过期（超过1小时）
-            age = (datetime.now() - record.timestamp).total_seconds()
-            if age < 3600:  # 1小时内的数据有效
-                return record.rate
-        
-        # 实时获取
-        rate, _ = get_current_exchange_rate()
-        return rate
-    finally:
-        db.close()
+    return get_latest_exchange_rate_info()["rate"]
+
+
+def get_conversion_rate() -> Optional[float]:
+    """
+    获取用于换算人民币价格的汇率
+    从未获取过有效汇率（来源为 DEFAULT）时返回 None，调用方不换算，避免把占位值写入数据库
+    """
+    info = get_latest_exchange_rate_info()
+    return None if info["source"] == "DEFAULT" else info["rate"]
@@ -3,10 +3,14 @@
 主数据源: AkShare
 备份数据源: yfinance (国际期货)
 """
-from datetime import datetime
-from typing import Dict, Optional, Callable
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import threading
 import time
 import akshare as ak
+import pandas as pd
+import requests
 
 # 尝试导入 yfinance 作为备份
 try:
@@ -16,27 +20,23 @@ except ImportError:
     YFINANCE_AVAILABLE = False
     print("⚠️ yfinance 未安装，国际数据将没有备份源")
 
-from app.database import SessionLocal, RealtimePrice
-from app.config import SYMBOLS_CONFIG
-from app.fetchers.exchange_rate_fetcher import get_latest_exchange_rate
-from app.calculator.converter import convert_to_cny
+from app.database import Tick, get_instrument_ids, insert_ignore, upsert_latest_prices
+from app.config import SYMBOLS_CONFIG, FETCH_CONFIG, WRITER_CONFIG, TICK_CONFIG
+from app.writer import db_writer
+from app.fetchers.exchange_rate_fetcher import get_conversion_rate
+from app.calculator.converter import CONVERSION_CONFIG, convert_to_cny
+from app.fetchers.history_cache import get_foreign_hist, update_tail
+from app.fetchers.retry import retry_scheduler
 
 
-# 国内期货代码映射 - 使用 futures_main_sina
+# 国内期货代码映射 - 由 SYMBOLS_CONFIG 中的 akshare_code 生成（如 SHFE.AU -> AU0）
 CN_FUTURES_CODES = {
-    "SHFE.AU": "AU0",   # 沪金主力
-    "SHFE.AG": "AG0",   # 沪银主力
-    "SHFE.CU": "CU0",   # 沪铜主力
-    "SHFE.AL": "AL0",   # 沪铝主力
-    "INE.SC": "SC0",    # 原油主力
-    "CZCE.TA": "TA0",   # PTA主力
-    "CZCE.MA": "MA0",   # 甲醇主力
-    "DCE.M": "M0",      # 豆粕主力
-    "DCE.C": "C0",      # 玉米主力
-    "DCE.LH": "LH0",    # 生猪主力
+    symbol: config["akshare_code"]
+    for symbol, config in SYMBOLS_CONFIG.items()
+    if config.get("akshare_code")
 }
 
-# 外盘期货代码映射 - AkShare (futures_foreign_hist)
+# 外盘期货代码映射 - 新浪外盘行情 / AkShare (futures_foreign_hist)
 INTL_FUTURES_CODES_AKSHARE = {
     "XAU": "GC",      # COMEX黄金
     "XAG": "SI",      # COMEX白银
@@ -55,64 +55,256 @@ INTL_FUTURES_CODES_YFINANCE = {
 }
 
 
-def retry_with_backoff(func: Callable, max_retries: int = 3, base_delay: float = 1.0):
+# 东方财富国际期货行情板中可直接取价的品种（由 SYMBOLS_CONFIG 的 em_name / em_prefix 决定）
+GLOBAL_BOARD_SYMBOLS = {
+    symbol: config
+    for symbol, config in SYMBOLS_CONFIG.items()
+    if config.get("em_name") or config.get("em_prefix")
+}
+
+# 新浪行情接口，list 参数支持逗号拼接的多个订阅代码（nf_ 国内期货，hf_ 外盘期货）
+SINA_QUOTE_URL = "https://hq.sinajs.cn/list={}"
+SINA_HEADERS = {
+    "Referer": "https://finance.sina.com.cn/",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/120.0.0.0 Safari/537.36",
+}
+_sina_session = requests.Session()
+
+# yfinance 共享会话（跨采集周期复用连接和 cookie），首次使用时创建
+_yf_session = None
+
+def fetch_cn_price(code: str) -> Optional[float]:
+    """
+    获取单个国内期货合约的实时价格（单次请求，重试由 retry_scheduler 负责）
+    """
+    # 使用 futures_zh_spot 获取实时价格
+    df = ak.futures_zh_spot(symbol=code, market="CF", adjust="0")
+    if df is not None and not df.empty:
+        # current_price 是当前实时价格
+        price = df.iloc[0]['current_price']
+        if price and str(price) != 'nan' and float(price) > 0:
+            return float(price)
+    return None
+
+
+def _parse_price(value) -> Optional[float]:
+    """将行情字段解析为有效价格，无效时返回 None"""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    if price != price or price <= 0:  # NaN 或非正数
+        return None
+    return price
+
+
+def fetch_sina_quotes(subscriptions: List[str], timeout: float = 10) -> Dict[str, List[str]]:
     """
-    带指数退避的重试装饰器
+    一次请求获取多个新浪行情订阅代码的原始字段
+    
+    Args:
+        subscriptions: 订阅代码列表，如 ["nf_AU0", "nf_CU0"]
+    
+    Returns:
+        {订阅代码: 字段列表}，无行情的代码不返回
     """
-    def wrapper(*args, **kwargs):
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    delay = base_delay * (2 ** attempt)
-                    print(f"  重试 {attempt + 1}/{max_retries}，等待 {delay}s: {e}")
-                    time.sleep(delay)
-        raise last_error
-    return wrapper
+    response = _sina_session.get(
+        SINA_QUOTE_URL.format(",".join(subscriptions)),
+        headers=SINA_HEADERS,
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    response.encoding = "gbk"
+    
+    quotes = {}
+    # 每行形如: var hq_str_nf_AU0="沪金连续,150000,...";
+    for line in response.text.split(";"):
+        key, sep, value = line.strip().partition("=")
+        if not sep or "hq_str_" not in key:
+            continue
+        fields = value.strip().strip('"').split(",")
+        if fields != [""]:
+            quotes[key.split("hq_str_", 1)[1]] = fields
+    return quotes
 
 
-def fetch_cn_futures_prices() -> Dict[str, float]:
+def fetch_cn_futures_prices_batch(codes: Dict[str, str]) -> Dict[str, float]:
+    """
+    批量获取国内期货主力合约实时价格（一次请求）
+    
+    Args:
+        codes: {品种代码: 新浪合约代码}，如 {"SHFE.AU": "AU0"}
+    """
+    quotes = fetch_sina_quotes([f"nf_{code}" for code in codes.values()])
+    
+    prices = {}
+    for symbol, code in codes.items():
+        fields = quotes.get(f"nf_{code}")
+        # 商品期货第 9 个字段为最新价（与 futures_zh_spot 的 current_price 一致）
+        price = _parse_price(fields[8]) if fields and len(fields) > 8 else None
+        if price:
+            prices[symbol] = price
+    return prices
+
+
+def _fetch_cn_prices_concurrent(codes: Dict[str, str], job_deadline: float):
+    """
+    逐个品种并发采集，返回 (价格字典, 耗时字典)
+    失败的品种由 retry_scheduler 按退避时间重新调度，不阻塞其他品种
+    """
+    prices = {}
+    timings = {}
+    call_timeout = FETCH_CONFIG["cn_call_timeout"]
+    start = time.monotonic()
+    call_deadline = min(start + call_timeout, job_deadline)
+    finished_at = {}
+    
+    def timed_fetch(symbol: str, code: str) -> Optional[float]:
+        try:
+            return fetch_cn_price(code)
+        finally:
+            finished_at[symbol] = time.monotonic()
+    
+    # 熔断按品种计数：个别合约代码失效时不拖累同一接口的其他品种
+    futures = {
+        retry_scheduler.submit(f"futures_zh_spot:{symbol}", timed_fetch, symbol, code, deadline=call_deadline): symbol
+        for symbol, code in codes.items()
+    }
+    done, not_done = wait(futures, timeout=max(0.0, job_deadline - time.monotonic()))
+    
+    for future, symbol in futures.items():
+        if future in not_done:
+            # 取消后不再发起新的重试，已在执行的请求任其结束但不再等待
+            future.cancel()
+            timings[symbol] = {"seconds": None, "status": "timeout", "error": None}
+            print(f"  ⏱ 获取 {symbol} ({codes[symbol]}) 超时，已跳过")
+            continue
+        
+        seconds = round(finished_at.get(symbol, time.monotonic()) - start, 3)
+        try:
+            price = future.result()
+        except Exception as e:
+            timings[symbol] = {"seconds": seconds, "status": "error", "error": str(e)}
+            print(f"  ❌ 获取 {symbol} ({codes[symbol]}) 失败: {e}")
+            continue
+        
+        if price and seconds > call_timeout:
+            # 超过单次调用时限的结果视为过期，丢弃
+            timings[symbol] = {"seconds": seconds, "status": "timeout", "error": None}
+            continue
+        
+        timings[symbol] = {"seconds": seconds, "status": "ok" if price else "empty", "error": None}
+        if price:
+            prices[symbol] = price
+            print(f"  {symbol}: {price} ({seconds}s)")
+    
+    return prices, timings
+
+
+def fetch_cn_futures_prices(return_timings: bool = False):
     """
     获取国内期货实时价格
-    使用 futures_zh_spot 接口获取真正的实时行情
+    
+    先通过一次批量行情请求获取所有主力合约（失败时按退避重试，熔断后跳过），
+    缺失的品种再用 futures_zh_spot 逐个补采。逐个补采通过有界线程池并发执行，单品种调用和整体任务都有
+    截止时间，到期未完成的品种直接跳过，只返回按时完成的价格
+    
+    Args:
+        return_timings: 是否同时返回各品种耗时
+    
+    Returns:
+        价格字典；return_timings=True 时返回 (价格字典, 耗时字典)
     """
     prices = {}
+    timings = {}
     
-    for symbol, code in CN_FUTURES_CODES.items():
+    start = time.monotonic()
+    job_deadline = start + FETCH_CONFIG["cn_job_timeout"]
+    
+    if FETCH_CONFIG["cn_batch_quote"]:
+        # 批量请求与逐个补采一样经过重试调度和熔断；熔断期间直接逐个采集
         try:
-            @retry_with_backoff
-            def get_price():
-                # 使用 futures_zh_spot 获取实时价格
-                df = ak.futures_zh_spot(symbol=code, market="CF", adjust="0")
-                if df is not None and not df.empty:
-                    # current_price 是当前实时价格
-                    price = df.iloc[0]['current_price']
-                    if price and str(price) != 'nan' and float(price) > 0:
-                        return float(price)
-                return None
-            
-            price = get_price()
-            if price:
-                prices[symbol] = price
-                print(f"  {symbol}: {price}")
+            prices = retry_scheduler.call(
+                "sina_nf_quote", fetch_cn_futures_prices_batch, CN_FUTURES_CODES,
+                timeout=FETCH_CONFIG["cn_call_timeout"],
+            )
         except Exception as e:
-            print(f"  ❌ 获取 {symbol} ({code}) 失败: {e}")
+            print(f"  ⚠️ 批量行情请求失败，改为逐个采集: {e}")
+        batch_seconds = round(time.monotonic() - start, 3)
+        for symbol, price in prices.items():
+            timings[symbol] = {"seconds": batch_seconds, "status": "batch", "error": None}
+            print(f"  {symbol}: {price}")
+    
+    missing = {s: c for s, c in CN_FUTURES_CODES.items() if s not in prices}
+    if missing:
+        if FETCH_CONFIG["cn_batch_quote"]:
+            print(f"  批量行情缺失 {list(missing)}，逐个补采...")
+        fallback_prices, fallback_timings = _fetch_cn_prices_concurrent(missing, job_deadline)
+        prices.update(fallback_prices)
+        timings.update(fallback_timings)
+    
+    total = time.monotonic() - start
+    finished = [t["seconds"] for t in timings.values() if t["seconds"] is not None]
+    if finished:
+        print(f"  国内期货采集耗时 {total:.2f}s，最慢单品种 {max(finished):.2f}s，"
+              f"单品种合计 {sum(finished):.2f}s")
+    
+    if return_timings:
+        return prices, timings
+    return prices
+
+
+def fetch_intl_futures_quotes(codes: Dict[str, str]) -> Dict[str, float]:
+    """
+    批量获取外盘期货最新价（一次报价请求，不下载历史）
+    同时用报价更新日线历史缓存的最后一行
+    
+    Args:
+        codes: {品种代码: 外盘代码}，如 {"XAU": "GC"}
+    """
+    quotes = fetch_sina_quotes([f"hf_{code}" for code in codes.values()])
+    
+    prices = {}
+    for symbol, code in codes.items():
+        fields = quotes.get(f"hf_{code}")
+        # 外盘期货第 1 个字段为最新价，第 13 个字段为行情日期
+        price = _parse_price(fields[0]) if fields else None
+        if not price:
+            continue
+        prices[symbol] = price
+        
+        try:
+            trade_date = datetime.strptime(fields[12], "%Y-%m-%d").date()
+        except (IndexError, ValueError):
+            trade_date = None
+        update_tail(code, price, trade_date)
     
     return prices
 
 
 def fetch_intl_futures_prices_akshare() -> Dict[str, float]:
     """
-    从 AkShare 获取国际期货价格 (主数据源)
+    获取国际期货价格 (主数据源)
+    优先使用新浪外盘实时报价，报价缺失的品种才读取日线历史的最新收盘价
     """
     prices = {}
     
+    try:
+        prices = retry_scheduler.call(
+            "sina_hf_quote", fetch_intl_futures_quotes, INTL_FUTURES_CODES_AKSHARE,
+            timeout=FETCH_CONFIG["source_timeout"],
+        )
+        for symbol, price in prices.items():
+            print(f"  {symbol}: {price} (新浪报价)")
+    except Exception as e:
+        print(f"  ⚠️ 外盘报价获取失败: {e}")
+    
     for symbol, code in INTL_FUTURES_CODES_AKSHARE.items():
+        if symbol in prices:
+            continue
         try:
-            df = ak.futures_foreign_hist(symbol=code)
+            df = get_foreign_hist(code)
             if df is not None and not df.empty:
                 price = float(df.iloc[-1]['close'])
                 prices[symbol] = price
@@ -123,26 +315,64 @@ def fetch_intl_futures_prices_akshare() -> Dict[str, float]:
     return prices
 
 
-def fetch_intl_futures_prices_yfinance() -> Dict[str, float]:
+def _get_yf_session():
+    """获取 yfinance 共享会话（优先使用 yfinance 推荐的 curl_cffi 会话）"""
+    global _yf_session
+    if _yf_session is None:
+        try:
+            from curl_cffi import requests as curl_requests
+            _yf_session = curl_requests.Session(impersonate="chrome")
+        except ImportError:
+            _yf_session = requests.Session()
+    return _yf_session
+
+
+def fetch_intl_futures_prices_yfinance(symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
     """
     从 yfinance 获取国际期货价格 (备份数据源)
     Yahoo Finance API 非常稳定
+    
+    只请求 symbols 指定的品种（默认全部），所有 ticker 合并为一次批量下载
     """
     if not YFINANCE_AVAILABLE:
         return {}
     
+    targets = {
+        symbol: ticker
+        for symbol, ticker in INTL_FUTURES_CODES_YFINANCE.items()
+        if symbols is None or symbol in symbols
+    }
+    if not targets:
+        return {}
+    
     prices = {}
     
-    for symbol, ticker in INTL_FUTURES_CODES_YFINANCE.items():
-        try:
-            data = yf.Ticker(ticker)
-            hist = data.history(period="1d")
-            if hist is not None and not hist.empty:
-                price = float(hist['Close'].iloc[-1])
+    try:
+        df = retry_scheduler.call(
+            "yfinance", yf.download,
+            list(targets.values()),
+            period="1d",
+            progress=False,
+            session=_get_yf_session(),
+            timeout=FETCH_CONFIG["source_timeout"],
+        )
+        if df is None or df.empty:
+            return prices
+        
+        closes = df["Close"]
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame(name=next(iter(targets.values())))
+        
+        for symbol, ticker in targets.items():
+            if ticker not in closes:
+                continue
+            series = closes[ticker].dropna()
+            if not series.empty:
+                price = float(series.iloc[-1])
                 prices[symbol] = price
                 print(f"  {symbol}: {price} (yfinance 备份)")
-        except Exception as e:
-            print(f"  ⚠️ yfinance 获取 {symbol} ({ticker}) 失败: {e}")
+    except Exception as e:
+        print(f"  ⚠️ yfinance 批量获取 {list(targets.values())} 失败: {e}")
     
     return prices
 
@@ -161,117 +391,204 @@ def fetch_intl_futures_prices() -> Dict[str, float]:
     
     if missing_symbols and YFINANCE_AVAILABLE:
         print(f"  缺失品种 {missing_symbols}，尝试 yfinance 备份...")
-        backup_prices = fetch_intl_futures_prices_yfinance()
-        
-        for symbol in missing_symbols:
-            if symbol in backup_prices:
-                prices[symbol] = backup_prices[symbol]
+        prices.update(fetch_intl_futures_prices_yfinance(missing_symbols))
     
     return prices
 
 
+class BoardSnapshot:
+    """
+    东方财富国际期货行情板快照
+    每次采集只建一次 名称 -> 最新价 索引，之后任意数量的品种都从索引中查找
+    """
+    
+    def __init__(self, df):
+        # 同名合约保留行情板中靠前的一条，无效价格不入索引
+        self._prices: Dict[str, float] = {}
+        for name, value in zip(df['名称'], df['最新价']):
+            price = _parse_price(value)
+            if price and isinstance(name, str):
+                self._prices.setdefault(name, price)
+    
+    def __len__(self) -> int:
+        return len(self._prices)
+    
+    def get(self, name: str) -> Optional[float]:
+        """按名称精确查找"""
+        return self._prices.get(name)
+    
+    def resolve(self, targets: Dict[str, dict]) -> Dict[str, Tuple[str, float]]:
+        """
+        批量解析品种价格
+        
+        Args:
+            targets: {品种代码: 配置}，配置中含 em_name（精确匹配）或 em_prefix（前缀匹配）
+        
+        Returns:
+            {品种代码: (行情板名称, 价格)}
+        """
+        resolved = {}
+        prefixes = {}
+        
+        for symbol, config in targets.items():
+            name = config.get("em_name")
+            if name:
+                price = self._prices.get(name)
+                if price:
+                    resolved[symbol] = (name, price)
+            elif config.get("em_prefix"):
+                prefixes[symbol] = config["em_prefix"]
+        
+        # 前缀匹配只扫描一遍索引，取行情板中第一条有效价格
+        if prefixes:
+            for name, price in self._prices.items():
+                for symbol, prefix in list(prefixes.items()):
+                    if name.startswith(prefix):
+                        resolved[symbol] = (name, price)
+                        del prefixes[symbol]
+                if not prefixes:
+                    break
+        
+        return resolved
+
+
+def fetch_global_board() -> Optional[BoardSnapshot]:
+    """
+    下载东方财富国际期货行情板并建立索引
+    使用 futures_global_spot_em 接口 (东方财富网-国际期货-实时行情)
+    """
+    df = retry_scheduler.call(
+        "futures_global_spot_em", ak.futures_global_spot_em,
+        timeout=FETCH_CONFIG["source_timeout"],
+    )
+    if df is None or df.empty:
+        return None
+    return BoardSnapshot(df)
+
+
 def fetch_global_spot_prices() -> Dict[str, float]:
     """
     获取全球期货现货价格
-    使用 futures_global_spot_em 接口 (东方财富网-国际期货-实时行情)
-    获取 LME 金属和布伦特原油
+    一次下载行情板，按 SYMBOLS_CONFIG 中配置的名称解析 LME 金属、布伦特原油等品种
     """
     prices = {}
     
     try:
-        @retry_with_backoff
-        def get_global_data():
-            return ak.futures_global_spot_em()
-        
-        df = get_global_data()
-        if df is not None and not df.empty:
-            # 查找综合铜03 (LME铜)
-            cu = df[df['名称'] == '综合铜03']
-            if not cu.empty:
-                price = cu.iloc[0]['最新价']
-                if price and str(price) != 'nan':
-                    prices['LME.CU'] = float(price)
-                    print(f"  LME.CU: {price}")
-            
-            # 查找综合铝03 (LME铝)
-            al = df[df['名称'] == '综合铝03']
-            if not al.empty:
-                price = al.iloc[0]['最新价']
-                if price and str(price) != 'nan':
-                    prices['LME.AL'] = float(price)
-                    print(f"  LME.AL: {price}")
-            
-            # 查找布伦特原油 (当月连续或最近合约)
-            brent = df[df['名称'].str.contains('布伦特原油', na=False)]
-            if not brent.empty:
-                for _, row in brent.iterrows():
-                    price = row['最新价']
-                    if price and str(price) != 'nan':
-                        prices['BRENT'] = float(price)
-                        print(f"  BRENT ({row['名称']}): {price}")
-                        break
-                    
+        board = fetch_global_board()
+        if board is not None:
+            for symbol, (name, price) in board.resolve(GLOBAL_BOARD_SYMBOLS).items():
+                prices[symbol] = price
+                print(f"  {symbol} ({name}): {price}")
     except Exception as e:
         print(f"  ❌ 获取全球期货数据失败: {e}")
     
     return prices
 
 
-def save_prices(prices: Dict[str, float], exchange_rate: float):
+# 各品种最近一次写入分钟行情的 (价格, 人民币价格, 时间)，进程重启后每个品种先完整写入一次
+_last_stored: Dict[str, Tuple[float, Optional[float], datetime]] = {}
+_last_stored_lock = threading.Lock()
+
+# 采集时间有秒级抖动，心跳提前半分钟判定，避免拖到下一分钟
+_HEARTBEAT_SLACK = timedelta(seconds=30)
+
+
+def _changed_records(records: List[dict]) -> List[dict]:
+    """
+    去重模式下只保留价格或人民币价格变化、或距上次写入已到心跳间隔的记录
+    （外盘价格不变而汇率更新时 price_cny 会变，也需要写入）
+    """
+    if not TICK_CONFIG["dedup"]:
+        return records
+    heartbeat = timedelta(minutes=TICK_CONFIG["heartbeat_minutes"]) - _HEARTBEAT_SLACK
+    changed = []
+    with _last_stored_lock:
+        for r in records:
+            last = _last_stored.get(r["symbol"])
+            if (last is None or (last[0], last[1]) != (r["price"], r["price_cny"])
+                    or r["timestamp"] - last[2] >= heartbeat):
+                changed.append(r)
+    return changed
+
+
+def _remember_stored(records: List[dict]):
+    with _last_stored_lock:
+        for r in records:
+            _last_stored[r["symbol"]] = (r["price"], r["price_cny"], r["timestamp"])
+
+
+def save_prices(prices: Dict[str, float], exchange_rate: Optional[float]):
     """
     保存价格数据到数据库
+    exchange_rate 为 None（尚无有效汇率）时，需要汇率换算的品种 price_cny 留空
     """
     if not prices:
         return
         
-    db = SessionLocal()
     timestamp = datetime.now()
+    records = []
     
-    try:
-        for symbol, price in prices.items():
-            if symbol not in SYMBOLS_CONFIG:
-                continue
-                
-            config = SYMBOLS_CONFIG[symbol]
-            
-            # 计算人民币价格
-            price_cny = convert_to_cny(symbol, price, exchange_rate)
+    for symbol, price in prices.items():
+        if symbol not in SYMBOLS_CONFIG:
+            continue
             
-            record = RealtimePrice(
-                timestamp=timestamp,
-                symbol=symbol,
-                name=config["name"],
-                price=price,
-                price_cny=price_cny,
-                unit=config["unit"],
-                market=config["market"]
-            )
-            
-            db.add(record)
+        config = SYMBOLS_CONFIG[symbol]
         
-        db.commit()
-        print(f"✅ 已保存 {len(prices)} 条价格数据")
+        # 计算人民币价格
+        if exchange_rate is None and "conversion" in CONVERSION_CONFIG.get(symbol, {}):
+            price_cny = None
+        else:
+            price_cny = convert_to_cny(symbol, price, exchange_rate)
         
+        records.append({
+            "timestamp": timestamp,
+            "symbol": symbol,
+            "name": config["name"],
+            "price": price,
+            "price_cny": price_cny,
+            "unit": config["unit"],
+            "market": config["market"],
+        })
+    
+    # 价格未变化的品种只更新最新价格表（读取方按心跳间隔前向填充）
+    changed = _changed_records(records)
+    
+    def write(db):
+        # 分钟行情与最新价格表在同一事务中写入；分钟行情只存品种 id
+        # 国内、国际采集任务时间重叠时同一分钟可能重复写入，冲突的行直接跳过
+        ids = get_instrument_ids(db)
+        inserted = insert_ignore(db, Tick, [
+            {"instrument_id": ids[r["symbol"]], "timestamp": r["timestamp"],
+             "price": r["price"], "price_cny": r["price_cny"]}
+            for r in changed
+        ])
+        upsert_latest_prices(db, records)
+        return inserted
+    
+    try:
+        inserted = db_writer.write(write, name="prices", timeout=WRITER_CONFIG["submit_timeout"])
+        _remember_stored(changed)
+        skipped = len(records) - inserted
+        print(f"✅ 已保存 {inserted} 条价格数据" + (f"（价格未变或重复，跳过 {skipped} 条）" if skipped else ""))
     except Exception as e:
-        db.rollback()
         print(f"❌ 保存价格数据失败: {e}")
-    finally:
-        db.close()
 
 
 def fetch_cn_futures():
     """
     采集并保存国内期货数据
+    返回各品种采集耗时
     """
     print(f"[{datetime.now()}] 开始采集国内期货数据...")
-    exchange_rate = get_latest_exchange_rate()
-    prices = fetch_cn_futures_prices()
+    exchange_rate = get_conversion_rate()
+    prices, timings = fetch_cn_futures_prices(return_timings=True)
     
     if prices:
         save_prices(prices, exchange_rate)
     else:
         print("⚠️ 未获取到国内期货数据")
     print(f"[{datetime.now()}] 国内期货数据采集完成")
+    return timings
 
 
 def fetch_intl_futures():
@@ -279,7 +596,7 @@ def fetch_intl_futures():
     采集并保存国际期货数据
     """
     print(f"[{datetime.now()}] 开始采集国际期货数据...")
-    exchange_rate = get_latest_exchange_rate()
+    exchange_rate = get_conversion_rate()
     
     # 国际期货 (COMEX/CBOT) - 带主备切换
     intl_prices = fetch_intl_futures_prices()
@@ -301,7 +618,7 @@ def fetch_all_futures():
     采集所有期货数据
     """
     print(f"[{datetime.now()}] 采集所有期货数据...")
-    exchange_rate = get_latest_exchange_rate()
+    exchange_rate = get_conversion_rate()
     print(f"当前汇率: {exchange_rate}")
     
     # 国内期货
@@ -0,0 +1,126 @@
+"""
+外盘期货日线历史缓存
+全量历史每天只下载一次并落盘，盘中只用实时报价更新内存中的最后一行
+（新交易日追加一行时才落盘，避免每次报价都重写整个历史文件）
+"""
+import threading
+from datetime import date
+from typing import Dict, Optional
+
+import pandas as pd
+import akshare as ak
+
+from app.config import DATA_DIR, FETCH_CONFIG
+from app.fetchers.retry import retry_scheduler
+
+# 缓存目录
+CACHE_DIR = DATA_DIR / "cache" / "foreign_hist"
+
+# 进程内已加载的历史数据 {外盘代码: DataFrame}
+_frames: Dict[str, pd.DataFrame] = {}
+_lock = threading.Lock()
+
+
+def _cache_path(code: str):
+    return CACHE_DIR / f"{code}.pkl"
+
+
+def _save(code: str, df: pd.DataFrame):
+    """写入磁盘缓存"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    df.to_pickle(_cache_path(code))
+
+
+def _load(code: str) -> Optional[pd.DataFrame]:
+    """内存中的历史，未加载时读取磁盘缓存（调用方持有 _lock）"""
+    df = _frames.get(code)
+    if df is None and _cache_path(code).exists():
+        try:
+            df = pd.read_pickle(_cache_path(code))
+            _frames[code] = df
+        except Exception as e:
+            print(f"  ⚠️ 读取 {code} 历史缓存失败: {e}")
+    return df
+
+
+def _refreshed_today(df: Optional[pd.DataFrame]) -> bool:
+    """缓存是否为今天下载的全量历史"""
+    return df is not None and df.attrs.get("refreshed_on") == date.today().isoformat()
+
+
+def get_foreign_hist(code: str, refresh: bool = False) -> Optional[pd.DataFrame]:
+    """
+    获取外盘期货日线历史（带磁盘缓存）
+
+    Args:
+        code: 外盘期货代码，如 GC、SI
+        refresh: 是否强制重新下载全量历史
+
+    Returns:
+        日线 DataFrame（date, open, high, low, close, volume），获取失败返回 None
+    """
+    with _lock:
+        df = _load(code)
+        if not refresh and _refreshed_today(df):
+            return df
+
+    # 每天首次访问时下载一次全量历史
+    try:
+        fresh = retry_scheduler.call(
+            "futures_foreign_hist", ak.futures_foreign_hist, symbol=code,
+            timeout=FETCH_CONFIG["source_timeout"],
+        )
+    except Exception as e:
+        print(f"  ⚠️ 下载 {code} 历史数据失败: {e}")
+        return df
+
+    if fresh is None or fresh.empty:
+        return df
+
+    fresh.attrs["refreshed_on"] = date.today().isoformat()
+    with _lock:
+        _frames[code] = fresh
+        _save(code, fresh)
+    return fresh
+
+
+def update_tail(code: str, price: float, trade_date: Optional[date] = None):
+    """
+    用实时报价更新缓存的最后一行
+    当天已有 K 线时更新收盘价和高低价（只改内存），否则追加一行并落盘
+    未加载时读取磁盘缓存，不会触发下载
+    """
+    trade_date = trade_date or date.today()
+
+    with _lock:
+        df = _load(code)
+        if df is None or df.empty:
+            return
+
+        last_date = pd.Timestamp(df["date"].iloc[-1]).date()
+        if last_date == trade_date:
+            idx = df.index[-1]
+            df.loc[idx, "close"] = price
+            df.loc[idx, "high"] = max(df.loc[idx, "high"], price)
+            df.loc[idx, "low"] = min(df.loc[idx, "low"], price)
+            # 盘中更新只改内存，追加新交易日或全量刷新时再落盘
+            return
+        if last_date < trade_date:
+            new_date = pd.Timestamp(trade_date) if pd.api.types.is_datetime64_any_dtype(df["date"]) \
+                else trade_date.isoformat()
+            row = pd.DataFrame([{
+                "date": new_date,
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "volume": 0,
+            }])
+            attrs = dict(df.attrs)
+            df = pd.concat([df, row], ignore_index=True)
+            df.attrs.update(attrs)
+            _frames[code] = df
+        else:
+            return
+
+        _save(code, df)
@@ -1,11 +1,13 @@
 """
 宏观数据采集器 - CPI、汽柴油价格等
 """
-from datetime import datetime, date
-from typing import List, Dict
+from typing import List
 import akshare as ak
 
-from app.database import SessionLocal, MacroData
+from app.database import MacroData, bulk_upsert
+from app.fetchers.normalize import normalize_frame, to_records
+from app.config import WRITER_CONFIG
+from app.writer import db_writer
 
 
 def fetch_china_cpi() -> List[dict]:
@@ -16,26 +18,21 @@ def fetch_china_cpi() -> List[dict]:
     try:
         df = ak.macro_china_cpi_monthly()
         if df is not None and not df.empty:
-            for _, row in df.iterrows():
-                # 解析日期（格式如 "2024年01月"）
-                date_str = str(row.get('月份') or row.get('统计时间', ''))
-                try:
-                    if '年' in date_str and '月' in date_str:
-                        year = int(date_str.split('年')[0])
-                        month = int(date_str.split('年')[1].replace('月', ''))
-                        record_date = date(year, month, 1)
-                    else:
-                        continue
-                except:
-                    continue
-                
-                data.append({
-                    "date": record_date,
-                    "indicator": "CPI_CN",
-                    "value": float(row.get('全国当月', 0) or row.get('同比', 0)),
-                    "yoy_change": float(row.get('全国当月', 0) or row.get('同比', 0)),
-                    "mom_change": float(row.get('全国环比', 0) or row.get('环比', 0)) if '全国环比' in row or '环比' in row else None,
-                })
+            # 日期格式如 "2024年01月"
+            normalized = normalize_frame(
+                df,
+                {
+                    "date": ["月份", "统计时间"],
+                    "value": ["全国当月", "同比"],
+                    "mom_change": ["全国环比", "环比"],
+                },
+                date_format="cn_month",
+                numeric=["value", "mom_change"],
+                required=["date", "value"],
+                constants={"indicator": "CPI_CN"},
+            )
+            normalized["yoy_change"] = normalized["value"]
+            data = to_records(normalized)
     except Exception as e:
         print(f"获取中国CPI数据失败: {e}")
     
@@ -50,26 +47,15 @@ def fetch_us_cpi() -> List[dict]:
     try:
         df = ak.macro_usa_cpi_monthly()
         if df is not None and not df.empty:
-            for _, row in df.iterrows():
-                # 解析日期
-                date_val = row.get('日期') or row.get('date')
-                if isinstance(date_val, str):
-                    try:
-                        record_date = datetime.strptime(date_val, "%Y-%m-%d").date()
-                    except:
-                        continue
-                elif isinstance(date_val, date):
-                    record_date = date_val
-                else:
-                    continue
-                
-                data.append({
-                    "date": record_date,
-                    "indicator": "CPI_US",
-                    "value": float(row.get('今值', 0) or row.get('value', 0)),
-                    "yoy_change": float(row.get('今值', 0) or row.get('value', 0)),
-                    "mom_change": None,
-                })
+            normalized = normalize_frame(
+                df,
+                {"date": ["日期", "date"], "value": ["今值", "value"]},
+                numeric=["value"],
+                required=["date", "value"],
+                constants={"indicator": "CPI_US", "mom_change": None},
+            )
+            normalized["yoy_change"] = normalized["value"]
+            data = to_records(normalized)
     except Exception as e:
         print(f"获取美国CPI数据失败: {e}")
     
@@ -84,40 +70,19 @@ def fetch_oil_retail_price() -> List[dict]:
     try:
         df = ak.energy_oil_hist()
         if df is not None and not df.empty:
-            for _, row in df.iterrows():
-                # 解析日期
-                date_val = row.get('日期') or row.get('date')
-                if isinstance(date_val, str):
-                    try:
-                        record_date = datetime.strptime(date_val, "%Y-%m-%d").date()
-                    except:
-                        continue
-                elif isinstance(date_val, date):
-                    record_date = date_val
-                else:
-                    continue
-                
-                # 汽油价格
-                gasoline_price = row.get('汽油价格') or row.get('92号汽油')
-                if gasoline_price:
-                    data.append({
-                        "date": record_date,
-                        "indicator": "GASOLINE_CN",
-                        "value": float(gasoline_price),
-                        "yoy_change": None,
-                        "mom_change": None,
-                    })
-                
-                # 柴油价格
-                diesel_price = row.get('柴油价格') or row.get('0号柴油')
-                if diesel_price:
-                    data.append({
-                        "date": record_date,
-                        "indicator": "DIESEL_CN",
-                        "value": float(diesel_price),
-                        "yoy_change": None,
-                        "mom_change": None,
-                    })
+            # 汽油、柴油各生成一组记录
+            for indicator, aliases in (
+                ("GASOLINE_CN", ["汽油价格", "92号汽油"]),
+                ("DIESEL_CN", ["柴油价格", "0号柴油"]),
+            ):
+                normalized = normalize_frame(
+                    df,
+                    {"date": ["日期", "date"], "value": aliases},
+                    numeric=["value"],
+                    required=["date", "value"],
+                    constants={"indicator": indicator, "yoy_change": None, "mom_change": None},
+                )
+                data.extend(to_records(normalized[normalized["value"] != 0]))
                     
     except Exception as e:
         print(f"获取汽柴油价格失败: {e}")
@@ -127,44 +92,29 @@ def fetch_oil_retail_price() -> List[dict]:
 
 def save_macro_data(data: List[dict]):
     """
-    保存宏观数据
+    保存宏观数据（按 日期+指标 批量 UPSERT）
     """
     if not data:
         return
     
-    db = SessionLocal()
+    rows = [{
+        "date": item["date"],
+        "indicator": item["indicator"],
+        "value": item["value"],
+        "yoy_change": item.get("yoy_change"),
+        "mom_change": item.get("mom_change"),
+    } for item in data]
+    
     try:
-        for item in data:
-            # 检查是否已存在
-            existing = db.query(MacroData).filter(
-                MacroData.indicator == item["indicator"],
-                MacroData.date == item["date"]
-            ).first()
-            
-            if existing:
-                # 更新
-                existing.value = item["value"]
-                existing.yoy_change = item.get("yoy_change")
-                existing.mom_change = item.get("mom_change")
-            else:
-                # 新增
-                record = MacroData(
-                    date=item["date"],
-                    indicator=item["indicator"],
-                    value=item["value"],
-                    yoy_change=item.get("yoy_change"),
-                    mom_change=item.get("mom_change")
-                )
-                db.add(record)
-        
-        db.commit()
+        db_writer.write(lambda db: bulk_upsert(
+            db, MacroData, rows,
+            conflict_columns=["date", "indicator"],
+            update_columns=["value", "yoy_change", "mom_change"],
+        ), name="macro_data", timeout=WRITER_CONFIG["submit_timeout"])
         print(f"✅ 已保存 {len(data)} 条宏观数据")
         
     except Exception as e:
-        db.rollback()
         print(f"❌ 保存宏观数据失败: {e}")
-    finally:
-        db.close()
 
 
 def update_macro_data():
@@ -0,0 +1,97 @@
+"""
+上游 DataFrame 规范化
+按列名映射取列、向量化转换类型并校验，输出可直接批量写入的记录列表
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def coalesce(df: pd.DataFrame, aliases: Sequence[str]) -> Optional[pd.Series]:
+    """按候选列名顺序合并，前面的列为空时取后面的列；都不存在返回 None"""
+    result = None
+    for alias in aliases:
+        if alias not in df.columns:
+            continue
+        column = df[alias]
+        result = column if result is None else result.where(result.notna(), column)
+    return result
+
+
+def parse_dates(series: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """向量化解析日期，无法解析的为 NaT，返回 datetime.date 对象列"""
+    if date_format == "cn_month":
+        # "2024年01月" 之类的中文年月，取当月 1 日
+        parts = series.astype(str).str.extract(r"(\d{4})\s*年\s*(\d{1,2})\s*月")
+        parsed = pd.to_datetime(
+            {"year": pd.to_numeric(parts[0], errors="coerce"),
+             "month": pd.to_numeric(parts[1], errors="coerce"),
+             "day": 1},
+            errors="coerce",
+        )
+    else:
+        parsed = pd.to_datetime(series, format=date_format, errors="coerce")
+    return parsed.dt.date.where(parsed.notna(), None)
+
+
+def normalize_frame(
+    df: pd.DataFrame,
+    column_map: Dict[str, Sequence[str]],
+    date_column: str = "date",
+    date_format: Optional[str] = None,
+    numeric: Iterable[str] = (),
+    integer: Iterable[str] = (),
+    required: Iterable[str] = ("date",),
+    constants: Optional[Dict[str, object]] = None,
+) -> pd.DataFrame:
+    """
+    规范化上游 DataFrame
+
+    Args:
+        df: 上游原始数据
+        column_map: {目标列: [候选源列, ...]}，候选列依次合并
+        date_column: 需要解析为日期的目标列
+        date_format: 日期格式（strftime 格式，或 "cn_month" 表示中文年月）
+        numeric: 转换为浮点数的目标列（无法转换为 NaN）
+        integer: 转换为整数的目标列（空值记为 0）
+        required: 为空时整行丢弃的目标列
+        constants: 追加的常量列，如 {"indicator": "CPI_CN"}
+
+    Returns:
+        只包含目标列的 DataFrame
+    """
+    out = pd.DataFrame(index=df.index)
+    for target, aliases in column_map.items():
+        column = coalesce(df, aliases)
+        out[target] = column if column is not None else np.nan
+
+    if date_column in out:
+        out[date_column] = parse_dates(out[date_column], date_format)
+    for column in numeric:
+        out[column] = pd.to_numeric(out[column], errors="coerce").astype("float64")
+    for column in integer:
+        out[column] = pd.to_numeric(out[column], errors="coerce").fillna(0).astype("int64")
+
+    out = out.dropna(subset=[c for c in required if c in out])
+    for column, value in (constants or {}).items():
+        out[column] = value
+    return out
+
+
+def to_records(df: pd.DataFrame) -> List[dict]:
+    """转换为记录列表，NaN 转为 None，数值转为 Python 原生类型"""
+    if df.empty:
+        return []
+
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        values = series.tolist()
+        missing = series.isna()
+        if missing.any():
+            values = [None if m else v for v, m in zip(values, missing.tolist())]
+        columns.append(values)
+
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
@@ -0,0 +1,184 @@
+"""
+非阻塞重试调度器
+失败的调用按带抖动的指数退避重新排入线程池，等待期间不占用任何工作线程
+所有期货采集器和汇率数据源共用一个实例，并按数据源统计重试次数
+每个数据源使用独立的有界线程池：akshare 等接口没有网络超时，超时后仍在执行的请求
+无法取消，只会占满本数据源的线程，不影响其他数据源
+每个数据源挂接熔断器，熔断期间调用直接失败（CircuitOpenError）
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, InvalidStateError
+from typing import Callable, Dict, Optional
+
+from app.config import FETCH_CONFIG
+from app import metrics
+from app.fetchers.circuit_breaker import CircuitOpenError, get_breaker
+
+
+class RetryScheduler:
+    """
+    重试调度器
+
+    submit() 立即返回 Future；调用在线程池中执行，失败后由定时线程在退避时间到期时
+    重新提交，超过截止时间或重试次数后以最后一次异常结束。调用方取消 Future 后
+    不再发起新的尝试。最终结果计入该数据源的熔断器
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self._max_workers = max_workers
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._executors_lock = threading.Lock()
+        self._timers = []  # 堆: (到期时间, 序号, 回调)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._timer_thread: Optional[threading.Thread] = None
+
+    def submit(
+        self,
+        source: str,
+        func: Callable,
+        *args,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        deadline: Optional[float] = None,
+        **kwargs,
+    ) -> Future:
+        """
+        提交一次带重试的调用
+
+        Args:
+            source: 数据源名称，用于统计
+            func: 要执行的函数
+            max_retries: 最多尝试次数（含首次）
+            base_delay: 首次重试的基础等待时间（秒）
+            deadline: time.monotonic() 截止时间，等待后会超过截止时间时不再重试
+        """
+        result = Future()
+        breaker = get_breaker(source)
+        if not breaker.allow():
+            metrics.incr("fetch_skipped", source)
+            result.set_exception(CircuitOpenError(source))
+            return result
+        
+        policy = {
+            "source": source,
+            "breaker": breaker,
+            "max_retries": max_retries or FETCH_CONFIG["retry_max_attempts"],
+            "base_delay": base_delay if base_delay is not None else FETCH_CONFIG["retry_base_delay"],
+            "deadline": deadline,
+            "executor": self._executor_for(source),
+        }
+        metrics.incr("fetch_calls", source)
+        # 调用方取消时熔断器拿不到结果，释放可能占用的半开探测名额
+        result.add_done_callback(lambda f: f.cancelled() and breaker.release_probe())
+        policy["executor"].submit(self._attempt, result, policy, func, args, kwargs, 0)
+        return result
+
+    def call(self, source: str, func: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        提交调用并等待结果（只阻塞调用方，重试等待不占用工作线程）
+        超时后取消剩余重试并抛出 TimeoutError
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        future = self.submit(source, func, *args, deadline=deadline, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                # 超时视同失败，计入熔断器
+                get_breaker(source).record_failure()
+            metrics.incr("fetch_timeouts", source)
+            raise
+
+    def _attempt(self, result: Future, policy: dict, func: Callable, args, kwargs, attempt: int):
+        if result.cancelled():
+            return
+
+        source = policy["source"]
+        try:
+            value = func(*args, **kwargs)
+        except Exception as e:
+            next_attempt = attempt + 1
+            delay = self._backoff(policy["base_delay"], attempt)
+            deadline = policy["deadline"]
+
+            if next_attempt >= policy["max_retries"] or \
+                    (deadline is not None and time.monotonic() + delay >= deadline):
+                metrics.incr("fetch_failures", source)
+                if self._finish(result, error=e):
+                    policy["breaker"].record_failure()
+                return
+
+            metrics.incr("retries", source)
+            print(f"  {source} 重试 {next_attempt}/{policy['max_retries'] - 1}，{delay:.1f}s 后执行: {e}")
+            self._schedule(delay, lambda: policy["executor"].submit(
+                self._attempt, result, policy, func, args, kwargs, next_attempt
+            ))
+            return
+
+        if self._finish(result, value=value):
+            policy["breaker"].record_success()
+
+    def _executor_for(self, source: str) -> ThreadPoolExecutor:
+        """数据源的线程池（按需创建）；"接口:品种" 形式的数据源共用该接口的线程池"""
+        family = source.split(":", 1)[0]
+        with self._executors_lock:
+            executor = self._executors.get(family)
+            if executor is None:
+                executor = self._executors[family] = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix=f"fetch-{family}"
+                )
+            return executor
+
+    @staticmethod
+    def _backoff(base_delay: float, attempt: int) -> float:
+        """指数退避，带 50%~100% 随机抖动，避免多个数据源同时重试"""
+        delay = min(base_delay * (2 ** attempt), FETCH_CONFIG["retry_max_delay"])
+        return delay * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _finish(result: Future, value=None, error: Optional[BaseException] = None) -> bool:
+        """设置结果，调用方已取消时返回 False"""
+        try:
+            if error is not None:
+                result.set_exception(error)
+            else:
+                result.set_result(value)
+            return True
+        except InvalidStateError:
+            return False
+
+    def _schedule(self, delay: float, callback: Callable):
+        """在 delay 秒后执行 callback（由单个定时线程触发）"""
+        with self._cond:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._seq), callback))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(
+                    target=self._run_timers, name="retry-timer", daemon=True
+                )
+                self._timer_thread.start()
+            self._cond.notify()
+
+    def _run_timers(self):
+        while True:
+            with self._cond:
+                while not self._timers:
+                    self._cond.wait()
+                due, _, callback = self._timers[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                heapq.heappop(self._timers)
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ 重试调度失败: {e}")
+
+
+# 全局共享实例
+retry_scheduler = RetryScheduler(max_workers=FETCH_CONFIG["max_workers"])
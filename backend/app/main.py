@@ -1,13 +1,17 @@
 """
 大宗商品战情室 - FastAPI 主入口
 """
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.config import API_PREFIX
+from app.config import API_PREFIX, API_CONFIG
 from app.scheduler import start_scheduler, shutdown_scheduler
-from app.database import init_db
+from app.database import init_db, async_engine, AIOSQLITE_AVAILABLE
+from app.writer import db_writer
+from app.fetchers.exchange_rate_fetcher import warm_exchange_rate_cache
+from app import analytics
 
 
 @asynccontextmanager
@@ -16,6 +20,9 @@ async def lifespan(app: FastAPI):
     # 启动时
     print("🚀 大宗商品战情室启动中...")
     init_db()
+    db_writer.start()
+    # 首批行情任务之前准备好有效汇率；可能访问网络，放到线程中执行
+    await asyncio.to_thread(warm_exchange_rate_cache)
     start_scheduler()
     print("✅ 服务启动完成")
     
@@ -24,6 +31,10 @@ async def lifespan(app: FastAPI):
     # 关闭时
     print("🛑 正在关闭服务...")
     shutdown_scheduler()
+    db_writer.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+    analytics.close()
     print("👋 服务已关闭")
 
 
@@ -44,11 +55,20 @@ app.add_middleware(
 )
 
 # 注册路由
-from app.api import snapshot, calculator, normalized, export, macro, admin
+from app.api import snapshot, calculator, normalized, export, macro, admin, bars
+
+# 异步只读接口先注册，同路径时优先匹配（默认关闭，见 API_CONFIG）
+if API_CONFIG["async_reads"]:
+    if AIOSQLITE_AVAILABLE:
+        from app.api import async_reads
+        app.include_router(async_reads.router, prefix=API_PREFIX, tags=["异步只读接口"])
+    else:
+        print("⚠️ aiosqlite 未安装，async_reads 配置无效，继续使用同步接口")
 
 app.include_router(snapshot.router, prefix=API_PREFIX, tags=["实时数据"])
 app.include_router(calculator.router, prefix=API_PREFIX, tags=["溢价率计算器"])
 app.include_router(normalized.router, prefix=API_PREFIX, tags=["归一化图表"])
+app.include_router(bars.router, prefix=API_PREFIX, tags=["K线"])
 app.include_router(export.router, prefix=API_PREFIX, tags=["数据导出"])
 app.include_router(macro.router, prefix=API_PREFIX, tags=["宏观数据"])
 app.include_router(admin.router, prefix=API_PREFIX, tags=["管理"])
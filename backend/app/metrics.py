@@ -0,0 +1,58 @@
+"""
+进程内运行指标 - 计数器、耗时统计与当前值
+通过 /api/admin/metrics 查看
+"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+_timings: Dict[str, Dict[str, dict]] = defaultdict(dict)
+_gauges: Dict[str, Dict[str, float]] = defaultdict(dict)
+
+
+def incr(group: str, key: str, n: int = 1):
+    """计数器累加，如 incr("retries", "fx_spot_quote")"""
+    with _lock:
+        _counters[group][key] += n
+
+
+def observe(group: str, key: str, seconds: float):
+    """记录一次耗时（秒）"""
+    with _lock:
+        stat = _timings[group].get(key)
+        if stat is None:
+            stat = _timings[group][key] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+        stat["count"] += 1
+        stat["total"] += seconds
+        stat["max"] = max(stat["max"], seconds)
+        stat["last"] = seconds
+
+
+def gauge(group: str, key: str, value: float):
+    """记录当前值（如队列深度），保留最新值和历史最大值"""
+    with _lock:
+        _gauges[group][key] = value
+        peak = f"{key}_max"
+        _gauges[group][peak] = max(_gauges[group].get(peak, value), value)
+
+
+def snapshot() -> dict:
+    """导出当前所有指标"""
+    with _lock:
+        counters = {group: dict(values) for group, values in _counters.items()}
+        timings = {
+            group: {
+                key: {
+                    "count": stat["count"],
+                    "avg": round(stat["total"] / stat["count"], 4) if stat["count"] else None,
+                    "max": round(stat["max"], 4),
+                    "last": round(stat["last"], 4),
+                }
+                for key, stat in values.items()
+            }
+            for group, values in _timings.items()
+        }
+        gauges = {group: dict(values) for group, values in _gauges.items()}
+    return {"counters": counters, "timings": timings, "gauges": gauges}
@@ -0,0 +1,230 @@
+"""
+数据库版本迁移
+create_all 只会创建缺失的表，不会给已有表补索引或改结构；这些变更按版本号写成迁移，
+当前版本记录在 SQLite 的 PRAGMA user_version 中，init_db 时执行所有未执行过的迁移
+
+新增迁移：在文件末尾用 @migration(下一个版本号, "说明") 注册一个函数，
+函数接收一个连接，语句应可重复执行（如 CREATE INDEX IF NOT EXISTS）
+"""
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+# 已注册的迁移 [(版本号, 说明, 函数)]
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: int, description: str):
+    """注册一个迁移"""
+    def decorator(func: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def _object_type(conn: Connection, name: str):
+    """sqlite_master 中对象的类型（'table' / 'view'），不存在时为 None"""
+    return conn.exec_driver_sql(
+        "SELECT type FROM sqlite_master WHERE name = ?", (name,)
+    ).scalar()
+
+
+def _columns(conn: Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+
+
+def prepare_legacy_schema(conn: Connection):
+    """
+    迁移 4 之前 realtime_prices 是普通表，已执行过的迁移 1、2 依赖它
+    未升级到 v4 的库（包括新库）缺少该表时先按旧结构建表，由迁移 4 转换为视图
+    """
+    if get_schema_version(conn) >= 4 or _object_type(conn, "realtime_prices") is not None:
+        return
+    conn.exec_driver_sql("""
+        CREATE TABLE realtime_prices (
+            id INTEGER NOT NULL PRIMARY KEY,
+            timestamp DATETIME NOT NULL,
+            symbol VARCHAR(20) NOT NULL,
+            name VARCHAR(50),
+            price FLOAT NOT NULL,
+            price_cny FLOAT,
+            unit VARCHAR(20),
+            market VARCHAR(10),
+            CONSTRAINT uix_realtime_ts_symbol UNIQUE (timestamp, symbol)
+        )
+    """)
+
+
+def vacuum(engine: Engine) -> int:
+    """
+    完整 VACUUM：整理数据库文件，并让迁移 3 设置的 auto_vacuum 模式生效
+    需要重写整个文件，库较大时耗时较长且期间阻塞写入，只在命令行手动执行
+
+    Returns:
+        执行后的 auto_vacuum 模式（2 为 INCREMENTAL）
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+        return conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+
+
+def run_migrations(engine: Engine) -> int:
+    """
+    执行所有高于当前版本的迁移，每个迁移与其版本号在同一事务中提交
+
+    Returns:
+        迁移后的版本号
+    """
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    for version, description, func in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            func(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+        current = version
+        print(f"🔧 数据库迁移 v{version}: {description}")
+
+    return current
+
+
+# 热点查询及其应命中的索引，用于检查查询计划是否退化为全表扫描
+HOT_QUERIES: Dict[str, Tuple[str, str]] = {
+    "latest_price": (
+        "SELECT * FROM realtime_prices WHERE symbol = 'SHFE.AU' ORDER BY timestamp DESC LIMIT 1",
+        "ix_tick_instrument_ts",
+    ),
+    "price_range": (
+        "SELECT * FROM realtime_prices WHERE symbol = 'SHFE.AU' AND timestamp >= '2024-01-01' "
+        "ORDER BY timestamp",
+        "ix_tick_instrument_ts",
+    ),
+    "daily_range": (
+        "SELECT * FROM daily_ohlc WHERE symbol = 'SHFE.AU' AND date >= '2024-01-01' ORDER BY date",
+        "ix_daily_symbol_date",
+    ),
+    "spread_history": (
+        "SELECT * FROM spread_data WHERE pair = 'GOLD' AND timestamp >= '2024-01-01' ORDER BY timestamp",
+        "ix_spread_pair_ts",
+    ),
+    "ratio_history": (
+        "SELECT * FROM ratio_data WHERE ratio_type = 'GOLD_SILVER' AND timestamp >= '2024-01-01' "
+        "ORDER BY timestamp",
+        "ix_ratio_type_ts",
+    ),
+    "macro_series": (
+        "SELECT * FROM macro_data WHERE indicator = 'CPI_CN' ORDER BY date DESC LIMIT 24",
+        "ix_macro_indicator_date",
+    ),
+}
+
+
+def explain(conn: Connection, sql: str) -> List[str]:
+    """EXPLAIN QUERY PLAN 的 detail 列"""
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def check_query_plans(engine: Engine) -> Dict[str, dict]:
+    """
+    检查热点查询的执行计划
+
+    Returns:
+        {查询名: {"plan": [...], "index": 期望索引, "ok": 是否使用了期望索引且没有临时排序}}
+    """
+    results = {}
+    with engine.connect() as conn:
+        for name, (sql, index) in HOT_QUERIES.items():
+            plan = explain(conn, sql)
+            uses_index = any(index in step for step in plan)
+            temp_sort = any("TEMP B-TREE" in step for step in plan)
+            results[name] = {"plan": plan, "index": index, "ok": uses_index and not temp_sort}
+    return results
+
+
+@migration(1, "按查询形状添加复合索引")
+def _add_query_indexes(conn: Connection):
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_realtime_symbol_ts ON realtime_prices (symbol, timestamp DESC)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_daily_symbol_date ON daily_ohlc (symbol, date)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_macro_indicator_date ON macro_data (indicator, date)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_spread_pair_ts ON spread_data (pair, timestamp)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_ratio_type_ts ON ratio_data (ratio_type, timestamp)")
+    conn.exec_driver_sql("ANALYZE")
+
+
+@migration(2, "新增 latest_prices 最新价格表并从历史数据填充")
+def _populate_latest_prices(conn: Connection):
+    from app.database import rebuild_latest_prices
+    rebuild_latest_prices(conn)
+
+
+@migration(3, "启用增量 VACUUM（auto_vacuum = INCREMENTAL）")
+def _enable_incremental_vacuum(conn: Connection):
+    # 已有数据库需要一次完整 VACUUM 才能切换 auto_vacuum 模式，库较大时耗时较长，
+    # 不在启动时执行；切换前增量 VACUUM 不归还空间（新库在连接时已设置，见 database._apply_pragmas）
+    if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        print("⚠️ auto_vacuum 将在下次完整 VACUUM 后生效: python -m app.cli vacuum")
+
+
+@migration(4, "分钟行情改为 instruments + ticks 字典编码存储，realtime_prices 改为视图；删除冗余名称列")
+def _normalize_instruments(conn: Connection):
+    from app.database import create_views
+    # 迁移 1 在旧表上建的索引随旧表一起删除；视图的热点查询走 ticks 上的索引
+    if _object_type(conn, "realtime_prices") == "table":
+        # 配置中已删除的品种也保留历史；沿用原 id，K 线水位保持有效
+        conn.exec_driver_sql("""
+            INSERT OR IGNORE INTO instruments (symbol, name, unit, market)
+            SELECT symbol, MAX(name), MAX(unit), MAX(market) FROM realtime_prices GROUP BY symbol
+        """)
+        conn.exec_driver_sql("""
+            INSERT OR IGNORE INTO ticks (id, instrument_id, timestamp, price, price_cny)
+            SELECT r.id, i.id, r.timestamp, r.price, r.price_cny
+            FROM realtime_prices r JOIN instruments i ON i.symbol = r.symbol
+        """)
+        conn.exec_driver_sql("DROP TABLE realtime_prices")
+    create_views(conn)
+
+    # 名称由 PREMIUM_PAIRS / RATIO_NAMES 提供；释放的页由增量 VACUUM 归还
+    for table in ("spread_data", "ratio_data", "spread_rollups", "ratio_rollups"):
+        if "name" in _columns(conn, table):
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN name")
+    conn.exec_driver_sql("ANALYZE")
+
+
+@migration(5, "ticks.id 改为 AUTOINCREMENT，删除旧行后不再重用 id")
+def _autoincrement_ticks(conn: Connection):
+    from app.database import VIEWS, Tick, create_views
+    sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'ticks'").scalar()
+    if "AUTOINCREMENT" in sql.upper():
+        return
+    # SQLite 不能修改主键属性，只能重建表；视图和索引引用旧表，先删除再按模型重建
+    for name in VIEWS:
+        conn.exec_driver_sql(f"DROP VIEW IF EXISTS {name}")
+    conn.exec_driver_sql("ALTER TABLE ticks RENAME TO ticks_old")
+    for (index,) in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ticks_old' AND sql IS NOT NULL"
+    ).all():
+        conn.exec_driver_sql(f"DROP INDEX {index}")
+    Tick.__table__.create(conn)
+    conn.exec_driver_sql("""
+        INSERT INTO ticks (id, instrument_id, timestamp, price, price_cny)
+        SELECT id, instrument_id, timestamp, price, price_cny FROM ticks_old
+    """)
+    conn.exec_driver_sql("DROP TABLE ticks_old")
+    # 旧行已被全部删除、id 已经回落时，序号从 K 线水位之后继续
+    watermark = conn.exec_driver_sql("SELECT coalesce(max(last_id), 0) FROM bar_watermark").scalar()
+    seq = conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = 'ticks'").scalar()
+    if seq is None:
+        conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('ticks', ?)", (watermark,))
+    elif seq < watermark:
+        conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = ? WHERE name = 'ticks'", (watermark,))
+    create_views(conn)
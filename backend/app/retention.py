@@ -0,0 +1,306 @@
+"""
+数据保留与降采样
+分钟级原始数据只保留 RETENTION_CONFIG["raw_days"] 天：
+- realtime_prices（ticks）：由 K 线（price_bars）承接，删除前先把行情聚合进 K 线
+- spread_data / ratio_data：先生成 5m / 1h 降采样（spread_rollups / ratio_rollups）再删除
+5m / 15m 粒度保留 rollup_5m_days 天，1h 和日线永久保留
+删除按批进行，每批经单写线程单独提交；最后做一次增量 VACUUM 归还空闲页
+启用冷数据归档时，删除前先把已结束的月份写入 Parquet，只删除已归档月份内的原始行
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.config import RETENTION_CONFIG, WRITER_CONFIG, ARCHIVE_CONFIG
+from app.database import (
+    SessionLocal, bulk_upsert, SpreadData, RatioData, SpreadRollup, RatioRollup, RetentionState,
+    BarWatermark,
+)
+from app.fetchers.normalize import to_records
+from app.archive import ARCHIVE_SPECS, archive_closed_months, archived_until
+from app.calculator.bar_builder import build_bars, WATERMARK
+from app.writer import db_writer
+
+# 降采样粒度 {粒度: pandas 频率}
+ROLLUP_INTERVALS = {"5m": "5min", "1h": "1h"}
+
+# 需要降采样的原始表
+ROLLUP_SPECS = {
+    "spread_data": {
+        "model": SpreadData,
+        "rollup": SpreadRollup,
+        "key": "pair",
+        "values": ["domestic_price", "foreign_price", "theoretical_price", "exchange_rate", "spread_rate"],
+        "range": "spread_rate",
+    },
+    "ratio_data": {
+        "model": RatioData,
+        "rollup": RatioRollup,
+        "key": "ratio_type",
+        "values": ["value"],
+        "range": "value",
+    },
+}
+
+
+def _hour_floor(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def raw_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """原始数据保留起点（按整点对齐，保证降采样桶完整）；未配置时返回 None"""
+    if not RETENTION_CONFIG["raw_days"]:
+        return None
+    return _hour_floor((now or datetime.now()) - timedelta(days=RETENTION_CONFIG["raw_days"]))
+
+
+def _purge_bound(table: str, cutoff: datetime) -> Optional[datetime]:
+    """启用归档时，原始行只能删到已连续归档的时间点；尚未归档任何月份时返回 None（不删除）"""
+    if not ARCHIVE_CONFIG["enabled"]:
+        return cutoff
+    until = archived_until(table)
+    return min(cutoff, until) if until else None
+
+
+def rollup_5m_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """5m / 15m 粒度保留起点"""
+    if not RETENTION_CONFIG["rollup_5m_days"]:
+        return None
+    return _hour_floor((now or datetime.now()) - timedelta(days=RETENTION_CONFIG["rollup_5m_days"]))
+
+
+def _sql_time(dt: datetime) -> str:
+    """与 SQLAlchemy 存储 DateTime 的格式一致，便于在原生 SQL 中按字符串比较"""
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _write(job, name: str):
+    return db_writer.write(job, name=name, timeout=WRITER_CONFIG["submit_timeout"])
+
+
+def _rollup_window(db: Session, table: str, start: datetime, end: datetime) -> int:
+    """把 [start, end) 内的原始数据聚合为各粒度降采样并推进进度（在单写线程中执行）"""
+    spec = ROLLUP_SPECS[table]
+    model, key = spec["model"], spec["key"]
+    columns = [getattr(model, key), model.timestamp] + [getattr(model, v) for v in spec["values"]]
+    rows = db.query(*columns).filter(model.timestamp >= start, model.timestamp < end).all()
+
+    written = 0
+    if rows:
+        df = pd.DataFrame(rows, columns=[key, "timestamp"] + spec["values"])
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        agg = {"samples": (spec["values"][0], "size"),
+               f"{spec['range']}_min": (spec["range"], "min"),
+               f"{spec['range']}_max": (spec["range"], "max")}
+        agg.update({v: (v, "mean") for v in spec["values"]})
+
+        records = []
+        for interval, freq in ROLLUP_INTERVALS.items():
+            grouped = (
+                df.assign(bucket_time=df["timestamp"].dt.floor(freq))
+                .groupby([key, "bucket_time"], sort=False)
+                .agg(**agg)
+                .reset_index()
+            )
+            grouped["bucket_time"] = pd.Series(
+                grouped["bucket_time"].dt.to_pydatetime(), index=grouped.index, dtype=object
+            )
+            grouped["interval"] = interval
+            records.extend(to_records(grouped))
+
+        value_columns = ["samples", f"{spec['range']}_min", f"{spec['range']}_max"] + spec["values"]
+        written = bulk_upsert(
+            db, spec["rollup"], records,
+            conflict_columns=[key, "interval", "bucket_time"],
+            update_columns=value_columns,
+        )
+
+    state = db.get(RetentionState, table)
+    if state is None:
+        state = RetentionState(table_name=table)
+        db.add(state)
+    state.rolled_up_until = end
+    state.updated_at = datetime.now()
+    return written
+
+
+def _rolled_up_until(table: str) -> Optional[datetime]:
+    db = SessionLocal()
+    try:
+        state = db.get(RetentionState, table)
+        if state and state.rolled_up_until:
+            return state.rolled_up_until
+        model = ROLLUP_SPECS[table]["model"]
+        first = db.query(model.timestamp).order_by(model.timestamp).first()
+        return _hour_floor(first[0]) if first else None
+    finally:
+        db.close()
+
+
+def rollup_table(table: str, cutoff: datetime) -> int:
+    """
+    把 cutoff 之前尚未降采样的原始数据按天分段生成降采样
+    降采样写入与进度推进在同一事务中，中断后从上次进度继续
+
+    Returns:
+        写入的降采样条数
+    """
+    start = _rolled_up_until(table)
+    written = 0
+    while start is not None and start < cutoff:
+        end = min(start + timedelta(days=1), cutoff)
+        written += _write(lambda db, s=start, e=end: _rollup_window(db, table, s, e), name=f"rollup_{table}")
+        start = end
+    return written
+
+
+def _delete_batches(table: str, where: str, params: dict) -> int:
+    """分批删除满足条件的行，每批单独提交"""
+    batch = RETENTION_CONFIG["delete_batch"]
+    sql = text(
+        f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {where} LIMIT :batch)"
+    )
+    deleted = 0
+    while True:
+        count = _write(lambda db: db.execute(sql, {**params, "batch": batch}).rowcount, name=f"purge_{table}")
+        deleted += count
+        if count < batch:
+            return deleted
+
+
+def incremental_vacuum(pages: Optional[int] = None) -> int:
+    """归还空闲页给文件系统，返回剩余空闲页数"""
+    pages = pages or RETENTION_CONFIG["vacuum_pages"]
+
+    def job(db: Session):
+        # sqlite3 驱动执行不返回行的语句时只单步一次，而 incremental_vacuum 每步只归还一页
+        free = db.execute(text("PRAGMA freelist_count")).scalar()
+        for _ in range(min(int(pages), free)):
+            db.execute(text("PRAGMA incremental_vacuum(1)"))
+        return db.execute(text("PRAGMA freelist_count")).scalar()
+
+    return _write(job, name="vacuum")
+
+
+def run_retention(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    执行一次保留策略
+
+    Returns:
+        各步骤处理的行数
+    """
+    summary = {}
+    cutoff = raw_cutoff(now)
+    cutoff_5m = rollup_5m_cutoff(now)
+
+    if cutoff is not None and ARCHIVE_CONFIG["enabled"]:
+        for table, count in archive_closed_months().items():
+            summary[f"{table}_archived"] = count
+
+    if cutoff is not None:
+        # 分钟行情：先聚合进 K 线，只删除已聚合（id 不超过水位）的行
+        build_bars()
+        db = SessionLocal()
+        try:
+            watermark = db.get(BarWatermark, WATERMARK)
+            bar_watermark = watermark.last_id if watermark else 0
+        finally:
+            db.close()
+        bound = _purge_bound("realtime_prices", cutoff)
+        summary["realtime_prices"] = _delete_batches(
+            "ticks", "timestamp < :cutoff AND id <= :watermark",
+            {"cutoff": _sql_time(bound), "watermark": bar_watermark},
+        ) if bound else 0
+        summary["price_bars_1m"] = _delete_batches(
+            "price_bars", "interval = '1m' AND bar_time < :cutoff", {"cutoff": _sql_time(cutoff)}
+        )
+
+        # 溢价率 / 比值：先降采样再删除
+        for table in ROLLUP_SPECS:
+            summary[f"{table}_rollups"] = rollup_table(table, cutoff)
+            until = _rolled_up_until(table)
+            if until and table in ARCHIVE_SPECS:
+                until = _purge_bound(table, until)
+            summary[table] = _delete_batches(table, "timestamp < :until", {"until": _sql_time(until)}) if until else 0
+
+    if cutoff_5m is not None:
+        summary["price_bars_5m"] = _delete_batches(
+            "price_bars", "interval IN ('5m', '15m') AND bar_time < :cutoff", {"cutoff": _sql_time(cutoff_5m)}
+        )
+        for table, spec in ROLLUP_SPECS.items():
+            summary[f"{spec['rollup'].__tablename__}_5m"] = _delete_batches(
+                spec["rollup"].__tablename__, "interval = '5m' AND bucket_time < :cutoff",
+                {"cutoff": _sql_time(cutoff_5m)},
+            )
+
+    summary["free_pages"] = incremental_vacuum()
+    return summary
+
+
+def finest_bar_interval(interval: str, start: datetime) -> str:
+    """返回覆盖 start 的最细 K 线粒度：请求的粒度已被清理时依次退到 5m / 1h"""
+    cutoff, cutoff_5m = raw_cutoff(), rollup_5m_cutoff()
+    if interval == "1m" and cutoff is not None and start < cutoff:
+        interval = "5m"
+    if interval in ("5m", "15m") and cutoff_5m is not None and start < cutoff_5m:
+        interval = "1h"
+    return interval
+
+
+def rollup_ranges(start: datetime, until: Optional[datetime], raw_from: Optional[datetime]) -> List[Tuple[str, datetime, datetime]]:
+    """
+    查询 start 至今时需要读降采样的区间 [(粒度, 起, 止)]：
+    降采样只用于 SQLite 中最早一条原始数据之前（归档尚未完成时原始数据会保留得比 rolled_up_until 更早），
+    其中 5m 保留期之前用 1h
+
+    Args:
+        until: 已生成降采样的时间点（RetentionState.rolled_up_until）
+        raw_from: SQLite 中该品种最早一条原始数据的时间，没有原始数据时为 None
+    """
+    if until is None:
+        return []
+    end = min(until, raw_from) if raw_from is not None else until
+    if start >= end:
+        return []
+    cutoff_5m = rollup_5m_cutoff()
+    split = max(start, cutoff_5m) if cutoff_5m else start
+    ranges = [("1h", start, min(split, end)), ("5m", split, end)]
+    return [(interval, lo, hi) for interval, lo, hi in ranges if lo < hi]
+
+
+def query_history(db: Session, table: str, key_value: str, start: datetime) -> List[dict]:
+    """
+    查询 start 至今的历史，每一段使用仍然可用的最细粒度：
+    原始数据（SQLite 中仍有的部分）→ 5m 降采样 → 1h 降采样
+
+    Returns:
+        按时间排序的记录，字段与原始表一致，另有 resolution（raw / 5m / 1h）
+    """
+    spec = ROLLUP_SPECS[table]
+    model, rollup, key = spec["model"], spec["rollup"], spec["key"]
+    fields = spec["values"]
+
+    state = db.get(RetentionState, table)
+    until = state.rolled_up_until if state else None
+    raw_from = db.query(func.min(model.timestamp)).filter(getattr(model, key) == key_value).scalar()
+
+    records = []
+    for interval, lo, hi in rollup_ranges(start, until, raw_from):
+        rows = db.query(rollup).filter(
+            getattr(rollup, key) == key_value,
+            rollup.interval == interval,
+            rollup.bucket_time >= lo,
+            rollup.bucket_time < hi,
+        ).order_by(rollup.bucket_time).all()
+        records += [{"timestamp": r.bucket_time, "resolution": interval,
+                     **{f: getattr(r, f) for f in fields}} for r in rows]
+
+    raw = db.query(model).filter(
+        getattr(model, key) == key_value,
+        model.timestamp >= start,
+    ).order_by(model.timestamp).all()
+    records += [{"timestamp": r.timestamp, "resolution": "raw", **{f: getattr(r, f) for f in fields}} for r in raw]
+    return records
@@ -52,6 +52,37 @@ def calculate_premium_job():
         print(f"[{datetime.now()}] 溢价率计算失败: {e}")
 
 
+def build_bars_job():
+    """把新写入的分钟行情聚合为 K 线"""
+    from app.calculator.bar_builder import build_bars
+    try:
+        result = build_bars()
+        if result["ticks"]:
+            print(f"[{datetime.now()}] K线聚合完成: {result['ticks']} 条行情 -> {result['bars']} 条K线")
+    except Exception as e:
+        print(f"[{datetime.now()}] K线聚合失败: {e}")
+
+
+def retention_job():
+    """清理超出保留期的分钟数据（先降采样），并增量 VACUUM"""
+    from app.retention import run_retention
+    print(f"[{datetime.now()}] 开始执行数据保留策略...")
+    try:
+        summary = run_retention()
+        print(f"[{datetime.now()}] 数据保留策略完成: {summary}")
+    except Exception as e:
+        print(f"[{datetime.now()}] 数据保留策略失败: {e}")
+
+
+def incremental_vacuum_job():
+    """增量 VACUUM，归还空闲页"""
+    from app.retention import incremental_vacuum
+    try:
+        incremental_vacuum()
+    except Exception as e:
+        print(f"[{datetime.now()}] 增量 VACUUM 失败: {e}")
+
+
 def update_daily_ohlc_job():
     """更新日K线数据"""
     from app.fetchers.daily_fetcher import update_daily_ohlc
@@ -132,6 +163,14 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # K线聚合 - 每分钟第30秒处理新写入的行情（错开整分钟的采集任务）
+    scheduler.add_job(
+        build_bars_job,
+        CronTrigger(minute='*', second='30'),
+        id='build_bars',
+        replace_existing=True
+    )
+    
     # 日K线 - 每天16:00更新
     scheduler.add_job(
         update_daily_ohlc_job,
@@ -140,6 +179,22 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # 数据保留 - 每天 3:30（国内夜盘收盘后）降采样并清理过期分钟数据
+    scheduler.add_job(
+        retention_job,
+        CronTrigger(hour='3', minute='30'),
+        id='retention',
+        replace_existing=True
+    )
+    
+    # 增量 VACUUM - 每小时一次，归还删除留下的空闲页
+    scheduler.add_job(
+        incremental_vacuum_job,
+        CronTrigger(minute='45'),
+        id='incremental_vacuum',
+        replace_existing=True
+    )
+    
     # 宏观数据 - 每月15日10:00更新
     scheduler.add_job(
         update_macro_data_job,
@@ -174,7 +229,10 @@ def run_job_now(job_id: str):
         'fetch_intl_futures': fetch_intl_futures_job,
         'update_exchange_rate': update_exchange_rate_job,
         'calculate_premium': calculate_premium_job,
+        'build_bars': build_bars_job,
         'update_daily_ohlc': update_daily_ohlc_job,
+        'retention': retention_job,
+        'incremental_vacuum': incremental_vacuum_job,
         'update_macro_data': update_macro_data_job,
         'send_daily_summary': send_daily_summary_job,
     }
@@ -0,0 +1,172 @@
+"""
+单写线程
+所有采集任务的数据库写入都交给同一个线程执行，SQLite 始终只有一个写连接。
+写入任务进入有界队列，写线程在一个很短的时间窗口内收集多个任务，每个任务放在
+独立的 SAVEPOINT 中执行，最后合并为一次提交（组提交），显著减少每分钟的 fsync 次数。
+单个任务失败只回滚它自己的 SAVEPOINT，不影响同一批的其他任务。
+
+写线程未启动时（命令行、基准测试等），submit 直接在调用线程中执行并提交
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.config import WRITER_CONFIG
+from app.database import SessionLocal
+
+# 写入任务：接收写线程的会话执行写入，不要自行提交
+WriteJob = Callable[[Session], object]
+
+_STOP = object()
+
+
+class DBWriter:
+    """单写线程 + 组提交"""
+
+    def __init__(self, max_queue: int = 1000, commit_window: float = 0.05, max_batch: int = 64):
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        print("✍️ 数据库写线程已启动")
+
+    def stop(self, timeout: float = 10.0):
+        """处理完队列中已有的任务后退出"""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        print("✍️ 数据库写线程已停止")
+
+    def submit(self, job: WriteJob, name: str = "write", timeout: Optional[float] = None) -> Future:
+        """
+        提交写入任务，返回的 Future 在任务所在批次提交后完成（结果为 job 的返回值）
+        队列已满时最多等待 timeout 秒，超时抛出 queue.Full
+        """
+        future = Future()
+        if not self.running:
+            self._run_inline(job, name, future)
+            return future
+
+        self._queue.put((job, name, future, time.monotonic()), timeout=timeout)
+        metrics.gauge("writer", "queue_depth", self._queue.qsize())
+        return future
+
+    def write(self, job: WriteJob, name: str = "write", timeout: Optional[float] = None):
+        """提交写入任务并等待提交完成，返回 job 的返回值；写入失败时抛出异常"""
+        return self.submit(job, name=name, timeout=timeout).result(timeout=timeout)
+
+    def _run_inline(self, job: WriteJob, name: str, future: Future):
+        db = SessionLocal()
+        try:
+            value = job(db)
+            db.commit()
+            future.set_result(value)
+        except Exception as e:
+            db.rollback()
+            metrics.incr("writer_failures", name)
+            future.set_exception(e)
+        finally:
+            db.close()
+
+    def _collect(self, first) -> Tuple[List[tuple], bool]:
+        """在提交窗口内收集一批任务，返回 (任务列表, 是否收到停止信号)"""
+        batch = [first]
+        deadline = time.monotonic() + self.commit_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            metrics.gauge("writer", "queue_depth", self._queue.qsize())
+            self._commit_batch(batch)
+
+        # 停止前把队列里剩下的任务写完
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._commit_batch(leftover)
+
+    def _commit_batch(self, batch: List[tuple]):
+        db = SessionLocal()
+        results = []
+        start = time.monotonic()
+        try:
+            # 一开始就拿写锁，避免读事务升级为写事务时遇到 SQLITE_BUSY
+            db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for job, name, future, enqueued in batch:
+                metrics.observe("writer_wait", name, start - enqueued)
+                savepoint = db.begin_nested()
+                try:
+                    value = job(db)
+                    savepoint.commit()
+                    results.append((future, value, None))
+                except Exception as e:
+                    savepoint.rollback()
+                    metrics.incr("writer_failures", name)
+                    results.append((future, None, e))
+
+            commit_start = time.monotonic()
+            db.commit()
+            metrics.observe("writer", "commit", time.monotonic() - commit_start)
+        except Exception as e:
+            db.rollback()
+            print(f"❌ 写线程提交失败（{len(batch)} 个任务）: {e}")
+            metrics.incr("writer_failures", "commit")
+            results = [(future, None, e) for _, _, future, _ in batch]
+        finally:
+            db.close()
+
+        metrics.incr("writer", "commits")
+        metrics.incr("writer", "jobs", len(batch))
+        metrics.observe("writer", "batch", time.monotonic() - start)
+        for future, value, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+
+# 全局写线程（在应用启动时 start）
+db_writer = DBWriter(
+    max_queue=WRITER_CONFIG["max_queue"],
+    commit_window=WRITER_CONFIG["commit_window"],
+    max_batch=WRITER_CONFIG["max_batch"],
+)
@@ -0,0 +1,166 @@
+"""
+分析查询基准测试：同一接口分别用 engine=sqlite（ORM 逐行查询 + Python 处理）
+和 engine=duckdb（DuckDB 挂载 SQLite，一条向量化 SQL 返回 Arrow）请求，
+检查两种引擎的响应内容一致，并统计各自的中位耗时
+
+运行: cd backend && python -m benchmarks.bench_analytics [--days 30] [--repeat 5]
+需要安装 duckdb（首次运行会下载 sqlite 扩展）
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# 使用临时数据库，必须在导入 app 之前设置
+_tmpdir = tempfile.mkdtemp(prefix="bench_analytics_")
+os.environ["DATABASE_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+from fastapi import FastAPI  # noqa: E402
+
+from app import analytics  # noqa: E402
+from app.api import calculator, export, normalized  # noqa: E402
+from app.calculator.bar_builder import build_bars  # noqa: E402
+from app.database import (  # noqa: E402
+    SessionLocal, Tick, SpreadData, RatioData, DailyOHLC, init_db, engine,
+    get_instrument_ids, insert_ignore,
+)
+from app.writer import db_writer  # noqa: E402
+
+TICK_SYMBOLS = ["SHFE.CU", "SHFE.AL", "LME.CU", "LME.AL", "INE.SC", "BRENT", "NG"]
+DAILY_SYMBOLS = ["SHFE.AU", "SHFE.AG", "XAU", "XAG", "DCE.M", "DCE.C", "CBOT.S", "CBOT.C"]
+DAILY_YEARS = 3
+
+
+def seed(days: int):
+    """分钟行情（只记录变化，偶有停采间隔）、溢价率、比值各 days 天，日K线 DAILY_YEARS 年"""
+    random.seed(0)
+    now = datetime.now().replace(second=5, microsecond=0)
+    db = SessionLocal()
+    try:
+        ids = get_instrument_ids(db)
+        ticks = []
+        for symbol in TICK_SYMBOLS:
+            price, t = 100.0, now - timedelta(days=days)
+            while t < now:
+                if random.random() < 0.6:
+                    price += random.choice([-0.5, 0.5])
+                    ticks.append({"instrument_id": ids[symbol], "timestamp": t, "price": price, "price_cny": price * 7.2})
+                t += timedelta(minutes=random.choice([1, 1, 1, 2, 30]))
+        insert_ignore(db, Tick, ticks)
+        insert_ignore(db, SpreadData, [
+            {"timestamp": now - timedelta(minutes=m), "pair": pair, "domestic_price": 500.0 + m % 7,
+             "foreign_price": 2000.0, "theoretical_price": 498.0, "exchange_rate": 7.2,
+             "spread_rate": 0.4 + (m % 11) / 10}
+            for pair in ("GOLD", "SILVER") for m in range(days * 1440)
+        ])
+        insert_ignore(db, RatioData, [
+            {"timestamp": now - timedelta(minutes=m), "ratio_type": "GOLD_SILVER", "value": 80 + (m % 50) / 10}
+            for m in range(days * 1440)
+        ])
+        today = date.today()
+        insert_ignore(db, DailyOHLC, [
+            {"date": today - timedelta(days=d), "symbol": symbol, "name": symbol, "open": 100.0, "high": 101.0,
+             "low": 99.0, "close": 100.0 + (d * (i + 1)) % 17, "volume": 1000}
+            for d in range(1, DAILY_YEARS * 365) for i, symbol in enumerate(DAILY_SYMBOLS)
+            if (today - timedelta(days=d)).weekday() < 5
+        ])
+        db.commit()
+        print(f"数据规模: 分钟行情 {len(ticks)} 行, 溢价率 {2 * days * 1440} 行, 比值 {days * 1440} 行")
+    finally:
+        db.close()
+    db_writer.start()
+    build_bars()
+    db_writer.stop()
+
+
+async def request(app: FastAPI, path: str, query: str) -> bytes:
+    """不经过网络直接调用 ASGI 应用，返回响应体"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    body, received = [], []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"{path}?{query} 返回 {message['status']}")
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def timed(app: FastAPI, path: str, query: str, repeat: int):
+    body = await request(app, path, query)  # 预热
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await request(app, path, query)
+        times.append(time.perf_counter() - start)
+    return body, statistics.median(times)
+
+
+def cases(days: int):
+    start = (date.today() - timedelta(days=days)).isoformat()
+    return [
+        ("/api/normalized", "group=precious_metals&period=3y"),
+        ("/api/normalized", "group=base_metals&period=3d"),
+        ("/api/normalized", "group=energy&period=30d"),
+        ("/api/normalized", "group=all&period=1y"),
+        ("/api/calculator/history", f"pair=GOLD&days={days}"),
+        ("/api/calculator/ratios", f"ratio_type=GOLD_SILVER&days={days}"),
+        ("/api/export", "type=history&start_date=" + (date.today() - timedelta(days=DAILY_YEARS * 365)).isoformat()),
+        ("/api/export", f"type=premium&start_date={start}"),
+        ("/api/export", f"type=realtime&symbols=SHFE.CU,LME.CU,INE.SC&start_date={start}"),
+    ]
+
+
+async def main_async(args):
+    app = FastAPI()
+    for module in (normalized, calculator, export):
+        app.include_router(module.router, prefix="/api")
+
+    for path, query in cases(args.days):
+        sqlite_body, sqlite_time = await timed(app, path, query + "&engine=sqlite", args.repeat)
+        duckdb_body, duckdb_time = await timed(app, path, query + "&engine=duckdb", args.repeat)
+        same = sqlite_body == duckdb_body
+        print(
+            f"  {path + '?' + query:<72} sqlite {sqlite_time * 1000:8.1f}ms  "
+            f"duckdb {duckdb_time * 1000:8.1f}ms  {sqlite_time / duckdb_time:5.1f}x  "
+            f"{len(sqlite_body) / 1024:8.0f}KB  {'一致' if same else '不一致'}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30, help="分钟级数据的天数")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询的重复次数（取中位数）")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+    if not analytics.is_available():
+        print("DuckDB 分析引擎不可用（未安装 duckdb 或 sqlite 扩展加载失败）")
+        return
+    seed(args.days)
+    asyncio.run(main_async(args))
+    analytics.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+只读接口负载基准测试：同步 def 处理函数（线程池）vs 异步处理函数（aiosqlite，API_CONFIG["async_reads"]）
+在进程内直接驱动 ASGI 应用，N 个并发客户端轮流请求 /snapshot、/snapshot/{symbol} 和 /calculator/history，
+统计 50 / 200 / 1000 并发下的吞吐和 p50 / p99 延迟；两种模式使用相同的处理逻辑和响应内容
+
+运行: cd backend && python -m benchmarks.bench_async_api [--requests 5] [--clients 50 200 1000]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 使用临时数据库，必须在导入 app 之前设置
+_tmpdir = tempfile.mkdtemp(prefix="bench_async_api_")
+os.environ["DATABASE_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+from fastapi import FastAPI  # noqa: E402
+
+from app.api import async_reads as async_reads_api, calculator, snapshot  # noqa: E402
+from app.config import SYMBOLS_CONFIG  # noqa: E402
+from app.database import (  # noqa: E402
+    SessionLocal, LatestPrice, SpreadData, init_db, engine, async_engine, insert_ignore,
+)
+
+ENDPOINTS = [
+    ("/api/snapshot", b""),
+    ("/api/snapshot/SHFE.AU", b""),
+    ("/api/calculator/history", b"pair=GOLD&days=1"),
+]
+
+# 溢价率历史的分钟数（序列化开销随条数增长，过多时测的是 CPU 而不是数据库等待）
+HISTORY_MINUTES = 120
+
+
+def build_app(async_reads: bool) -> FastAPI:
+    """与 main.py 相同的注册方式：开启 async_reads 时异步路由先注册，覆盖同路径的同步处理函数"""
+    app = FastAPI()
+    if async_reads:
+        app.include_router(async_reads_api.router, prefix="/api")
+    app.include_router(snapshot.router, prefix="/api")
+    app.include_router(calculator.router, prefix="/api")
+    return app
+
+
+def seed():
+    """每个品种一条最新价格，黄金溢价率最近 HISTORY_MINUTES 分钟的数据"""
+    now = datetime.now()
+    db = SessionLocal()
+    try:
+        for i, (symbol, config) in enumerate(SYMBOLS_CONFIG.items()):
+            db.merge(LatestPrice(symbol=symbol, name=config["name"], price=100.0 + i,
+                                 unit=config["unit"], market=config["market"], timestamp=now))
+        insert_ignore(db, SpreadData, [
+            {"timestamp": now - timedelta(minutes=m), "pair": "GOLD", "domestic_price": 500.0,
+             "foreign_price": 2000.0, "theoretical_price": 498.0, "exchange_rate": 7.2, "spread_rate": 0.4}
+            for m in range(1, HISTORY_MINUTES + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def request(app: FastAPI, path: str, query: bytes) -> int:
+    """不经过网络直接调用 ASGI 应用，返回状态码"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query,
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    status, received = [], []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def load(app: FastAPI, clients: int, requests: int):
+    latencies, errors = [], 0
+
+    async def client(n: int):
+        nonlocal errors
+        for i in range(requests):
+            path, query = ENDPOINTS[(n + i) % len(ENDPOINTS)]
+            start = time.perf_counter()
+            if await request(app, path, query) != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run(label: str, app: FastAPI, clients: int, requests: int):
+    await load(app, min(clients, 10), 1)  # 预热连接池
+    latencies, errors, elapsed = await load(app, clients, requests)
+    print(
+        f"  {label:<6} 并发 {clients:5d}  {len(latencies) / elapsed:7.0f} 次/秒  "
+        f"p50 {statistics.median(latencies) * 1000:8.1f}ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:8.1f}ms  错误 {errors}"
+    )
+
+
+async def main_async(args):
+    sync_app, async_app = build_app(async_reads=False), build_app(async_reads=True)
+    for clients in args.clients:
+        await run("同步", sync_app, clients, args.requests)
+        await run("异步", async_app, clients, args.requests)
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5, help="每个客户端的请求数")
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000], help="并发客户端数")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+    seed()
+    print(f"接口: {', '.join(path for path, _ in ENDPOINTS)}，每个客户端 {args.requests} 次请求")
+    asyncio.run(main_async(args))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
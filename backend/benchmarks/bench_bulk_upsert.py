@@ -0,0 +1,102 @@
+"""
+日K线批量写入基准测试：逐行 SELECT + INSERT/UPDATE vs 批量 UPSERT
+模拟 18 个品种 × 10 年日线的回填，首次写入与重复写入（全部命中更新）各测一次
+
+运行: cd backend && python -m benchmarks.bench_bulk_upsert
+"""
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+# 使用临时数据库，必须在导入 app 之前设置
+_tmpdir = tempfile.mkdtemp(prefix="bench_upsert_")
+os.environ["DATABASE_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+from app.database import SessionLocal, DailyOHLC, init_db, engine  # noqa: E402
+from app.config import SYMBOLS_CONFIG  # noqa: E402
+from app.fetchers.daily_fetcher import save_daily_ohlc  # noqa: E402
+
+YEARS = 10
+
+
+def make_bars(years: int = YEARS):
+    """生成工作日日线"""
+    start = date.today() - timedelta(days=365 * years)
+    bars = []
+    day = start
+    price = 100.0
+    while day <= date.today():
+        if day.weekday() < 5:
+            price *= 1.001
+            bars.append({
+                "date": day, "open": price, "high": price * 1.01,
+                "low": price * 0.99, "close": price, "volume": 1000,
+            })
+        day += timedelta(days=1)
+    return bars
+
+
+def legacy_save_daily_ohlc(symbol: str, name: str, data):
+    """改造前的写法：每行先查询再插入或更新"""
+    db = SessionLocal()
+    try:
+        for item in data:
+            existing = db.query(DailyOHLC).filter(
+                DailyOHLC.symbol == symbol,
+                DailyOHLC.date == item["date"]
+            ).first()
+            if existing:
+                existing.open = item["open"]
+                existing.high = item["high"]
+                existing.low = item["low"]
+                existing.close = item["close"]
+                existing.volume = item["volume"]
+            else:
+                db.add(DailyOHLC(date=item["date"], symbol=symbol, name=name, **{
+                    k: item[k] for k in ("open", "high", "low", "close", "volume")
+                }))
+        db.commit()
+    finally:
+        db.close()
+
+
+def reset():
+    db = SessionLocal()
+    db.query(DailyOHLC).delete()
+    db.commit()
+    db.close()
+
+
+def run(label: str, save_func, bars) -> dict:
+    symbols = list(SYMBOLS_CONFIG.items())
+    total = len(bars) * len(symbols)
+    result = {}
+    for phase in ("insert", "update"):
+        start = time.perf_counter()
+        for symbol, config in symbols:
+            save_func(symbol, config["name"], bars)
+        elapsed = time.perf_counter() - start
+        result[phase] = total / elapsed
+        print(f"  {label:<10} {phase:<7} {total} 行  {elapsed:8.2f}s  {total / elapsed:10.0f} 行/秒")
+    return result
+
+
+def main():
+    init_db()
+    bars = make_bars()
+    print(f"回填规模: {len(SYMBOLS_CONFIG)} 个品种 × {len(bars)} 个交易日")
+
+    reset()
+    legacy = run("逐行写入", legacy_save_daily_ohlc, bars)
+    reset()
+    bulk = run("批量UPSERT", save_daily_ohlc, bars)
+
+    for phase in ("insert", "update"):
+        print(f"  {phase}: 提速 {bulk[phase] / legacy[phase]:.1f}x")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
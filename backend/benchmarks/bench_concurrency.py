@@ -0,0 +1,130 @@
+"""
+并发读写基准测试：N 个读线程反复请求 /snapshot，同时写线程模拟采集任务写入
+对比不同 SQLite 存储配置档下的读吞吐、读写延迟和 database is locked 错误数
+
+每个配置档在独立子进程和临时数据库中运行（DB_PROFILE 在导入 app 时生效）
+
+运行: cd backend && python -m benchmarks.bench_concurrency [--readers 16] [--seconds 10]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = ["legacy", "balanced", "durable", "fast"]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_profile(readers: int, seconds: float, write_interval: float):
+    """在当前进程中运行一个配置档（由父进程通过环境变量指定）"""
+    from app.config import SYMBOLS_CONFIG, DB_PROFILE
+    from app.database import SessionLocal, RealtimePrice, init_db, engine
+    from app.api.snapshot import get_snapshot
+    from app.fetchers.futures_fetcher import save_prices
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+
+    stop = threading.Event()
+    read_latency, read_errors = [], []
+    write_latency, write_attempts = [], [0]
+    lock = threading.Lock()
+    prices = {symbol: 100.0 + i for i, symbol in enumerate(SYMBOLS_CONFIG)}
+    # 每次写入都改变价格，避免被分钟行情去重跳过
+    ticks = itertools.count(1)
+
+    def reader():
+        while not stop.is_set():
+            db = SessionLocal()
+            start = time.perf_counter()
+            try:
+                get_snapshot(market=None, db=db)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    read_latency.append(elapsed)
+            except Exception as e:
+                with lock:
+                    read_errors.append(str(e))
+            finally:
+                db.close()
+
+    def writer():
+        # 模拟每分钟的采集任务：国内、国际价格分两次写入，写入间隔压缩为 write_interval
+        while not stop.is_set():
+            start = time.perf_counter()
+            step = next(ticks) * 0.01
+            save_prices({symbol: price + step for symbol, price in prices.items()}, 7.2)
+            with lock:
+                write_latency.append(time.perf_counter() - start)
+                write_attempts[0] += 1
+            time.sleep(write_interval)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(2)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+    db = SessionLocal()
+    written = db.query(RealtimePrice).count()
+    db.close()
+    engine.dispose()
+
+    expected = write_attempts[0] * len(prices)
+    locked = sum("locked" in e for e in read_errors)
+    print(
+        f"  {DB_PROFILE:<9} 读 {len(read_latency) / seconds:8.0f} 次/秒  "
+        f"p50 {statistics.median(read_latency or [0]) * 1000:6.1f}ms  "
+        f"p95 {percentile(read_latency, 0.95) * 1000:6.1f}ms  "
+        f"读错误 {len(read_errors):4d} (locked {locked})  "
+        f"写 p95 {percentile(write_latency, 0.95) * 1000:6.1f}ms  "
+        f"写入丢失 {expected - written}/{expected}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-interval", type=float, default=0.05)
+    parser.add_argument("--profiles", nargs="+", default=PROFILES)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_profile(args.readers, args.seconds, args.write_interval)
+        return
+
+    print(f"并发读写: {args.readers} 个读线程请求 /snapshot，2 个写线程每 {args.write_interval}s 写入一批价格，"
+          f"各 {args.seconds:.0f}s")
+    for profile in args.profiles:
+        tmpdir = tempfile.mkdtemp(prefix="bench_concurrency_")
+        env = dict(os.environ, DB_PROFILE=profile, DATABASE_PATH=os.path.join(tmpdir, "bench.db"))
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_concurrency", "--child",
+             "--readers", str(args.readers), "--seconds", str(args.seconds),
+             "--write-interval", str(args.write_interval)],
+            env=env, check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+分钟行情写入基准测试：ORM add_all（逐个构造对象、flush）vs Core executemany（ON CONFLICT DO NOTHING）
+每次调用写入一分钟的全部品种，统计行/秒，以及每次调用的内存分配（tracemalloc：
+调用期间的峰值分配字节数，和调用结束后仍存活的新增内存块数）
+
+运行: cd backend && python -m benchmarks.bench_save_prices [--minutes 5000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# 使用临时数据库，必须在导入 app 之前设置
+_tmpdir = tempfile.mkdtemp(prefix="bench_save_prices_")
+os.environ["DATABASE_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+from app.database import SessionLocal, Tick, init_db, engine, get_instrument_ids, insert_ignore  # noqa: E402
+
+ALLOC_SAMPLES = 200
+
+
+def orm_write(db, rows):
+    """改造前的写法：每行构造 ORM 对象，由 unit of work 在提交时 flush"""
+    db.add_all([Tick(**row) for row in rows])
+
+
+def core_write(db, rows):
+    insert_ignore(db, Tick, rows)
+
+
+def make_batches(minutes: int, ids):
+    start = datetime(2020, 1, 1)
+    return [
+        [
+            {"instrument_id": instrument_id, "timestamp": start + timedelta(minutes=m),
+             "price": 100.0 + m % 50, "price_cny": 700.0 + m % 50}
+            for instrument_id in ids
+        ]
+        for m in range(minutes)
+    ]
+
+
+def reset():
+    db = SessionLocal()
+    db.query(Tick).delete()
+    db.commit()
+    db.close()
+
+
+def write_batch(write_func, rows):
+    db = SessionLocal()
+    try:
+        write_func(db, rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(label: str, write_func, batches):
+    reset()
+    total = sum(len(rows) for rows in batches)
+    start = time.perf_counter()
+    for rows in batches:
+        write_batch(write_func, rows)
+    elapsed = time.perf_counter() - start
+
+    # 分配单独统计（tracemalloc 本身会拖慢执行，不计入吞吐）
+    reset()
+    tracemalloc.start()
+    peak_bytes, blocks = 0, 0
+    for rows in batches[:ALLOC_SAMPLES]:
+        before = tracemalloc.take_snapshot()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        write_batch(write_func, rows)
+        peak_bytes += tracemalloc.get_traced_memory()[1] - current
+        after = tracemalloc.take_snapshot()
+        blocks += sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    tracemalloc.stop()
+    samples = min(ALLOC_SAMPLES, len(batches))
+
+    print(f"  {label:<6} {total} 行  {elapsed:7.2f}s  {total / elapsed:9.0f} 行/秒  "
+          f"每次调用峰值分配 {peak_bytes / samples / 1024:7.1f}KB  新增内存块 {blocks / samples:6.0f}")
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=int, default=5000, help="模拟写入的分钟数（每分钟一次调用）")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    ids = list(get_instrument_ids(db).values())
+    db.close()
+    batches = make_batches(args.minutes, ids)
+    print(f"写入规模: {args.minutes} 次调用 × {len(ids)} 个品种")
+
+    orm = run("ORM", orm_write, batches)
+    core = run("Core", core_write, batches)
+    print(f"  提速 {core / orm:.1f}x")
+
+    # 重复写入同一分钟：Core 路径跳过冲突行，ORM 路径整批失败
+    db = SessionLocal()
+    try:
+        skipped = len(batches[0]) - insert_ignore(db, Tick, batches[0])
+        db.commit()
+    finally:
+        db.close()
+    print(f"  重复写入第一分钟: 跳过 {skipped} 条冲突行")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
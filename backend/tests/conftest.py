@@ -0,0 +1,7 @@
+"""
+测试公共配置：使用临时数据库，必须在导入 app 之前设置
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="commodities_test_"), "test.db")
@@ -0,0 +1,67 @@
+"""
+冷数据归档测试：归档清单只记录已结束（过了 grace_days）的月份，重复执行不重复归档，
+archived_until 只推进到连续归档的月份
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import archive
+from app.database import SessionLocal, SpreadData, init_db
+
+pytestmark = pytest.mark.skipif(not archive.PYARROW_AVAILABLE, reason="pyarrow 未安装")
+
+
+@pytest.fixture
+def archive_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path)
+    monkeypatch.setattr(archive, "ARCHIVE_MANIFEST", tmp_path / "manifest.json")
+    monkeypatch.setitem(archive.ARCHIVE_CONFIG, "grace_days", 3)
+    return tmp_path
+
+
+@pytest.fixture
+def spreads():
+    """7 月、8 月各两个品种每天一条溢价率"""
+    init_db()
+    db = SessionLocal()
+    db.query(SpreadData).delete()
+    t = datetime(2026, 7, 1, 10)
+    while t < datetime(2026, 9, 1):
+        for pair in ("GOLD", "SILVER"):
+            db.add(SpreadData(timestamp=t, pair=pair, spread_rate=1.0, exchange_rate=7.1))
+        t += timedelta(days=1)
+    db.commit()
+    yield
+    db.query(SpreadData).delete()
+    db.commit()
+    db.close()
+
+
+def test_manifest_tracks_closed_months(archive_dir, spreads):
+    # 9 月 2 日还在 8 月的 grace_days 内，只归档 7 月
+    assert archive.archive_closed_months(["spread_data"], today=date(2026, 9, 2)) == {"spread_data": 62}
+    assert archive._load_manifest() == {"spread_data": ["2026-07"]}
+    assert archive.archived_until("spread_data") == datetime(2026, 8, 1)
+
+    assert archive.archive_closed_months(["spread_data"], today=date(2026, 9, 10)) == {"spread_data": 62}
+    assert archive._load_manifest() == {"spread_data": ["2026-07", "2026-08"]}
+    assert archive.archived_until("spread_data") == datetime(2026, 9, 1)
+    for pair in ("GOLD", "SILVER"):
+        for month in (date(2026, 7, 1), date(2026, 8, 1)):
+            assert archive._partition_path("spread_data", pair, month).exists()
+
+    # 已在清单中的月份不再归档
+    assert archive.archive_closed_months(["spread_data"], today=date(2026, 9, 10)) == {"spread_data": 0}
+    df = archive.read_archive("spread_data", datetime(2026, 7, 1), keys=["GOLD"])
+    assert len(df) == 62 and set(df["pair"]) == {"GOLD"}
+
+
+def test_archived_until_stops_at_gap(archive_dir):
+    assert archive.archived_until("spread_data") is None
+    archive._save_manifest({"spread_data": ["2026-07", "2026-09"]})
+    assert archive.archived_until("spread_data") == datetime(2026, 8, 1)
+
+    # 清单损坏时视为没有归档（保留策略不会删除原始数据）
+    archive.ARCHIVE_MANIFEST.write_text("{", encoding="utf-8")
+    assert archive.archived_until("spread_data") is None
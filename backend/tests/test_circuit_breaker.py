@@ -0,0 +1,73 @@
+"""
+熔断器测试：closed → open → half_open → closed，半开状态只放行一次探测，卡住的探测超过冷却时间后作废
+"""
+import pytest
+
+from app.fetchers import circuit_breaker
+from app.fetchers.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    monkeypatch.setattr(circuit_breaker, "_notify_alert", lambda func_name, source: None)
+    return clock
+
+
+def test_breaker_cycle(clock):
+    breaker = CircuitBreaker("test_cycle", failure_threshold=2, recovery_timeout=10)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["retry_in"] == 10
+
+    # 冷却期间一直跳过
+    clock.now += 9.9
+    assert not breaker.allow()
+
+    # 冷却结束放行一次探测，探测失败立即重新熔断
+    clock.now += 0.1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    # 再次冷却后探测成功，恢复并清零失败计数
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_stuck_probe_expires(clock):
+    breaker = CircuitBreaker("test_probe", failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+
+    # 探测一直没有结果：冷却时间内不放行第二次，超过后作废并重新放行
+    clock.now += 9
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+    # 调用方取消探测时立即释放名额
+    breaker.release_probe()
+    assert breaker.allow()
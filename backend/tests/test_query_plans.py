@@ -0,0 +1,19 @@
+"""
+热点查询执行计划回归测试：新建数据库（init_db）后，每个 HOT_QUERIES 查询都应使用期望的索引，且没有临时排序
+"""
+import pytest
+
+from app.database import engine, init_db
+from app.migrations import HOT_QUERIES, check_query_plans
+
+
+@pytest.fixture(scope="module")
+def plans():
+    init_db()
+    return check_query_plans(engine)
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(plans, name):
+    result = plans[name]
+    assert result["ok"], f"{name} 未使用索引 {result['index']}（或出现临时排序）: {result['plan']}"
@@ -0,0 +1,119 @@
+"""
+保留策略测试：降采样区间划分（rollup_ranges）、删除边界（_purge_bound / run_retention），
+以及 query_history 在 SQLite 与 DuckDB 引擎下结果一致
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from app import analytics, archive, retention
+from app.database import SessionLocal, SpreadData, SpreadRollup, RetentionState, init_db
+
+NOW = datetime(2026, 10, 16, 12, 30)
+
+
+def _clear(db):
+    for model in (SpreadData, SpreadRollup, RetentionState):
+        db.query(model).delete()
+
+
+@pytest.fixture
+def db():
+    init_db()
+    db = SessionLocal()
+    _clear(db)
+    db.commit()
+    yield db
+    _clear(db)
+    db.commit()
+    db.close()
+
+
+def _add_spreads(db, start: datetime, end: datetime, step: timedelta, pair: str = "GOLD"):
+    t, i = start, 0
+    while t < end:
+        db.add(SpreadData(timestamp=t, pair=pair, domestic_price=500 + i, foreign_price=490 + i,
+                          theoretical_price=495 + i, exchange_rate=7.1, spread_rate=1.0 + i % 7 / 10))
+        t += step
+        i += 1
+    db.commit()
+
+
+def test_rollup_ranges(monkeypatch):
+    cutoff_5m = datetime(2026, 1, 1)
+    monkeypatch.setattr(retention, "rollup_5m_cutoff", lambda now=None: cutoff_5m)
+    until = datetime(2026, 9, 1)
+
+    # 没有降采样、或查询起点不早于降采样终点时不读降采样
+    assert retention.rollup_ranges(datetime(2025, 6, 1), None, None) == []
+    assert retention.rollup_ranges(until, until, None) == []
+    # 跨 5m 保留期：之前用 1h，之后用 5m
+    assert retention.rollup_ranges(datetime(2025, 6, 1), until, None) == [
+        ("1h", datetime(2025, 6, 1), cutoff_5m),
+        ("5m", cutoff_5m, until),
+    ]
+    # 起点在 5m 保留期内只用 5m
+    assert retention.rollup_ranges(datetime(2026, 3, 1), until, None) == [
+        ("5m", datetime(2026, 3, 1), until),
+    ]
+    # 原始数据比降采样进度保留得更早（归档未完成）时，降采样只读到最早一条原始数据
+    assert retention.rollup_ranges(datetime(2025, 6, 1), until, datetime(2025, 12, 1)) == [
+        ("1h", datetime(2025, 6, 1), datetime(2025, 12, 1)),
+    ]
+
+
+def test_purge_bound_waits_for_archive(monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path)
+    monkeypatch.setattr(archive, "ARCHIVE_MANIFEST", tmp_path / "manifest.json")
+    cutoff = datetime(2026, 9, 16, 12)
+
+    monkeypatch.setitem(retention.ARCHIVE_CONFIG, "enabled", False)
+    assert retention._purge_bound("spread_data", cutoff) == cutoff
+
+    monkeypatch.setitem(retention.ARCHIVE_CONFIG, "enabled", True)
+    assert retention._purge_bound("spread_data", cutoff) is None
+    archive._save_manifest({"spread_data": ["2026-07", "2026-08"]})
+    assert retention._purge_bound("spread_data", cutoff) == datetime(2026, 9, 1)
+    archive._save_manifest({"spread_data": ["2026-07", "2026-08", "2026-09", "2026-10"]})
+    assert retention._purge_bound("spread_data", cutoff) == cutoff
+
+
+def test_run_retention_purges_before_cutoff(db, monkeypatch):
+    monkeypatch.setitem(retention.ARCHIVE_CONFIG, "enabled", False)
+    cutoff = retention.raw_cutoff(NOW)
+    assert cutoff == datetime(2026, 9, 16, 12)
+    _add_spreads(db, cutoff - timedelta(days=2), cutoff + timedelta(days=1), timedelta(minutes=30))
+
+    summary = retention.run_retention(NOW)
+    db.expire_all()
+
+    assert summary["spread_data"] == 96
+    remaining = [t for (t,) in db.query(SpreadData.timestamp).order_by(SpreadData.timestamp)]
+    assert remaining[0] == cutoff and len(remaining) == 48
+    assert db.get(RetentionState, "spread_data").rolled_up_until == cutoff
+    hours = db.query(SpreadRollup).filter(SpreadRollup.interval == "1h").order_by(SpreadRollup.bucket_time).all()
+    assert len(hours) == 48 and hours[-1].bucket_time == cutoff - timedelta(hours=1)
+    assert all(h.samples == 2 for h in hours)
+
+
+@pytest.mark.skipif(not analytics.is_available(), reason="duckdb 不可用")
+def test_query_history_sqlite_matches_duckdb(db, monkeypatch):
+    # 查询按当前时间划分 5m / 1h 区间，数据也按当前时间生成
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    monkeypatch.setitem(retention.RETENTION_CONFIG, "rollup_5m_days", 35)
+    cutoff = now - timedelta(days=30)
+    _add_spreads(db, now - timedelta(days=40), now - timedelta(days=1), timedelta(minutes=20))
+    _add_spreads(db, now - timedelta(days=40), now - timedelta(days=1), timedelta(hours=1), pair="SILVER")
+    retention.rollup_table("spread_data", cutoff)
+    db.query(SpreadData).filter(SpreadData.timestamp < cutoff).delete()
+    db.commit()
+
+    start = now - timedelta(days=45)
+    expected = pd.DataFrame(retention.query_history(db, "spread_data", "GOLD", start))
+    actual = analytics.query_history("spread_data", "GOLD", start).to_pandas()
+    analytics.close()
+
+    assert set(expected["resolution"]) == {"1h", "5m", "raw"}
+    expected["timestamp"] = pd.to_datetime(expected["timestamp"])
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False)
@@ -0,0 +1,124 @@
+"""
+重试调度器测试：按数据源族划分的线程池、带抖动的指数退避、截止时间，以及熔断期间直接跳过
+时间用可拨动的假时钟（真实时间 + 偏移），失败由计数的假调用模拟
+"""
+import threading
+import time
+
+import pytest
+
+from app.fetchers import circuit_breaker, retry
+from app.fetchers.circuit_breaker import CircuitOpenError, get_breaker
+from app.fetchers.retry import RetryScheduler
+
+
+class FakeClock:
+    """time 模块的替身：monotonic() 为真实时间加上可拨动的偏移，定时线程仍按真实时间等待"""
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def monotonic(self) -> float:
+        return time.monotonic() + self.offset
+
+    def advance(self, seconds: float):
+        self.offset += seconds
+
+
+class Flaky:
+    """前 failures 次调用抛出 ConnectionError，之后返回 "ok"；每次调用可让假时钟前进"""
+
+    def __init__(self, failures: int, clock: FakeClock = None, step: float = 0.0):
+        self.failures = failures
+        self.calls = 0
+        self.clock = clock
+        self.step = step
+
+    def __call__(self):
+        self.calls += 1
+        if self.clock is not None:
+            self.clock.advance(self.step)
+        if self.calls <= self.failures:
+            raise ConnectionError(f"第 {self.calls} 次失败")
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def no_alerts(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_notify_alert", lambda func_name, source: None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(retry, "time", clock)
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def test_backoff_is_exponential_with_jitter(monkeypatch):
+    monkeypatch.setitem(retry.FETCH_CONFIG, "retry_max_delay", 8.0)
+    monkeypatch.setattr(retry.random, "random", lambda: 0.0)
+    assert [RetryScheduler._backoff(1.0, n) for n in range(5)] == [0.5, 1.0, 2.0, 4.0, 4.0]
+    monkeypatch.setattr(retry.random, "random", lambda: 1.0)
+    assert [RetryScheduler._backoff(1.0, n) for n in range(5)] == [1.0, 2.0, 4.0, 8.0, 8.0]
+
+
+def test_retries_until_success():
+    scheduler = RetryScheduler(max_workers=2)
+    func = Flaky(failures=2)
+    assert scheduler.call("test_retry_ok", func, base_delay=0.01, timeout=5) == "ok"
+    assert func.calls == 3
+    assert get_breaker("test_retry_ok").state == circuit_breaker.CLOSED
+
+
+def test_gives_up_after_max_retries():
+    scheduler = RetryScheduler(max_workers=2)
+    func = Flaky(failures=10)
+    with pytest.raises(ConnectionError, match="第 3 次失败"):
+        scheduler.call("test_retry_max", func, max_retries=3, base_delay=0.01, timeout=5)
+    assert func.calls == 3
+    assert get_breaker("test_retry_max").failures == 1
+
+
+def test_deadline_stops_retries(clock):
+    scheduler = RetryScheduler(max_workers=2)
+    # 每次调用耗时 1s（假时钟），截止时间 2.5s 后：第 3 次失败后再等待就会超过截止时间
+    func = Flaky(failures=10, clock=clock, step=1.0)
+    future = scheduler.submit("test_retry_deadline", func, max_retries=10, base_delay=0.01,
+                              deadline=clock.monotonic() + 2.5)
+    with pytest.raises(ConnectionError, match="第 3 次失败"):
+        future.result(timeout=5)
+    assert func.calls == 3
+
+
+def test_pools_are_per_source_family():
+    scheduler = RetryScheduler(max_workers=1)
+    assert scheduler._executor_for("test_pool:A") is scheduler._executor_for("test_pool:B")
+    assert scheduler._executor_for("test_pool") is scheduler._executor_for("test_pool:A")
+    assert scheduler._executor_for("test_pool_other") is not scheduler._executor_for("test_pool")
+
+    # 一个数据源的线程全部卡住时，其他数据源照常执行
+    gate = threading.Event()
+    stuck = scheduler.submit("test_pool:A", gate.wait, 5)
+    queued = scheduler.submit("test_pool:B", lambda: "same family")
+    other = scheduler.submit("test_pool_other", lambda: "other")
+    assert other.result(timeout=2) == "other"
+    assert not queued.done()
+    gate.set()
+    assert stuck.result(timeout=2) is True
+    assert queued.result(timeout=2) == "same family"
+
+
+def test_open_breaker_skips_calls(monkeypatch):
+    monkeypatch.setitem(retry.FETCH_CONFIG, "breaker_failure_threshold", 2)
+    scheduler = RetryScheduler(max_workers=2)
+    func = Flaky(failures=10)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            scheduler.call("test_retry_open", func, max_retries=1, timeout=5)
+    assert get_breaker("test_retry_open").state == circuit_breaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        scheduler.call("test_retry_open", func, timeout=5)
+    assert func.calls == 2
@@ -0,0 +1,77 @@
+"""
+单写线程测试：同一批次中失败的任务只回滚自己的 SAVEPOINT，每个调用方拿到自己的结果，
+并记录队列深度和提交耗时指标
+"""
+import threading
+import time
+
+import pytest
+
+from app import metrics
+from app.database import BarWatermark, SessionLocal, init_db
+from app.writer import DBWriter
+
+
+def _insert(name: str, fail: bool = False):
+    def job(db):
+        db.add(BarWatermark(name=name, last_id=1))
+        db.flush()
+        if fail:
+            raise ValueError(f"{name} 写入失败")
+        return name
+    return job
+
+
+def _stored(names):
+    db = SessionLocal()
+    try:
+        return {n for (n,) in db.query(BarWatermark.name).filter(BarWatermark.name.in_(names))}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def writer():
+    init_db()
+    writer = DBWriter(max_queue=10, commit_window=0.01, max_batch=64)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def test_failing_job_is_isolated_in_batch(writer):
+    before = metrics.snapshot()
+    commits = before["counters"].get("writer", {}).get("commits", 0)
+    commit_timings = before["timings"].get("writer", {}).get("commit", {}).get("count", 0)
+
+    # 先让写线程卡在一个任务里，后面三个任务排队后作为同一批提交
+    gate = threading.Event()
+    blocker = writer.submit(lambda db: gate.wait(5), name="test_blocker")
+    time.sleep(0.1)
+    ok_1 = writer.submit(_insert("test_ok_1"), name="test_ok")
+    bad = writer.submit(_insert("test_bad", fail=True), name="test_bad")
+    ok_2 = writer.submit(_insert("test_ok_2"), name="test_ok")
+    assert metrics.snapshot()["gauges"]["writer"]["queue_depth"] == 3
+    gate.set()
+
+    assert blocker.result(timeout=5) is True
+    assert ok_1.result(timeout=5) == "test_ok_1"
+    assert ok_2.result(timeout=5) == "test_ok_2"
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    assert _stored(["test_ok_1", "test_ok_2", "test_bad"]) == {"test_ok_1", "test_ok_2"}
+
+    after = metrics.snapshot()
+    assert after["counters"]["writer"]["commits"] == commits + 2
+    assert after["counters"]["writer_failures"]["test_bad"] >= 1
+    assert after["timings"]["writer"]["commit"]["count"] == commit_timings + 2
+    assert after["gauges"]["writer"]["queue_depth_max"] >= 3
+
+
+def test_write_returns_value_without_thread():
+    init_db()
+    inline = DBWriter()
+    assert inline.write(_insert("test_inline"), name="test_inline") == "test_inline"
+    with pytest.raises(ValueError):
+        inline.write(_insert("test_inline_bad", fail=True), name="test_inline")
+    assert _stored(["test_inline", "test_inline_bad"]) == {"test_inline"}